@@ -2,7 +2,9 @@ from django import forms
 from django.contrib import admin
 from django.utils.translation import gettext_lazy as _
 from django.utils import timezone
-from .models import Subject, Topic, Question, AnswerOption, TestSession, UserAnswer, Result, UserProfile, Feedback,Reklama
+from .models import Subject, Topic, Question, AnswerOption, TestSession, UserAnswer, Result, UserProfile, Feedback,Reklama, TelegramOutbox, UserSubjectStats
+from .question_pool import invalidate_question_pool
+from .site_cache import bump_content_version
 @admin.register(Reklama)
 class ReklamaAdmin(admin.ModelAdmin):
     list_display = ('title', 'is_active', 'start_date', 'end_date')
@@ -131,16 +133,19 @@ class QuestionAdmin(admin.ModelAdmin):
 
     def restore_deleted(self, request, queryset):
         queryset.update(is_deleted=False)
+        invalidate_question_pool(*queryset.values_list('topic__subject_id', flat=True).distinct())
         self.message_user(request, _("Tanlangan savollar tiklandi."))
     restore_deleted.short_description = _("O‘chirilgan savollarni tiklash")
 
     def mark_as_active(self, request, queryset):
         queryset.update(is_active=True)
+        invalidate_question_pool(*queryset.values_list('topic__subject_id', flat=True).distinct())
         self.message_user(request, _("Tanlangan savollar faol qilindi."))
     mark_as_active.short_description = _("Savollarni faol qilish")
 
     def mark_as_inactive(self, request, queryset):
         queryset.update(is_active=False)
+        invalidate_question_pool(*queryset.values_list('topic__subject_id', flat=True).distinct())
         self.message_user(request, _("Tanlangan savollar faol emas qilindi."))
     mark_as_inactive.short_description = _("Savollarni faol emas qilish")
 
@@ -155,6 +160,7 @@ class SubjectAdmin(admin.ModelAdmin):
 
     def restore_deleted(self, request, queryset):
         queryset.update(is_deleted=False)
+        bump_content_version()
         self.message_user(request, _("Tanlangan fanlar tiklandi."))
     restore_deleted.short_description = _("O‘chirilgan fanlarni tiklash")
 
@@ -169,6 +175,7 @@ class TopicAdmin(admin.ModelAdmin):
 
     def restore_deleted(self, request, queryset):
         queryset.update(is_deleted=False)
+        invalidate_question_pool(*queryset.values_list('subject_id', flat=True).distinct())
         self.message_user(request, _("Tanlangan mavzular tiklandi."))
     restore_deleted.short_description = _("O‘chirilgan mavzularni tiklash")
 
@@ -213,6 +220,15 @@ class UserProfileAdmin(admin.ModelAdmin):
     search_fields = ('user__username', 'bio')
     list_per_page = 20
 
+# UserSubjectStats admin
+@admin.register(UserSubjectStats)
+class UserSubjectStatsAdmin(admin.ModelAdmin):
+    list_display = ('user', 'subject', 'tests_count', 'best_score', 'average_score')
+    list_filter = ('subject',)
+    search_fields = ('user__username',)
+    readonly_fields = ('tests_count', 'total_score', 'best_score', 'average_score')
+    list_per_page = 20
+
 # Feedback admin
 @admin.register(Feedback)
 class FeedbackAdmin(admin.ModelAdmin):
@@ -230,4 +246,18 @@ class FeedbackAdmin(admin.ModelAdmin):
     def mark_as_pending(self, request, queryset):
         queryset.update(status='pending')
         self.message_user(request, _("Tanlangan fikr-mulohazalar kutilmoqda deb belgilandi."))
-    mark_as_pending.short_description = _("Fikr-mulohazalarni kutilmoqda deb belgilash")
\ No newline at end of file
+    mark_as_pending.short_description = _("Fikr-mulohazalarni kutilmoqda deb belgilash")
+
+# Telegram outbox admin
+@admin.register(TelegramOutbox)
+class TelegramOutboxAdmin(admin.ModelAdmin):
+    list_display = ('chat_id', 'status', 'attempts', 'next_attempt_at', 'sent_at')
+    list_filter = ('status',)
+    search_fields = ('chat_id', 'text', 'last_error')
+    readonly_fields = ('attempts', 'last_error', 'sent_at')
+    actions = ['requeue']
+
+    def requeue(self, request, queryset):
+        queryset.exclude(status='sent').update(status='pending', attempts=0, next_attempt_at=timezone.now())
+        self.message_user(request, _("Tanlangan xabarlar qayta navbatga qo‘yildi."))
+    requeue.short_description = _("Yuborilmagan xabarlarni qayta navbatga qo‘yish")
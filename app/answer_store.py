@@ -0,0 +1,282 @@
+import atexit
+import json
+import logging
+import os
+import threading
+import uuid
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import close_old_connections, transaction
+from django.utils.module_loading import import_string
+from .models import TestSession, UserAnswer
+
+logger = logging.getLogger(__name__)
+
+# Kesh yozuvi test davomida yashashi yetarli; bazaga flush qilingandan keyin faqat o‘qish uchun
+ANSWER_CACHE_TIMEOUT = 6 * 3600
+
+
+def upsert_answers(rows):
+    """(session_id, question_id, option_id, is_correct) qatorlarini bitta INSERT ... ON CONFLICT DO UPDATE bilan yozish."""
+    UserAnswer.objects.bulk_create(
+        [UserAnswer(test_session_id=session_id, question_id=question_id,
+                    selected_option_id=option_id, is_correct=is_correct)
+         for session_id, question_id, option_id, is_correct in rows],
+        update_conflicts=True,
+        unique_fields=['test_session', 'question'],
+        update_fields=['selected_option', 'is_correct', 'updated_at'],
+    )
+
+
+class AnswerStore:
+    """Write-behind javoblar ombori: javob bosilganda SQLite ga yozilmaydi.
+
+    Javob jurnal fayliga (jarayon qulasa tiklash uchun) va keshga (sahifa va submit uchun
+    o‘qish) yoziladi. Fon oqimi har `flush_interval` soniyada navbatdagi javoblarni bitta
+    bulk upsert bilan UserAnswer ga o‘tkazadi va yozib bo‘lingan jurnal bo‘lagini o‘chiradi.
+
+    Har bir jarayon o‘z jurnal bo‘lagiga flock bilan egalik qiladi; egasi o‘lgan bo‘laklarni
+    (qulf bo‘shagan *.log fayllar) boshqa jarayon keyingi flush da qayta o‘ynaydi.
+    """
+
+    def __init__(self, cache_alias, journal_dir, flush_interval=2.0, fsync=False):
+        self.cache = caches[cache_alias]
+        self.journal_dir = str(journal_dir)
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.pid = os.getpid()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # flush() bir vaqtda faqat bitta oqimda
+        self._pending = {}  # (session_id, question_id) -> (option_id, is_correct)
+        self._segment = None  # (path, fd): joriy yoziladigan jurnal bo‘lagi
+        self._sealed = []  # flush kutayotgan (path, fd) bo‘laklar, qulf ushlab turiladi
+        self._stop = threading.Event()
+        self._thread = None
+        os.makedirs(self.journal_dir, exist_ok=True)
+
+    @staticmethod
+    def key(session_id, question_id):
+        return f"answer:{session_id}:{question_id}"
+
+    def record(self, session_id, question_id, option_id, is_correct):
+        """Javobni jurnal va keshga yozish (bazaga murojaat yo‘q)."""
+        line = json.dumps([session_id, question_id, option_id, is_correct]) + "\n"
+        with self._lock:
+            fd = self._active_fd()
+            os.write(fd, line.encode())
+            if self.fsync:
+                os.fsync(fd)
+            self._pending[(session_id, question_id)] = (option_id, is_correct)
+            self.cache.set(self.key(session_id, question_id), (option_id, is_correct), ANSWER_CACHE_TIMEOUT)
+
+    def get_answers(self, session_id, question_ids):
+        """Keshdagi javoblar: {question_id: (option_id, is_correct)}."""
+        keys = {self.key(session_id, question_id): question_id for question_id in question_ids}
+        return {keys[key]: tuple(value) for key, value in self.cache.get_many(keys).items()}
+
+    def flush_session(self, session_id, question_ids):
+        """Bitta sessiya javoblarini darhol yozish (submit_test tranzaksiyasi ichida chaqiriladi)."""
+        answers = self.get_answers(session_id, question_ids)
+        with self._lock:
+            for question_id in question_ids:
+                if question_id not in answers and (session_id, question_id) in self._pending:
+                    answers[question_id] = self._pending[(session_id, question_id)]
+        if answers:
+            upsert_answers([(session_id, q, option_id, is_correct) for q, (option_id, is_correct) in answers.items()])
+            transaction.on_commit(lambda: self._forget(session_id, answers))
+        return len(answers)
+
+    def _forget(self, session_id, answers):
+        """Submit da yozilgan javoblarni navbatdan olib tashlash (keyin bosilganlari qoladi)."""
+        with self._lock:
+            for question_id, value in answers.items():
+                if self._pending.get((session_id, question_id)) == value:
+                    del self._pending[(session_id, question_id)]
+
+    def flush(self):
+        """Navbatdagi (va tiklangan) javoblarni bazaga yozish. Yozilgan qatorlar sonini qaytaradi."""
+        with self._flush_lock:
+            return self._flush()
+
+    def _flush(self):
+        self._recover()
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            if self._segment is not None:
+                self._sealed.append(self._segment)
+                self._segment = None
+            sealed = list(self._sealed)
+        try:
+            written = self._write(pending) if pending else 0
+        except Exception as e:
+            logger.error(f"Answer flush failed, {len(pending)} answers kept for retry: {e}")
+            with self._lock:
+                for key, value in pending.items():
+                    self._pending.setdefault(key, value)
+            return 0
+        self._release(sealed)
+        if written:
+            logger.debug(f"Flushed {written} answers")
+        return written
+
+    def _write(self, pending):
+        # Kesh eng so‘nggi qiymatni saqlaydi (boshqa jarayon yangilagan bo‘lishi mumkin)
+        cached = self.cache.get_many([self.key(*key) for key in pending])
+        with transaction.atomic():
+            # Yakunlangan sessiyalar submit_test da yozilgan, eski qiymat bilan ustidan yozilmaydi
+            completed = set(TestSession.objects.filter(
+                id__in={session_id for session_id, _ in pending}, completed=True
+            ).values_list('id', flat=True))
+            latest = {
+                key: tuple(cached.get(self.key(*key), value)) for key, value in pending.items()
+            }
+            rows = [(*key, *value) for key, value in latest.items() if key[0] not in completed]
+            if rows:
+                upsert_answers(rows)
+            stored = {}
+            if completed:
+                # Boshqa workerdagi submit_test ko‘pincha aynan shu javoblarni yozib bo‘lgan
+                stored = {
+                    (session_id, question_id): (option_id, is_correct)
+                    for session_id, question_id, option_id, is_correct in UserAnswer.objects.filter(
+                        test_session_id__in=completed
+                    ).values_list('test_session_id', 'question_id', 'selected_option_id', 'is_correct')
+                }
+        dropped = sorted(
+            key for key, value in latest.items() if key[0] in completed and stored.get(key) != value
+        )
+        if dropped:
+            # submit_test dan keyin (yoki boshqa workerda submit paytida) bosilgan javoblar
+            logger.warning(
+                f"Dropped {len(dropped)} answers for completed sessions "
+                f"{sorted({key[0] for key in dropped})}: {dropped}"
+            )
+        return len(rows)
+
+    def _active_fd(self):
+        if self._segment is None:
+            import fcntl
+            # Qulf olingandan keyingina *.log nomi beriladi: boshqa jarayon uni egasiz deb olmaydi
+            tmp_path = os.path.join(self.journal_dir, f"answers-{uuid.uuid4().hex}.tmp")
+            fd = os.open(tmp_path, os.O_CREAT | os.O_WRONLY | os.O_APPEND, 0o644)
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            path = tmp_path[:-len(".tmp")] + ".log"
+            os.rename(tmp_path, path)
+            self._segment = (path, fd)
+        return self._segment[1]
+
+    def _release(self, sealed):
+        with self._lock:
+            self._sealed = [segment for segment in self._sealed if segment not in sealed]
+        for path, fd in sealed:
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            os.close(fd)
+
+    def _recover(self):
+        """Egasi o‘lgan jurnal bo‘laklarini olish va ulardagi javoblarni navbatga qo‘shish."""
+        import fcntl
+        with self._lock:
+            owned = {path for path, _ in self._sealed}
+            if self._segment is not None:
+                owned.add(self._segment[0])
+        for name in os.listdir(self.journal_dir):
+            path = os.path.join(self.journal_dir, name)
+            if not name.endswith(".log") or path in owned:
+                continue
+            try:
+                fd = os.open(path, os.O_RDONLY)
+            except FileNotFoundError:
+                continue
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                if os.fstat(fd).st_ino != os.stat(path).st_ino:
+                    raise FileNotFoundError(path)  # boshqa jarayon allaqachon yozib o‘chirgan
+            except (BlockingIOError, FileNotFoundError):
+                os.close(fd)
+                continue
+            entries = self._read_journal(path)
+            with self._lock:
+                for session_id, question_id, option_id, is_correct in entries:
+                    # Joriy jarayondagi javoblar jurnaldagidan yangiroq
+                    self._pending.setdefault((session_id, question_id), (option_id, is_correct))
+                self._sealed.append((path, fd))
+            logger.warning(f"Recovered {len(entries)} answers from journal {name}")
+
+    @staticmethod
+    def _read_journal(path):
+        entries = {}
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    session_id, question_id, option_id, is_correct = json.loads(line)
+                except ValueError:
+                    continue  # qulash paytida chala yozilgan oxirgi qator
+                entries[(session_id, question_id)] = (option_id, is_correct)
+        return [(*key, *value) for key, value in entries.items()]
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="answer-flusher", daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+
+    def stop(self):
+        """Fon oqimini to‘xtatib, qolgan javoblarni yozish (takroriy chaqiruv hech narsa qilmaydi)."""
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Answer flusher error: {e}")
+            finally:
+                close_old_connections()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def write_behind_enabled():
+    return getattr(settings, 'ANSWER_WRITE_BEHIND', False)
+
+
+def check_answer_cache(alias):
+    """Javoblar keshi barcha worker jarayonlarida umumiy bo‘lishi shart.
+
+    Aks holda submit_test boshqa workerda bosilgan javoblarni ko‘rmaydi va ular yo‘qoladi.
+    """
+    backend = import_string(settings.CACHES[alias]['BACKEND'])
+    if issubclass(backend, (LocMemCache, DummyCache)):
+        raise ImproperlyConfigured(
+            f"ANSWER_WRITE_BEHIND uchun CACHES['{alias}'] umumiy kesh bo‘lishi kerak "
+            f"(FileBasedCache yoki RedisCache), {backend.__name__} emas"
+        )
+
+
+def get_answer_store():
+    """Jarayon uchun yagona ombor (fork qilingan workerda qayta yaratiladi); fon flusher ishga tushiriladi."""
+    global _store
+    with _store_lock:
+        if _store is None or _store.pid != os.getpid():
+            check_answer_cache(settings.ANSWER_STORE_CACHE)
+            _store = AnswerStore(
+                settings.ANSWER_STORE_CACHE,
+                settings.ANSWER_JOURNAL_DIR,
+                flush_interval=settings.ANSWER_FLUSH_INTERVAL,
+                fsync=settings.ANSWER_JOURNAL_FSYNC,
+            )
+            _store.start()
+        return _store
@@ -4,3 +4,13 @@ from django.apps import AppConfig
 class AppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'app'
+
+    def ready(self):
+        from django.conf import settings
+        import database
+        from . import signals  # noqa: F401
+        # Botdagi ban/unban bu jarayondagi user_cache ni tozalamaydi, shuning uchun muddat qisqa
+        database.user_cache.ttl = settings.BOT_USER_CACHE_TTL
+        if settings.ANSWER_WRITE_BEHIND:
+            from .answer_store import check_answer_cache
+            check_answer_cache(settings.ANSWER_STORE_CACHE)
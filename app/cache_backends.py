@@ -0,0 +1,44 @@
+import time
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from . import metrics
+
+_missing = object()
+
+
+class InstrumentedLocMemCache(LocMemCache):
+    """LocMemCache, o‘qishlar hit/miss sifatida metrikaga yoziladi (get_many ham get orqali ishlaydi)."""
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _missing, version)
+        if value is _missing:
+            metrics.CACHE_REQUESTS.inc(result='miss')
+            return default
+        metrics.CACHE_REQUESTS.inc(result='hit')
+        return value
+
+
+class AnswerFileCache(FileBasedCache):
+    """Write-behind javoblar uchun FileBasedCache: muddati o‘tmagan yozuvlar hech qachon o‘chirilmaydi.
+
+    Standart _cull har set da butun katalogni ro‘yxatlaydi va MAX_ENTRIES dan oshsa
+    tasodifiy (hali flush qilinmagan bo‘lishi mumkin) javoblarni o‘chiradi. Bu yerda faqat
+    muddati o‘tgan fayllar tozalanadi, har jarayonda CULL_INTERVAL soniyada bir marta.
+    """
+
+    def __init__(self, dir, params):
+        super().__init__(dir, params)
+        self._cull_interval = params.get('OPTIONS', {}).get('CULL_INTERVAL', 600)
+        self._next_cull = time.monotonic() + self._cull_interval
+
+    def _cull(self):
+        now = time.monotonic()
+        if now < self._next_cull:
+            return
+        self._next_cull = now + self._cull_interval
+        for fname in self._list_cache_files():
+            try:
+                with open(fname, 'rb') as f:
+                    self._is_expired(f)  # muddati o‘tgan faylni o‘chiradi
+            except FileNotFoundError:
+                pass
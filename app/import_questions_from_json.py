@@ -0,0 +1,175 @@
+import json
+import time
+from django.db import transaction
+from django.utils.text import slugify
+from app.models import Subject, Topic, Question, AnswerOption, question_content_hash
+from app.question_pool import invalidate_question_pool
+
+# Fanlar va ularga mos JSON fayllar ro‘yxati
+FANLAR = {
+    "Matematika": "tests/matematika_tests.json",
+    "Adabiyot": "tests/adabiyot.json",
+    "Biologiya": "tests/biologiya_tests.json",
+    "Fizika": "tests/fizika_tests.json",
+    "Geografiya": "tests/geografiya_tests.json",
+    "Ingliz tili": "tests/ingliz_tili_tests.json",
+    "Kimyo": "tests/kimyo_tests.json",
+    "Nemis tili": "tests/nemis_tili_tests.json",
+    "Fransuz tili": "tests/fransuz_tili_tests.json",
+    "Ona tili": "tests/ona_tili_tests.json",
+    "Rus tili": "tests/rus_tili_tests.json",
+    "Tarix": "tests/tarix_tests.json",
+}
+
+DIFFICULTIES = {choice for choice, _ in Question._meta.get_field('difficulty').choices}
+LABELS = ['A', 'B', 'C', 'D']
+OPTION_TEXT_MAX_LENGTH = AnswerOption._meta.get_field('text').max_length
+
+
+class QuestionImportError(Exception):
+    pass
+
+
+def iter_json_array(path, chunk_size=64 * 1024):
+    """JSON massiv elementlarini faylni to‘liq xotiraga yuklamasdan birma-bir qaytarish."""
+    decoder = json.JSONDecoder()
+    with open(path, encoding="utf-8") as f:
+        buffer = f.read(chunk_size).lstrip()
+        if not buffer.startswith("["):
+            raise QuestionImportError(f"{path}: fayl JSON massiv bilan boshlanishi kerak.")
+        buffer = buffer[1:]
+        eof = False
+        while True:
+            buffer = buffer.lstrip().lstrip(",").lstrip()
+            if buffer.startswith("]"):
+                return
+            try:
+                item, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                if eof:
+                    raise QuestionImportError(f"{path}: JSON formati noto‘g‘ri.")
+                chunk = f.read(chunk_size)
+                eof = not chunk
+                buffer += chunk
+                continue
+            yield item
+            buffer = buffer[end:]
+
+
+def validate_question(item):
+    """Bitta savol yozuvini tekshirish, xatolar ro‘yxatini qaytaradi."""
+    if not isinstance(item, dict):
+        return ["savol obyekt bo‘lishi kerak"]
+    errors = []
+    if not isinstance(item.get("text"), str) or not item["text"].strip():
+        errors.append("'text' bo‘sh bo‘lmagan satr bo‘lishi kerak")
+    if item.get("difficulty", "medium") not in DIFFICULTIES:
+        errors.append(f"'difficulty' {sorted(DIFFICULTIES)} dan biri bo‘lishi kerak")
+    if not isinstance(item.get("explanation", ""), str):
+        errors.append("'explanation' satr bo‘lishi kerak")
+    options = item.get("options")
+    if not isinstance(options, list) or len(options) != len(LABELS):
+        errors.append(f"roppa-rosa {len(LABELS)} ta variant bo‘lishi kerak")
+        return errors
+    labels = [opt.get("label") if isinstance(opt, dict) else None for opt in options]
+    if sorted(label for label in labels if isinstance(label, str)) != LABELS:
+        errors.append(f"variant labellari {LABELS} bo‘lishi kerak")
+    for opt in options:
+        if not isinstance(opt, dict):
+            continue
+        if not isinstance(opt.get("text"), str) or not opt["text"].strip():
+            errors.append(f"{opt.get('label')} variant matni bo‘sh")
+        elif len(opt["text"]) > OPTION_TEXT_MAX_LENGTH:
+            errors.append(f"{opt.get('label')} variant matni {OPTION_TEXT_MAX_LENGTH} belgidan uzun")
+        if not isinstance(opt.get("is_correct"), bool):
+            errors.append(f"{opt.get('label')} variantida 'is_correct' bool bo‘lishi kerak")
+    if sum(1 for opt in options if isinstance(opt, dict) and opt.get("is_correct") is True) != 1:
+        errors.append("faqat bitta to‘g‘ri javob bo‘lishi kerak")
+    return errors
+
+
+def validate_file(path):
+    """Butun faylni yozishdan oldin tekshirish. Savollar sonini qaytaradi."""
+    count = 0
+    problems = []
+    for index, item in enumerate(iter_json_array(path)):
+        count += 1
+        for error in validate_question(item):
+            problems.append(f"#{index + 1}: {error}")
+    if problems:
+        shown = "\n".join(problems[:20])
+        more = f"\n... va yana {len(problems) - 20} ta xato" if len(problems) > 20 else ""
+        raise QuestionImportError(f"{path} faylida {len(problems)} ta xato:\n{shown}{more}")
+    return count
+
+
+def import_subject(fan_nomi, fayl_yoli, batch_size=500):
+    """Bitta fan savollarini bitta tranzaksiyada bulk_create bilan yuklash.
+
+    Mavzuda allaqachon mavjud bo‘lgan (content_hash bo‘yicha) savollar o‘tkazib yuboriladi,
+    shuning uchun qayta ishga tushirish xavfsiz.
+    """
+    started = time.perf_counter()
+    total = validate_file(fayl_yoli)
+    stats = {"subject": fan_nomi, "total": total, "created": 0, "skipped": 0, "options": 0}
+
+    with transaction.atomic():
+        subject, _ = Subject.objects.get_or_create(
+            name=fan_nomi,
+            defaults={"slug": slugify(fan_nomi)}
+        )
+        topic, _ = Topic.objects.get_or_create(
+            subject=subject,
+            name=f"{fan_nomi} umumiy",
+            defaults={"slug": slugify(f"{fan_nomi}-umumiy"), "description": f"{fan_nomi} asoslari"}
+        )
+        seen = set(Question.objects.filter(topic=topic).values_list('content_hash', flat=True))
+
+        batch = []
+        for item in iter_json_array(fayl_yoli):
+            content_hash = question_content_hash(item["text"])
+            if content_hash in seen:
+                stats["skipped"] += 1
+                continue
+            seen.add(content_hash)
+            batch.append(item)
+            if len(batch) >= batch_size:
+                stats["options"] += _create_batch(topic, batch)
+                stats["created"] += len(batch)
+                batch = []
+        if batch:
+            stats["options"] += _create_batch(topic, batch)
+            stats["created"] += len(batch)
+        # bulk_create signal yubormaydi, shuning uchun poolni qo‘lda yangilaymiz
+        if stats["created"]:
+            transaction.on_commit(lambda: invalidate_question_pool(subject.id))
+
+    elapsed = time.perf_counter() - started
+    rows = stats["created"] + stats["options"]
+    stats["seconds"] = round(elapsed, 3)
+    stats["rows_per_second"] = round(rows / elapsed) if elapsed else rows
+    return stats
+
+
+def _create_batch(topic, items):
+    questions = Question.objects.bulk_create([
+        Question(
+            topic=topic,
+            text=item["text"],
+            difficulty=item.get("difficulty", "medium"),
+            explanation=item.get("explanation", ""),
+            content_hash=question_content_hash(item["text"]),
+        )
+        for item in items
+    ])
+    options = AnswerOption.objects.bulk_create([
+        AnswerOption(
+            question=question,
+            label=opt["label"],
+            text=opt["text"],
+            is_correct=opt["is_correct"]
+        )
+        for question, item in zip(questions, items)
+        for opt in item["options"]
+    ])
+    return len(options)
@@ -0,0 +1,140 @@
+import logging
+from datetime import date, timedelta
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max, Q, Sum
+from django.utils import timezone
+from .models import LeaderboardEntry, LeaderboardScoreCount, Result
+from .user_stats import create_or_update
+
+logger = logging.getLogger(__name__)
+
+PERIODS = ('day', 'week', 'all')
+ALL_TIME_START = date(1970, 1, 1)
+
+
+def period_start(period, day=None):
+    """Reyting davrining boshlanish sanasi (hafta dushanbadan boshlanadi)."""
+    day = day or timezone.localdate()
+    if period == 'day':
+        return day
+    if period == 'week':
+        return day - timedelta(days=day.weekday())
+    return ALL_TIME_START
+
+
+def _board(subject_id, period, day=None):
+    return {'subject_id': subject_id, 'period': period, 'period_start': period_start(period, day)}
+
+
+def record_score(user_id, subject_id, percent, day=None):
+    """Natijani kunlik, haftalik va umumiy reytingga qo‘shish.
+
+    Har bir reytingda foydalanuvchining faqat eng yaxshi bali saqlanadi; ball oshganda
+    LeaderboardScoreCount dagi eski va yangi ball hisoblagichlari yangilanadi.
+    Ball oshmagan bo‘lsa faqat bitta SELECT bajariladi.
+    """
+    boards = [_board(subject_id, period, day) for period in PERIODS]
+    with transaction.atomic(savepoint=False):
+        existing = {
+            (entry.period, entry.period_start): entry
+            for entry in LeaderboardEntry.objects.select_for_update().filter(
+                Q(*[Q(period=b['period'], period_start=b['period_start']) for b in boards], _connector=Q.OR),
+                subject_id=subject_id, user_id=user_id,
+            )
+        }
+        for board in boards:
+            entry = existing.get((board['period'], board['period_start']))
+            if entry is None:
+                try:
+                    with transaction.atomic():
+                        LeaderboardEntry.objects.create(user_id=user_id, score=percent, **board)
+                except IntegrityError:
+                    # Parallel so‘rov yozuvni yaratib ulgurdi
+                    entry = LeaderboardEntry.objects.select_for_update().get(user_id=user_id, **board)
+                else:
+                    _increment_score_count(board, percent)
+                    continue
+            if percent > entry.score:
+                LeaderboardEntry.objects.filter(id=entry.id).update(score=percent, updated_at=timezone.now())
+                LeaderboardScoreCount.objects.filter(score=entry.score, **board).update(users=F('users') - 1)
+                _increment_score_count(board, percent)
+
+
+def _increment_score_count(board, score):
+    def update():
+        return LeaderboardScoreCount.objects.filter(score=score, **board).update(users=F('users') + 1)
+    if not update():
+        create_or_update(LeaderboardScoreCount, {'score': score, **board}, {'users': 1}, update)
+
+
+def get_leaderboard(subject_id, period='all', limit=10, day=None):
+    """Reytingning eng yaxshi `limit` ta qatori (indeks bo‘yicha, jadval hajmiga bog‘liq emas).
+
+    Teng ballilar bir xil o‘rinni oladi (1, 2, 2, 4 ...); tenglikda avval erishgan yuqorida.
+    """
+    entries = LeaderboardEntry.objects.filter(**_board(subject_id, period, day)).select_related('user').order_by(
+        '-score', 'updated_at'
+    )[:limit]
+    rows = []
+    for position, entry in enumerate(entries, start=1):
+        rank = rows[-1]['rank'] if rows and rows[-1]['score'] == entry.score else position
+        rows.append({
+            'rank': rank,
+            'user_id': entry.user_id,
+            'username': entry.user.username,
+            'name': entry.user.get_full_name() or entry.user.username,
+            'score': entry.score,
+        })
+    return rows
+
+
+def get_user_rank(subject_id, user_id, period='all', day=None):
+    """Foydalanuvchining reytingdagi o‘rni: {'rank', 'score', 'participants'} yoki None.
+
+    Ikki so‘rov: yozuv (unique indeks) va ball hisoblagichlari yig‘indisi.
+    """
+    board = _board(subject_id, period, day)
+    score = LeaderboardEntry.objects.filter(user_id=user_id, **board).values_list('score', flat=True).first()
+    if score is None:
+        return None
+    counts = LeaderboardScoreCount.objects.filter(**board).aggregate(
+        above=Sum('users', filter=Q(score__gt=score)),
+        participants=Sum('users'),
+    )
+    return {'rank': (counts['above'] or 0) + 1, 'score': score, 'participants': counts['participants'] or 0}
+
+
+def rebuild_leaderboards(day=None, keep_days=35, batch_size=1000):
+    """Joriy kunlik/haftalik va umumiy reytinglarni Result jadvalidan qayta qurish, eskilarini o‘chirish."""
+    day = day or timezone.localdate()
+    results = Result.objects.filter(is_deleted=False, test_session__is_deleted=False)
+    stats = {}
+    with transaction.atomic():
+        for period in PERIODS:
+            start = period_start(period, day)
+            board_results = results
+            if period != 'all':
+                board_results = results.filter(created_at__date__gte=start)
+            LeaderboardEntry.objects.filter(period=period, period_start=start).delete()
+            LeaderboardScoreCount.objects.filter(period=period, period_start=start).delete()
+            rows = board_results.values(
+                subject_id=F('test_session__subject_id'), user_id=F('test_session__user_id')
+            ).annotate(score=Max('percent')).order_by()
+            entries = LeaderboardEntry.objects.bulk_create((
+                LeaderboardEntry(period=period, period_start=start, **row) for row in rows.iterator(chunk_size=batch_size)
+            ), batch_size=batch_size)
+            counts = LeaderboardEntry.objects.filter(period=period, period_start=start).values(
+                'subject_id', 'score'
+            ).annotate(users=Count('id')).order_by()
+            LeaderboardScoreCount.objects.bulk_create((
+                LeaderboardScoreCount(period=period, period_start=start, **row) for row in counts.iterator(chunk_size=batch_size)
+            ), batch_size=batch_size)
+            stats[period] = len(entries)
+
+        cutoff = day - timedelta(days=keep_days)
+        old = Q(period__in=('day', 'week'), period_start__lt=cutoff)
+        LeaderboardEntry.objects.filter(old).delete()
+        LeaderboardScoreCount.objects.filter(old).delete()
+
+    logger.info(f"Leaderboards rebuilt: {stats}")
+    return stats
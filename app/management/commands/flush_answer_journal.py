@@ -0,0 +1,12 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from app.answer_store import AnswerStore
+
+
+class Command(BaseCommand):
+    help = "Write-behind jurnallaridagi (egasi to‘xtagan jarayonlar) javoblarni UserAnswer ga yozish."
+
+    def handle(self, *args, **options):
+        store = AnswerStore(settings.ANSWER_STORE_CACHE, settings.ANSWER_JOURNAL_DIR)
+        written = store.flush()
+        self.stdout.write(f"✅ {written} ta javob bazaga yozildi.")
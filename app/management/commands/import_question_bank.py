@@ -0,0 +1,50 @@
+import os
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from app.import_questions_from_json import FANLAR, QuestionImportError, import_subject
+
+
+class Command(BaseCommand):
+    help = "tests/*.json fayllaridagi savollarni bazaga tez va takrorlanmas tarzda yuklash."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'subjects', nargs='*',
+            help="Yuklanadigan fanlar nomi (bo‘sh bo‘lsa barcha fanlar). 'Nom=fayl.json' ko‘rinishida ham berish mumkin."
+        )
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        fanlar = self.resolve_subjects(options['subjects'])
+        failed = 0
+        for fan_nomi, fayl_yoli in fanlar.items():
+            if not os.path.exists(fayl_yoli):
+                self.stderr.write(f"⚠️ {fayl_yoli} fayli topilmadi.")
+                failed += 1
+                continue
+            try:
+                stats = import_subject(fan_nomi, fayl_yoli, batch_size=options['batch_size'])
+            except QuestionImportError as e:
+                self.stderr.write(f"❌ {fan_nomi}: {e}")
+                failed += 1
+                continue
+            self.stdout.write(
+                f"✅ {fan_nomi}: {stats['created']} ta yangi savol, {stats['skipped']} ta takroriy, "
+                f"{stats['options']} ta variant; {stats['seconds']} s ({stats['rows_per_second']} qator/s)"
+            )
+        if failed:
+            raise CommandError(f"{failed} ta fanni yuklab bo‘lmadi.")
+
+    def resolve_subjects(self, names):
+        if not names:
+            return {name: os.path.join(settings.BASE_DIR, path) for name, path in FANLAR.items()}
+        fanlar = {}
+        for name in names:
+            if '=' in name:
+                name, path = name.split('=', 1)
+            elif name in FANLAR:
+                path = os.path.join(settings.BASE_DIR, FANLAR[name])
+            else:
+                raise CommandError(f"Noma’lum fan: {name}. Mavjudlari: {', '.join(FANLAR)}")
+            fanlar[name] = path
+        return fanlar
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from app.leaderboard import rebuild_leaderboards
+
+
+class Command(BaseCommand):
+    help = "Joriy kunlik, haftalik va umumiy reytinglarni Result jadvalidan qayta qurish va eskilarini tozalash."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keep-days', type=int, default=35, help="Shundan eski kunlik/haftalik reytinglar o‘chiriladi.")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        stats = rebuild_leaderboards(keep_days=options['keep_days'], batch_size=options['batch_size'])
+        self.stdout.write(
+            f"✅ Reytinglar qayta qurildi: kunlik {stats['day']}, haftalik {stats['week']}, umumiy {stats['all']} ta yozuv."
+        )
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from app.user_stats import rebuild_user_stats
+
+
+class Command(BaseCommand):
+    help = "UserProfile va UserSubjectStats statistikasini Result jadvalidan qayta hisoblash."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        stats = rebuild_user_stats(batch_size=options['batch_size'])
+        self.stdout.write(
+            f"✅ {stats['profiles']} ta profil va {stats['subject_stats']} ta fan statistikasi yangilandi."
+        )
@@ -0,0 +1,67 @@
+import ipaddress
+import socket
+import threading
+from wsgiref.simple_server import WSGIRequestHandler, make_server
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from app import metrics
+from app.notifications import OUTBOX_BATCH_SIZE, OUTBOX_WORKERS, deliver_batch, run_outbox_worker
+
+
+class Command(BaseCommand):
+    help = "Navbatdagi Telegram xabarlarini fonda yuborish (natijalar va aloqa formasi)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Navbatni bir marta bo‘shatib chiqish.")
+        parser.add_argument('--batch-size', type=int, default=OUTBOX_BATCH_SIZE)
+        parser.add_argument('--workers', type=int, default=OUTBOX_WORKERS)
+        parser.add_argument('--interval', type=float, default=1.0, help="Navbat bo‘sh bo‘lganda kutish (soniya).")
+        parser.add_argument('--metrics-port', type=int, help="Worker metrikalarini shu portda /metrics orqali berish.")
+        parser.add_argument('--metrics-host', default='127.0.0.1', help="Metrikalar serveri manzili (standart: faqat lokal).")
+
+    def handle(self, *args, **options):
+        if options['once']:
+            total = 0
+            while processed := deliver_batch(options['batch_size'], options['workers']):
+                total += processed
+            self.stdout.write(f"✅ {total} ta xabar qayta ishlandi.")
+            return
+        if options['metrics_port']:
+            serve_metrics(options['metrics_port'], options['metrics_host'])
+        self.stdout.write("Telegram outbox worker ishga tushdi (to‘xtatish uchun Ctrl+C).")
+        try:
+            run_outbox_worker(
+                poll_interval=options['interval'], limit=options['batch_size'], workers=options['workers']
+            )
+        except KeyboardInterrupt:
+            self.stdout.write("To‘xtatildi.")
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def make_metrics_app(require_token):
+    def metrics_app(environ, start_response):
+        if environ['PATH_INFO'] != '/metrics':
+            start_response('404 Not Found', [('Content-Type', 'text/plain')])
+            return [b'']
+        if require_token and not metrics.has_valid_token(environ.get('HTTP_AUTHORIZATION')):
+            start_response('401 Unauthorized', [('Content-Type', 'text/plain')])
+            return [b'']
+        start_response('200 OK', [('Content-Type', metrics.CONTENT_TYPE)])
+        return [metrics.render().encode()]
+    return metrics_app
+
+
+def serve_metrics(port, host='127.0.0.1'):
+    """Worker jarayonining metrikalari (Telegram API vaqtlari) uchun fon HTTP server.
+
+    Lokal manzildan boshqa joyda tinglansa METRICS_TOKEN bearer tokeni talab qilinadi.
+    """
+    require_token = not ipaddress.ip_address(socket.gethostbyname(host)).is_loopback
+    if require_token and not settings.METRICS_TOKEN:
+        raise CommandError(f"{host} da metrikalarni berish uchun METRICS_TOKEN o‘rnatilishi kerak.")
+    server = make_server(host, port, make_metrics_app(require_token), handler_class=QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
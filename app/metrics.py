@@ -0,0 +1,34 @@
+import hmac
+from django.conf import settings
+from prometheus import CONTENT_TYPE, QUERY_COUNT_BUCKETS, Registry
+
+# Sayt jarayonining metrikalari; /metrics (views.metrics) orqali beriladi.
+REGISTRY = Registry()
+
+REQUESTS = REGISTRY.counter(
+    'django_http_requests_total', "HTTP so‘rovlar soni", ('view', 'method', 'status'))
+REQUEST_LATENCY = REGISTRY.histogram(
+    'django_http_request_duration_seconds', "So‘rovni qayta ishlash vaqti", ('view', 'method'))
+DB_QUERIES = REGISTRY.counter(
+    'django_db_queries_total', "Bajarilgan SQL so‘rovlar soni", ('view',))
+DB_QUERY_TIME = REGISTRY.counter(
+    'django_db_query_duration_seconds_total', "SQL so‘rovlarga ketgan umumiy vaqt", ('view',))
+DB_QUERIES_PER_REQUEST = REGISTRY.histogram(
+    'django_db_queries_per_request', "Bitta HTTP so‘rovdagi SQL so‘rovlar soni", ('view',), QUERY_COUNT_BUCKETS)
+CACHE_REQUESTS = REGISTRY.counter(
+    'django_cache_requests_total', "Kesh o‘qishlari (hit/miss)", ('result',))
+TELEGRAM_LATENCY = REGISTRY.histogram(
+    'telegram_api_request_duration_seconds', "Telegram Bot API chaqiruvlari vaqti", ('method', 'outcome'))
+
+
+def render():
+    return REGISTRY.render()
+
+
+def has_valid_token(authorization):
+    """`Authorization: Bearer <METRICS_TOKEN>` sarlavhasini tekshirish (token o‘rnatilmagan bo‘lsa False)."""
+    token = settings.METRICS_TOKEN
+    if not token or not authorization:
+        return False
+    scheme, _, value = authorization.partition(' ')
+    return scheme.lower() == 'bearer' and hmac.compare_digest(value.strip(), token)
@@ -0,0 +1,54 @@
+import logging
+import time
+from django.conf import settings
+from django.db import connection
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class MetricsMiddleware:
+    """Har bir so‘rov uchun vaqt, SQL so‘rovlar soni va vaqtini view nomi bo‘yicha yozish.
+
+    SLOW_REQUEST_MS sozlamasi berilsa, undan sekin so‘rovlar bajarilgan SQL bilan loglanadi.
+    MIDDLEWARE ro‘yxatining boshida turishi kerak.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        slow_ms = getattr(settings, 'SLOW_REQUEST_MS', None)
+        stats = {'count': 0, 'time': 0.0, 'sql': [] if slow_ms is not None else None}
+
+        def execute(execute, sql, params, many, context):
+            started = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                elapsed = time.perf_counter() - started
+                stats['count'] += 1
+                stats['time'] += elapsed
+                if stats['sql'] is not None:
+                    stats['sql'].append((elapsed, sql))
+
+        started = time.perf_counter()
+        with connection.execute_wrapper(execute):
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else 'unmatched'
+        metrics.REQUESTS.inc(view=view, method=request.method, status=response.status_code)
+        metrics.REQUEST_LATENCY.observe(elapsed, view=view, method=request.method)
+        metrics.DB_QUERIES.inc(stats['count'], view=view)
+        metrics.DB_QUERY_TIME.inc(stats['time'], view=view)
+        metrics.DB_QUERIES_PER_REQUEST.observe(stats['count'], view=view)
+
+        if slow_ms is not None and elapsed * 1000 >= slow_ms:
+            queries = '\n'.join(f"  {query_time * 1000:.1f} ms: {sql}" for query_time, sql in stats['sql'])
+            logger.warning(
+                f"Slow request {request.method} {request.path} ({view}): {elapsed * 1000:.1f} ms, "
+                f"{stats['count']} queries in {stats['time'] * 1000:.1f} ms\n{queries}"
+            )
+        return response
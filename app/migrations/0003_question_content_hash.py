@@ -0,0 +1,39 @@
+# Generated by Django 5.2.3 on 2026-10-17 21:14
+
+import hashlib
+
+from django.db import migrations, models
+
+
+def fill_content_hash(apps, schema_editor):
+    Question = apps.get_model('app', 'Question')
+    batch = []
+    for question in Question.objects.only('id', 'text').iterator(chunk_size=2000):
+        normalized = " ".join(question.text.split()).casefold()
+        question.content_hash = hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+        batch.append(question)
+        if len(batch) >= 2000:
+            Question.objects.bulk_update(batch, ['content_hash'])
+            batch = []
+    if batch:
+        Question.objects.bulk_update(batch, ['content_hash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0002_reklama'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='content_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+        migrations.RunPython(fill_content_hash, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['topic', 'content_hash'], name='app_questio_topic_i_05bf7c_idx'),
+        ),
+    ]
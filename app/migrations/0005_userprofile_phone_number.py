@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-17 21:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0004_telegram_outbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='phone_number',
+            field=models.CharField(blank=True, max_length=20),
+        ),
+    ]
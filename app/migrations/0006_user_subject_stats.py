@@ -0,0 +1,35 @@
+# Generated by Django 5.2.3 on 2026-10-17 21:24
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0005_userprofile_phone_number'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserSubjectStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('is_deleted', models.BooleanField(default=False)),
+                ('tests_count', models.PositiveIntegerField(default=0)),
+                ('total_score', models.FloatField(default=0)),
+                ('best_score', models.FloatField(default=0)),
+                ('average_score', models.FloatField(default=0)),
+                ('subject', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='user_stats', to='app.subject')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='subject_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['subject', '-best_score'], name='app_usersub_subject_9a038b_idx'), models.Index(fields=['subject', '-average_score'], name='app_usersub_subject_32c655_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'subject'), name='unique_user_subject_stats')],
+            },
+        ),
+    ]
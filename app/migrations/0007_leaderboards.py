@@ -0,0 +1,48 @@
+# Generated by Django 5.2.3 on 2026-10-17 21:26
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0006_user_subject_stats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('is_deleted', models.BooleanField(default=False)),
+                ('period', models.CharField(choices=[('day', 'Kunlik'), ('week', 'Haftalik'), ('all', 'Umumiy')], max_length=4)),
+                ('period_start', models.DateField()),
+                ('score', models.FloatField()),
+                ('subject', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard_entries', to='app.subject')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['subject', 'period', 'period_start', '-score', 'updated_at'], name='app_leaderb_subject_9a049c_idx')],
+                'constraints': [models.UniqueConstraint(fields=('subject', 'period', 'period_start', 'user'), name='unique_leaderboard_entry')],
+            },
+        ),
+        migrations.CreateModel(
+            name='LeaderboardScoreCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('day', 'Kunlik'), ('week', 'Haftalik'), ('all', 'Umumiy')], max_length=4)),
+                ('period_start', models.DateField()),
+                ('score', models.FloatField()),
+                ('users', models.PositiveIntegerField(default=0)),
+                ('subject', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='app.subject')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('subject', 'period', 'period_start', 'score'), name='unique_leaderboard_score')],
+            },
+        ),
+    ]
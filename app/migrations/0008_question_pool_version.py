@@ -0,0 +1,21 @@
+# Generated by Django 5.2.3 on 2026-10-17 21:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0007_leaderboards'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuestionPoolVersion',
+            fields=[
+                ('subject', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to='app.subject')),
+                ('version', models.CharField(max_length=32)),
+            ],
+        ),
+    ]
@@ -3,6 +3,7 @@ from django.contrib.auth.models import User
 from django.utils.text import slugify
 from django.utils import timezone
 from django.core.exceptions import ValidationError
+import hashlib
 import logging
 
 logger = logging.getLogger(__name__)
@@ -37,10 +38,15 @@ class Reklama(BaseModel):
 class UserProfile(BaseModel):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     bio = models.TextField(blank=True)
+    phone_number = models.CharField(max_length=20, blank=True)
     total_tests = models.PositiveIntegerField(default=0)
     total_score = models.FloatField(default=0)
     profile_picture = models.ImageField(upload_to='profiles/', null=True, blank=True)
 
+    @property
+    def average_score(self):
+        return round(self.total_score / self.total_tests, 2) if self.total_tests else 0.0
+
     def __str__(self):
         return self.user.username
 
@@ -101,6 +107,11 @@ class Topic(BaseModel):
         ordering = ['subject', 'name']
         indexes = [models.Index(fields=['slug', 'subject'])]
 
+def question_content_hash(text):
+    """Savol matnining normallashtirilgan SHA-256 xeshi (takroriy savollarni aniqlash uchun)."""
+    normalized = " ".join(text.split()).casefold()
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
 # === Savol ===
 class Question(BaseModel):
     topic = models.ForeignKey(Topic, on_delete=models.CASCADE, related_name='questions')
@@ -113,6 +124,11 @@ class Question(BaseModel):
     )
     is_active = models.BooleanField(default=True)
     explanation = models.TextField(blank=True, help_text="To‘g‘ri javob izohi")
+    content_hash = models.CharField(max_length=64, blank=True, editable=False)
+
+    def save(self, *args, **kwargs):
+        self.content_hash = question_content_hash(self.text)
+        super().save(*args, **kwargs)
 
     def clean(self):
         if self.pk and not self.options.filter(is_correct=True).exists():
@@ -133,7 +149,16 @@ class Question(BaseModel):
         return options
 
     class Meta:
-        indexes = [models.Index(fields=['topic', 'is_active'])]
+        indexes = [
+            models.Index(fields=['topic', 'is_active']),
+            models.Index(fields=['topic', 'content_hash']),
+        ]
+
+class QuestionPoolVersion(models.Model):
+    """Fan savollari pooli versiyasi. Savollar o‘zgarganda yangilanadi; bazada turgani uchun
+    har bir worker jarayoni o‘z xotiradagi poolining eskirganini ko‘radi."""
+    subject = models.OneToOneField(Subject, on_delete=models.CASCADE, primary_key=True, related_name='+')
+    version = models.CharField(max_length=32)
 
 # === Variantlar ===
 class AnswerOption(BaseModel):
@@ -178,12 +203,12 @@ class TestSession(BaseModel):
         return end_time - self.started_at
 
     def calculate_score(self):
-        answers = self.answers.all()
-        if not answers:
-            return 0.0
-        correct = answers.filter(selected_option__is_correct=True).count()
-        total = answers.count()
-        return round((correct / total) * 100, 2) if total else 0.0
+        counts = self.answers.aggregate(
+            total=models.Count('id'),
+            correct=models.Count('id', filter=models.Q(is_correct=True)),
+        )
+        total = counts['total']
+        return round((counts['correct'] / total) * 100, 2) if total else 0.0
 
     def __str__(self):
         return f"{self.user.username} - {self.subject.name} - {self.started_at.strftime('%Y-%m-%d')}"
@@ -191,6 +216,61 @@ class TestSession(BaseModel):
     class Meta:
         indexes = [models.Index(fields=['user', 'subject', 'completed'])]
 
+# === Foydalanuvchining fan bo‘yicha statistikasi (Result yaratilganda yangilanadi) ===
+class UserSubjectStats(BaseModel):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='subject_stats')
+    subject = models.ForeignKey(Subject, on_delete=models.CASCADE, related_name='user_stats')
+    tests_count = models.PositiveIntegerField(default=0)
+    total_score = models.FloatField(default=0)
+    best_score = models.FloatField(default=0)
+    average_score = models.FloatField(default=0)
+
+    def __str__(self):
+        return f"{self.user.username} - {self.subject.name}: {self.best_score}%"
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['user', 'subject'], name='unique_user_subject_stats')]
+        indexes = [
+            models.Index(fields=['subject', '-best_score']),
+            models.Index(fields=['subject', '-average_score']),
+        ]
+
+# === Reyting jadvallari (kunlik, haftalik, umumiy) ===
+LEADERBOARD_PERIODS = [('day', 'Kunlik'), ('week', 'Haftalik'), ('all', 'Umumiy')]
+
+
+class LeaderboardEntry(BaseModel):
+    """Foydalanuvchining davrdagi eng yaxshi natijasi. `period_start` umumiy reyting uchun 1970-01-01."""
+    subject = models.ForeignKey(Subject, on_delete=models.CASCADE, related_name='leaderboard_entries')
+    period = models.CharField(max_length=4, choices=LEADERBOARD_PERIODS)
+    period_start = models.DateField()
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='leaderboard_entries')
+    score = models.FloatField()
+
+    def __str__(self):
+        return f"{self.subject.name} {self.period} {self.period_start}: {self.user.username} - {self.score}%"
+
+    class Meta:
+        constraints = [models.UniqueConstraint(
+            fields=['subject', 'period', 'period_start', 'user'], name='unique_leaderboard_entry'
+        )]
+        indexes = [models.Index(fields=['subject', 'period', 'period_start', '-score', 'updated_at'])]
+
+
+class LeaderboardScoreCount(models.Model):
+    """Reytingdagi har bir ball uchun foydalanuvchilar soni. O‘rinni hisoblash
+    foydalanuvchilar soniga emas, turli ballar soniga (ko‘pi bilan 10001 ta) bog‘liq."""
+    subject = models.ForeignKey(Subject, on_delete=models.CASCADE, related_name='+')
+    period = models.CharField(max_length=4, choices=LEADERBOARD_PERIODS)
+    period_start = models.DateField()
+    score = models.FloatField()
+    users = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(
+            fields=['subject', 'period', 'period_start', 'score'], name='unique_leaderboard_score'
+        )]
+
 # === Foydalanuvchi javobi ===
 class UserAnswer(BaseModel):
     test_session = models.ForeignKey(TestSession, on_delete=models.CASCADE, related_name='answers')
@@ -249,4 +329,26 @@ class Feedback(BaseModel):
 
     class Meta:
         ordering = ['-created_at']
-        indexes = [models.Index(fields=['user', 'status'])]
\ No newline at end of file
+        indexes = [models.Index(fields=['user', 'status'])]
+
+# === Telegram xabarlari navbati (outbox) ===
+class TelegramOutbox(BaseModel):
+    STATUS_CHOICES = [
+        ('pending', 'Kutilmoqda'),
+        ('sent', 'Yuborildi'),
+        ('failed', 'Yuborilmadi'),
+    ]
+
+    chat_id = models.CharField(max_length=64)
+    text = models.TextField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.chat_id} - {self.status}"
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'next_attempt_at'])]
@@ -0,0 +1,130 @@
+import logging
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+import requests
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from . import metrics
+from .models import TelegramOutbox
+
+logger = logging.getLogger(__name__)
+
+TELEGRAM_API_URL = getattr(settings, 'TELEGRAM_API_URL', 'https://api.telegram.org')
+TELEGRAM_TIMEOUT = getattr(settings, 'TELEGRAM_TIMEOUT', 10)
+OUTBOX_BATCH_SIZE = getattr(settings, 'TELEGRAM_OUTBOX_BATCH_SIZE', 50)
+OUTBOX_WORKERS = getattr(settings, 'TELEGRAM_OUTBOX_WORKERS', 4)
+OUTBOX_MAX_ATTEMPTS = getattr(settings, 'TELEGRAM_OUTBOX_MAX_ATTEMPTS', 8)
+# Ijara paketni yuborishning eng yomon vaqtidan shuncha marta uzun (lease_seconds)
+OUTBOX_LEASE_MARGIN = 1.5
+MAX_BACKOFF_SECONDS = 3600
+
+
+def enqueue_telegram_message(chat_id, text):
+    """Xabarni navbatga yozish. Chaqiruvchi tranzaksiyasi bilan birga saqlanadi, tarmoqqa murojaat qilinmaydi."""
+    return TelegramOutbox.objects.create(chat_id=str(chat_id), text=text)
+
+
+def backoff_seconds(attempts):
+    return min(2 ** attempts, MAX_BACKOFF_SECONDS)
+
+
+def send_message(http, chat_id, text):
+    """Bitta xabarni yuborish. (natija, xato, kutish_soniyasi) qaytaradi: natija 'sent', 'retry' yoki 'failed'."""
+    started = time.perf_counter()
+    result = _send_message(http, chat_id, text)
+    metrics.TELEGRAM_LATENCY.observe(time.perf_counter() - started, method='sendMessage', outcome=result[0])
+    return result
+
+
+def _send_message(http, chat_id, text):
+    url = f"{TELEGRAM_API_URL}/bot{settings.TELEGRAM_BOT_TOKEN}/sendMessage"
+    try:
+        response = http.post(url, data={'chat_id': chat_id, 'text': text}, timeout=TELEGRAM_TIMEOUT)
+    except requests.RequestException as e:
+        return 'retry', str(e), None
+    if response.ok:
+        return 'sent', '', None
+    try:
+        payload = response.json()
+    except ValueError:
+        payload = {}
+    error = f"{response.status_code}: {payload.get('description', response.text[:200])}"
+    if response.status_code == 429:
+        return 'retry', error, payload.get('parameters', {}).get('retry_after')
+    if response.status_code >= 500:
+        return 'retry', error, None
+    # 400/403 kabi xatolar qayta urinish bilan tuzalmaydi
+    return 'failed', error, None
+
+
+def lease_seconds(limit=OUTBOX_BATCH_SIZE, workers=OUTBOX_WORKERS):
+    """Olingan paket shu vaqt ichida yakunlanmasa (masalan, worker o‘chib qolsa), qayta yuboriladi.
+
+    Eng yomon holatda har bir xabar ulanish va o‘qish timeoutini to‘liq kutadi, paket esa
+    `workers` ta oqimda ceil(limit / workers) navbat bilan yuboriladi.
+    """
+    rounds = math.ceil(limit / max(1, min(workers, limit)))
+    return rounds * 2 * TELEGRAM_TIMEOUT * OUTBOX_LEASE_MARGIN
+
+
+def claim_batch(limit=OUTBOX_BATCH_SIZE, workers=OUTBOX_WORKERS):
+    """Vaqti kelgan xabarlarni olish va boshqa workerlar olmasligi uchun ijaraga belgilash."""
+    now = timezone.now()
+    with transaction.atomic():
+        messages = list(TelegramOutbox.objects.select_for_update(skip_locked=True).filter(
+            status='pending', next_attempt_at__lte=now
+        ).order_by('next_attempt_at', 'id')[:limit])
+        if messages:
+            TelegramOutbox.objects.filter(id__in=[m.id for m in messages]).update(
+                next_attempt_at=now + timedelta(seconds=lease_seconds(limit, workers))
+            )
+    return messages
+
+
+def deliver_batch(limit=OUTBOX_BATCH_SIZE, workers=OUTBOX_WORKERS, http=None):
+    """Bitta paketni parallel yuborib, natijalarni bitta bulk_update bilan yozish. Qayta ishlangan xabarlar sonini qaytaradi."""
+    messages = claim_batch(limit, workers)
+    if not messages:
+        return 0
+    http = http or requests.Session()
+    with ThreadPoolExecutor(max_workers=min(workers, len(messages))) as executor:
+        results = list(executor.map(lambda m: send_message(http, m.chat_id, m.text), messages))
+
+    now = timezone.now()
+    for message, (outcome, error, retry_after) in zip(messages, results):
+        message.attempts += 1
+        message.last_error = error
+        if outcome == 'sent':
+            message.status = 'sent'
+            message.sent_at = now
+        elif outcome == 'failed' or message.attempts >= OUTBOX_MAX_ATTEMPTS:
+            message.status = 'failed'
+            logger.error(f"Telegram message {message.id} to {message.chat_id} failed: {error}")
+        else:
+            delay = retry_after or backoff_seconds(message.attempts)
+            message.next_attempt_at = now + timedelta(seconds=delay)
+            logger.warning(f"Telegram message {message.id} will be retried in {delay}s: {error}")
+    TelegramOutbox.objects.bulk_update(
+        messages, ['status', 'attempts', 'last_error', 'sent_at', 'next_attempt_at', 'updated_at']
+    )
+    sent = sum(1 for m in messages if m.status == 'sent')
+    logger.info(f"Telegram outbox batch: {sent}/{len(messages)} sent")
+    return len(messages)
+
+
+def run_outbox_worker(stop_event=None, poll_interval=1.0, limit=OUTBOX_BATCH_SIZE, workers=OUTBOX_WORKERS):
+    """Navbatni to‘xtatilguncha qayta ishlash. Navbat bo‘sh bo‘lsa `poll_interval` kutadi."""
+    stop_event = stop_event or threading.Event()
+    http = requests.Session()
+    while not stop_event.is_set():
+        try:
+            processed = deliver_batch(limit, workers, http)
+        except Exception as e:
+            logger.error(f"Telegram outbox worker error: {e}")
+            processed = 0
+        if not processed:
+            stop_event.wait(poll_interval)
@@ -0,0 +1,62 @@
+import random
+import threading
+import time
+import uuid
+from django.conf import settings
+from django.db.models import Count
+from .models import Question, QuestionPoolVersion
+
+OPTIONS_PER_QUESTION = getattr(settings, 'OPTIONS_PER_QUESTION', 4)
+# Jarayon ichidagi pool eng ko‘pi bilan shuncha soniya saqlanadi (qo‘shimcha himoya)
+QUESTION_POOL_TIMEOUT = getattr(settings, 'QUESTION_POOL_TIMEOUT', 600)
+
+# subject_id -> (generation, expires_at, question_ids)
+_pools = {}
+_lock = threading.Lock()
+
+
+def _get_generation(subject_id):
+    # Versiya bazada: default kesh (LocMem) har bir jarayonda alohida, bazani esa barcha workerlar ko‘radi
+    return QuestionPoolVersion.objects.filter(subject_id=subject_id).values_list('version', flat=True).first()
+
+
+def _load_question_ids(subject_id):
+    return tuple(Question.objects.filter(
+        topic__subject_id=subject_id, is_active=True, is_deleted=False
+    ).annotate(option_count=Count('options')).filter(
+        option_count=OPTIONS_PER_QUESTION
+    ).order_by().values_list('id', flat=True))
+
+
+def get_question_pool(subject_id):
+    """Fan bo‘yicha test uchun yaroqli savollar ID lari (xotirada keshlangan)."""
+    generation = _get_generation(subject_id)
+    pool = _pools.get(subject_id)
+    if pool and pool[0] == generation and pool[1] > time.monotonic():
+        return pool[2]
+    question_ids = _load_question_ids(subject_id)
+    with _lock:
+        _pools[subject_id] = (generation, time.monotonic() + QUESTION_POOL_TIMEOUT, question_ids)
+    return question_ids
+
+
+def sample_question_ids(subject_id, count):
+    """Pooldan `count` ta tasodifiy savol tanlash; yetarli savol bo‘lmasa None."""
+    pool = get_question_pool(subject_id)
+    if len(pool) < count:
+        return None
+    return random.sample(pool, count)
+
+
+def invalidate_question_pool(*subject_ids):
+    """Savollar o‘zgarganda fan poolini eskirgan deb belgilash.
+
+    Versiya bazaga yoziladi, shuning uchun boshqa worker jarayonlari ham keyingi
+    get_question_pool chaqiruvida poolni qayta yuklaydi.
+    """
+    for subject_id in set(subject_ids):
+        if subject_id is None:
+            continue
+        QuestionPoolVersion.objects.update_or_create(subject_id=subject_id, defaults={'version': uuid.uuid4().hex})
+        with _lock:
+            _pools.pop(subject_id, None)
@@ -0,0 +1,45 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.core.cache import cache
+from .models import Subject, Reklama, Topic, Question, AnswerOption, Result, TestSession
+from .question_pool import invalidate_question_pool
+from .site_cache import bump_content_version, result_page_cache_key
+from .user_stats import record_result
+from .leaderboard import record_score
+
+
+@receiver([post_save, post_delete], sender=Subject)
+@receiver([post_save, post_delete], sender=Reklama)
+def site_content_changed(sender, instance, **kwargs):
+    bump_content_version()
+
+
+@receiver([post_save, post_delete], sender=Topic)
+def topic_changed(sender, instance, **kwargs):
+    invalidate_question_pool(instance.subject_id)
+
+
+@receiver([post_save, post_delete], sender=Question)
+def question_changed(sender, instance, **kwargs):
+    subject_id = Topic.objects.filter(pk=instance.topic_id).values_list('subject_id', flat=True).first()
+    invalidate_question_pool(subject_id)
+
+
+@receiver([post_save, post_delete], sender=AnswerOption)
+def answer_option_changed(sender, instance, **kwargs):
+    subject_id = Question.objects.filter(pk=instance.question_id).values_list('topic__subject_id', flat=True).first()
+    invalidate_question_pool(subject_id)
+
+
+@receiver(post_save, sender=Result)
+def result_created(sender, instance, created, **kwargs):
+    if created:
+        session = instance.test_session
+        record_result(session.user_id, session.subject_id, instance.percent)
+        record_score(session.user_id, session.subject_id, instance.percent)
+
+
+@receiver([post_save, post_delete], sender=TestSession)
+def test_session_changed(sender, instance, **kwargs):
+    # Masalan, admin sessiyani o‘chirsa, keshlangan natija sahifasi ham eskiradi
+    cache.delete(result_page_cache_key(instance.id))
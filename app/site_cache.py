@@ -0,0 +1,65 @@
+import hashlib
+import time
+from datetime import datetime, timezone as dt_timezone
+from functools import wraps
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+
+# Sahifa/fragment keshining maksimal yoshi. Reklamalar start/end_date bo‘yicha
+# signal yubormasdan almashadi, shuning uchun kontent versiyasi shu oraliqda yangilanadi.
+SITE_CACHE_TIMEOUT = getattr(settings, 'SITE_CACHE_TIMEOUT', 300)
+CONTENT_VERSION_KEY = "site_content:version"
+
+
+def get_content_version():
+    """Subject/Reklama oxirgi o‘zgargan vaqt (unix timestamp)."""
+    version = cache.get(CONTENT_VERSION_KEY)
+    if version is None:
+        cache.add(CONTENT_VERSION_KEY, time.time(), None)
+        version = cache.get(CONTENT_VERSION_KEY)
+    return version
+
+
+def bump_content_version():
+    """Subject yoki Reklama o‘zgarganda barcha sahifa va fragment keshlarini eskirtirish."""
+    cache.set(CONTENT_VERSION_KEY, time.time(), None)
+
+
+def content_timestamp():
+    """Kontent holati (millisekundlarda): oxirgi o‘zgarish yoki joriy oraliq boshi, qaysi biri keyin bo‘lsa."""
+    window_start = time.time() // SITE_CACHE_TIMEOUT * SITE_CACHE_TIMEOUT
+    return int(max(get_content_version(), window_start) * 1000)
+
+
+def content_last_modified(request, *args, **kwargs):
+    return datetime.fromtimestamp(content_timestamp() / 1000, tz=dt_timezone.utc)
+
+
+def content_etag(request, *args, **kwargs):
+    # Navbarda foydalanuvchi nomi chiqadi, shuning uchun ETag foydalanuvchiga bog‘liq
+    user_id = request.user.pk if request.user.is_authenticated else 0
+    return f"{content_timestamp()}-{user_id}"
+
+
+def cache_anonymous_page(view):
+    """Anonim GET so‘rovlar uchun tayyor HTML ni keshdan qaytarish (kalit kontent versiyasiga bog‘liq)."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method != 'GET' or request.user.is_authenticated:
+            return view(request, *args, **kwargs)
+        path_hash = hashlib.md5(request.path.encode()).hexdigest()
+        key = f"page:{content_timestamp()}:{path_hash}"
+        content = cache.get(key)
+        if content is not None:
+            return HttpResponse(content)
+        response = view(request, *args, **kwargs)
+        if response.status_code == 200 and not response.streaming:
+            cache.set(key, response.content, SITE_CACHE_TIMEOUT)
+        return response
+    return wrapper
+
+
+def result_page_cache_key(session_id):
+    """Yakunlangan test natijasi sahifasi (views.view_results) uchun kalit."""
+    return f"result_page:{session_id}"
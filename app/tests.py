@@ -1,3 +1,1197 @@
-from django.test import TestCase
+import asyncio
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from io import StringIO
+from types import SimpleNamespace
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
 
-# Create your tests here.
+from aiogram.exceptions import TelegramRetryAfter, TelegramServerError
+from aiogram.methods import SendMessage
+from aiohttp.test_utils import make_mocked_request
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import Subject, Topic, Question, AnswerOption, TestSession, UserAnswer, Result, TelegramOutbox, UserProfile, UserSubjectStats, QuestionPoolVersion
+from . import metrics, notifications, question_pool
+from .answer_store import AnswerStore, check_answer_cache, upsert_answers
+from .cache_backends import AnswerFileCache
+from .import_questions_from_json import iter_json_array
+from .management.commands.send_telegram_outbox import serve_metrics
+from .notifications import claim_batch, deliver_batch, enqueue_telegram_message
+from .leaderboard import get_leaderboard, get_user_rank, rebuild_leaderboards, record_score
+import broadcast
+import database
+import handlers
+import webhook
+from login_token import make_login_token
+
+
+def create_question_bank(subject_name="Matematika", count=30):
+    """Fan, mavzu va har birida 4 ta variantli `count` ta savol yaratish."""
+    subject = Subject.objects.create(name=subject_name)
+    topic = Topic.objects.create(subject=subject, name=f"{subject_name} umumiy")
+    questions = Question.objects.bulk_create([
+        Question(topic=topic, text=f"{subject_name} savol {i}") for i in range(count)
+    ])
+    AnswerOption.objects.bulk_create([
+        AnswerOption(question=question, label=label, text=f"Variant {label}", is_correct=(label == 'A'))
+        for question in questions
+        for label in 'ABCD'
+    ])
+    return subject, questions
+
+
+class TestSessionViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="1000001", password="parol")
+        cls.subject, cls.questions = create_question_bank()
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+        self.session = TestSession.objects.create(
+            user=self.user, subject=self.subject,
+            randomized_question_ids=[question.id for question in self.questions]
+        )
+        self.url = reverse('app:test_session', kwargs={'session_id': self.session.id})
+
+    def answer(self, questions):
+        for question in questions:
+            option = question.options.get(label='B')
+            UserAnswer.objects.create(test_session=self.session, question=question, selected_option=option)
+
+    def test_renders_all_questions_and_selected_answers(self):
+        self.answer(self.questions[:3])
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['questions']), 30)
+        self.assertEqual(response.context['answered_count'], 3)
+        self.assertEqual(
+            [q['id'] for q in response.context['questions']],
+            self.session.randomized_question_ids
+        )
+        self.assertContains(response, 'checked', count=3)
+
+    def test_query_count_is_constant_for_30_questions(self):
+        # foydalanuvchi + test sessiyasi + savollar/variantlar + javoblar
+        # (Django sessiyasi cached_db keshidan o‘qiladi va qayta yozilmaydi)
+        with self.assertNumQueries(4):
+            self.client.get(self.url)
+        self.answer(self.questions)
+        # Savollar keshlangan: variantlar so‘rovi endi bajarilmaydi, javoblar soni ahamiyatsiz
+        with self.assertNumQueries(3):
+            self.client.get(self.url)
+
+
+class SaveAnswerViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="1000002", password="parol")
+        cls.subject, cls.questions = create_question_bank()
+        cls.session = TestSession.objects.create(
+            user=cls.user, subject=cls.subject,
+            randomized_question_ids=[question.id for question in cls.questions]
+        )
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def save(self, question, option_id):
+        url = reverse('app:save_answer', kwargs={'session_id': self.session.id, 'question_id': question.id})
+        return self.client.post(url, {'answer_id': option_id}).json()
+
+    def test_upserts_single_answer_per_question(self):
+        question = self.questions[0]
+        wrong, correct = question.options.get(label='B'), question.options.get(label='A')
+        self.assertEqual(self.save(question, wrong.id)['status'], 'success')
+        # foydalanuvchi + tekshiruv + upsert
+        with self.assertNumQueries(3):
+            self.assertEqual(self.save(question, correct.id)['status'], 'success')
+        answer = UserAnswer.objects.get(test_session=self.session, question=question)
+        self.assertEqual(answer.selected_option, correct)
+        self.assertTrue(answer.is_correct)
+
+    def test_rejects_option_from_another_question(self):
+        other_option = self.questions[1].options.first()
+        self.assertEqual(self.save(self.questions[0], other_option.id)['status'], 'error')
+        self.assertFalse(UserAnswer.objects.exists())
+
+    def test_does_not_write_django_session(self):
+        question = self.questions[0]
+        session_key = self.client.session.session_key
+        self.save(question, question.options.first().id)
+        self.assertEqual(self.client.session.session_key, session_key)
+        self.assertNotIn('selected_answers', self.client.session)
+
+    def test_rejects_foreign_session(self):
+        self.client.force_login(User.objects.create_user(username="1000003", password="parol"))
+        self.assertEqual(self.save(self.questions[0], self.questions[0].options.first().id)['status'], 'error')
+        self.assertFalse(UserAnswer.objects.exists())
+
+
+class SubmitTestViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="1000004", password="parol")
+        UserProfile.objects.create(user=cls.user)
+        cls.subject, cls.questions = create_question_bank()
+        UserSubjectStats.objects.create(user=cls.user, subject=cls.subject)
+        record_score(cls.user.id, cls.subject.id, 100.0)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        self.session = TestSession.objects.create(
+            user=self.user, subject=self.subject,
+            randomized_question_ids=[question.id for question in self.questions]
+        )
+        self.url = reverse('app:submit_test', kwargs={'session_id': self.session.id})
+
+    def form(self, questions, label):
+        options = AnswerOption.objects.filter(question__in=questions, label=label)
+        return {f"answer_{option.question_id}": option.id for option in options}
+
+    def test_scores_30_answers_with_constant_queries(self):
+        data = {**self.form(self.questions[:20], 'A'), **self.form(self.questions[20:], 'B')}
+        # foydalanuvchi + qulf (fan bilan) + variantlar + upsert + agregat + sessiya + natija
+        # + profil/fan statistikasi UPDATE + reyting SELECT (ball oshmadi) + outbox
+        # (qolganlari SAVEPOINT/RELEASE); javoblar soniga bog‘liq emas, Telegramga murojaat yo‘q
+        with self.assertNumQueries(15):
+            response = self.client.post(self.url, data).json()
+        self.assertEqual(response['status'], 'success')
+        self.session.refresh_from_db()
+        self.assertTrue(self.session.completed)
+        self.assertEqual(UserAnswer.objects.filter(test_session=self.session).count(), 30)
+        result = Result.objects.get(test_session=self.session)
+        self.assertEqual((result.correct_answers, result.total_questions), (20, 30))
+        self.assertEqual(result.percent, 66.67)
+        notification = TelegramOutbox.objects.get()
+        self.assertEqual(notification.chat_id, self.user.username)
+        self.assertIn("20/30", notification.text)
+
+    def test_ignores_foreign_questions_and_mismatched_options(self):
+        other_subject, other_questions = create_question_bank("Fizika", count=1)
+        data = self.form(self.questions[:2], 'A')
+        data[f"answer_{self.questions[2].id}"] = self.questions[3].options.first().id
+        data[f"answer_{other_questions[0].id}"] = other_questions[0].options.first().id
+        self.client.post(self.url, data)
+        result = Result.objects.get(test_session=self.session)
+        self.assertEqual((result.correct_answers, result.total_questions), (2, 2))
+
+    def test_second_submit_does_not_rescore(self):
+        self.client.post(self.url, self.form(self.questions, 'A'))
+        response = self.client.post(self.url, self.form(self.questions, 'B')).json()
+        self.assertEqual(response['status'], 'success')
+        self.assertEqual(Result.objects.get(test_session=self.session).correct_answers, 30)
+
+
+class StubTelegramHandler(BaseHTTPRequestHandler):
+    """sendMessage uchun navbatdagi javobni qaytaruvchi mahalliy Bot API stubi."""
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        status, payload = self.server.responses.pop(0) if self.server.responses else (200, {'ok': True})
+        self.server.requests.append(self.path)
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TelegramOutboxWorkerTests(TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubTelegramHandler)
+        self.server.responses, self.server.requests = [], []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        patcher = mock.patch('app.notifications.TELEGRAM_API_URL', f"http://127.0.0.1:{self.server.server_port}")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_delivers_batch_and_marks_sent(self):
+        for chat_id in range(5):
+            enqueue_telegram_message(chat_id, "salom")
+        self.assertEqual(deliver_batch(), 5)
+        self.assertEqual(len(self.server.requests), 5)
+        self.assertEqual(TelegramOutbox.objects.filter(status='sent', attempts=1).count(), 5)
+        # Yuborilganlar qayta olinmaydi
+        self.assertEqual(deliver_batch(), 0)
+
+    def test_retries_with_backoff_and_honours_retry_after(self):
+        server_error = enqueue_telegram_message(1, "a")
+        flood = enqueue_telegram_message(2, "b")
+        self.server.responses = [
+            (500, {'ok': False, 'description': 'Internal'}),
+            (429, {'ok': False, 'description': 'Too Many Requests', 'parameters': {'retry_after': 30}}),
+        ]
+        deliver_batch(workers=1)
+        server_error.refresh_from_db()
+        flood.refresh_from_db()
+        self.assertEqual((server_error.status, server_error.attempts), ('pending', 1))
+        self.assertAlmostEqual((flood.next_attempt_at - flood.updated_at).total_seconds(), 30, delta=1)
+        self.assertIn('Too Many Requests', flood.last_error)
+        # Vaqti kelmagan xabarlar olinmaydi
+        self.assertEqual(deliver_batch(), 0)
+
+    def test_client_error_fails_without_retry(self):
+        message = enqueue_telegram_message(3, "c")
+        self.server.responses = [(403, {'ok': False, 'description': 'Forbidden: bot was blocked by the user'})]
+        deliver_batch()
+        message.refresh_from_db()
+        self.assertEqual((message.status, message.attempts), ('failed', 1))
+
+    def test_lease_outlasts_slowest_batch(self):
+        for chat_id in range(50):
+            enqueue_telegram_message(chat_id, "salom")
+        claimed = claim_batch(50, 4)
+        # 50 ta xabar 4 oqimda: 13 navbat, har biri ulanish + o‘qish timeouti
+        slowest = timezone.now() + timedelta(seconds=13 * 2 * notifications.TELEGRAM_TIMEOUT)
+        with mock.patch('app.notifications.timezone.now', return_value=slowest):
+            self.assertEqual(claim_batch(50, 4), [])
+        self.assertEqual(len(claimed), 50)
+
+
+class FakeBroadcastBot:
+    """send_message chaqiruvlarini yozib boradi; `failures` dagi xatolarni navbat bilan ko'taradi."""
+
+    def __init__(self, failures=()):
+        self.sent = []
+        self.failures = list(failures)
+
+    async def send_message(self, chat_id, text, **kwargs):
+        if self.failures:
+            raise self.failures.pop(0)
+        self.sent.append(chat_id)
+
+
+class BotDatabaseTestCase(SimpleTestCase):
+    """Har bir test uchun vaqtinchalik bot bazasi (database.DATABASE_PATH)."""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        # Asosiy oqimning ulanishi oldingi testning bazasiga ochiq qolgan bo'lishi mumkin
+        database.close_connection()
+        self.db_path = os.path.join(tmp.name, "users.db")
+        patcher = mock.patch('database.DATABASE_PATH', self.db_path)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(database.close_connection)
+        self.addCleanup(database.shutdown_db_executor)
+        database.user_cache.clear()
+        self.addCleanup(database.user_cache.clear)
+        database.init_db()
+
+
+class BroadcastTests(BotDatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        for i in range(5):
+            database.register_user(f"10{i}", "Ism", "Familiya", "+998901234567")
+
+    def run_engine(self, bot, broadcast_id):
+        engine = broadcast.BroadcastEngine(
+            bot, broadcast_id, "Reklama", limiter=broadcast.RateLimiter(rate=1000, per_chat_interval=0)
+        )
+        return asyncio.run(engine.run())
+
+    def test_token_bucket_paces_sends(self):
+        async def acquire_all(bucket, count):
+            started = time.monotonic()
+            for _ in range(count):
+                await bucket.acquire()
+            return time.monotonic() - started
+
+        # Birinchi token darhol, qolgan 10 tasi sekundiga 50 tadan
+        elapsed = asyncio.run(acquire_all(broadcast.TokenBucket(rate=50, capacity=1), 11))
+        self.assertGreaterEqual(elapsed, 0.18)
+        self.assertLess(elapsed, 0.5)
+
+    def test_token_bucket_pause_blocks_acquire(self):
+        async def paused_acquire():
+            bucket = broadcast.TokenBucket(rate=1000)
+            bucket.pause(0.1)
+            started = time.monotonic()
+            await bucket.acquire()
+            return time.monotonic() - started
+
+        self.assertGreaterEqual(asyncio.run(paused_acquire()), 0.09)
+
+    def test_token_bucket_does_not_burst_after_pause(self):
+        async def acquire_after_pause(count):
+            bucket = broadcast.TokenBucket(rate=50, capacity=10)
+            bucket.pause(0.05)
+            await bucket.acquire()
+            started = time.monotonic()
+            for _ in range(count):
+                await bucket.acquire()
+            return time.monotonic() - started
+
+        # To'xtashdan keyin tokenlar noldan, sekundiga 50 tadan to'planadi
+        self.assertGreaterEqual(asyncio.run(acquire_after_pause(5)), 0.08)
+
+    def test_resume_sends_only_pending_recipients(self):
+        broadcast_id = database.create_broadcast("Reklama")
+        # Bot qulashidan oldin ikkitasiga yuborilgan
+        database.mark_broadcast_recipients(broadcast_id, [("100", "sent", None), ("101", "sent", None)])
+        bot = FakeBroadcastBot()
+
+        async def resume():
+            self.assertEqual(await broadcast.resume_broadcasts(bot), 1)
+            await broadcast._running[broadcast_id]
+
+        asyncio.run(resume())
+        self.assertEqual(sorted(bot.sent), ["102", "103", "104"])
+        self.assertEqual(database.get_broadcast_stats(broadcast_id), {"sent": 5})
+        self.assertEqual(database.get_unfinished_broadcasts(), [])
+
+    def test_flood_wait_does_not_use_up_attempts(self):
+        broadcast_id = database.create_broadcast("Reklama")
+        method = SendMessage(chat_id=100, text="Reklama")
+        flood = [TelegramRetryAfter(method, "Too Many Requests", retry_after=0)
+                 for _ in range(broadcast.MAX_SEND_ATTEMPTS + 2)]
+        with self.assertLogs('broadcast', level='WARNING'):
+            counts = self.run_engine(FakeBroadcastBot(flood), broadcast_id)
+        self.assertEqual(counts, {"sent": 5, "pending": 0})
+
+    def test_server_errors_use_up_attempts(self):
+        broadcast_id = database.create_broadcast("Reklama")
+        method = SendMessage(chat_id=100, text="Reklama")
+        errors = [TelegramServerError(method, "Internal") for _ in range(broadcast.MAX_SEND_ATTEMPTS)]
+        with mock.patch('broadcast._backoff_sleep', new=mock.AsyncMock()) as backoff, \
+                self.assertLogs('broadcast', level='WARNING'):
+            counts = self.run_engine(FakeBroadcastBot(errors), broadcast_id)
+        self.assertEqual((counts["sent"], counts["failed"]), (4, 1))
+        self.assertEqual(backoff.await_count, broadcast.MAX_SEND_ATTEMPTS - 1)
+
+    def test_failed_status_write_is_retried(self):
+        broadcast_id = database.create_broadcast("Reklama")
+        calls = []
+
+        def flaky_mark(*args):
+            # Birinchi yozish muvaffaqiyatsiz (masalan, baza qulflangan)
+            calls.append(args)
+            return len(calls) > 1 and database.mark_broadcast_recipients(*args)
+
+        with mock.patch('broadcast.mark_broadcast_recipients', side_effect=flaky_mark), \
+                mock.patch('broadcast.FLUSH_RETRY_DELAY', 0), \
+                self.assertLogs('broadcast', level='WARNING'):
+            self.run_engine(FakeBroadcastBot(), broadcast_id)
+        self.assertEqual(database.get_broadcast_stats(broadcast_id), {"sent": 5})
+        self.assertEqual(database.get_unfinished_broadcasts(), [])
+
+    def test_unsaved_statuses_leave_broadcast_resumable(self):
+        broadcast_id = database.create_broadcast("Reklama")
+        with mock.patch('broadcast.mark_broadcast_recipients', return_value=False), \
+                mock.patch('broadcast.FLUSH_RETRY_DELAY', 0), \
+                self.assertLogs('broadcast', level='ERROR') as logs:
+            self.run_engine(FakeBroadcastBot(), broadcast_id)
+        self.assertIn("recipient statuses could not be saved", logs.output[-1])
+        self.assertEqual(database.get_broadcast_stats(broadcast_id), {"pending": 5})
+        self.assertEqual([row[0] for row in database.get_unfinished_broadcasts()], [broadcast_id])
+
+    def test_recipient_read_error_leaves_broadcast_resumable(self):
+        broadcast_id = database.create_broadcast("Reklama")
+        bot = FakeBroadcastBot()
+        with mock.patch('broadcast.get_pending_recipients', return_value=None), \
+                self.assertLogs('broadcast', level='ERROR'):
+            self.run_engine(bot, broadcast_id)
+        self.assertEqual(bot.sent, [])
+        self.assertEqual([row[0] for row in database.get_unfinished_broadcasts()], [broadcast_id])
+
+
+class ConnectionPoolTests(BotDatabaseTestCase):
+    def test_connection_is_reused_per_thread(self):
+        conn = database.get_connection()
+        self.assertIs(database.get_connection(), conn)
+        other = []
+
+        def in_thread():
+            other.append(database.get_connection())
+            database.close_connection()
+
+        thread = threading.Thread(target=in_thread)
+        thread.start()
+        thread.join()
+        self.assertIsNot(other[0], conn)
+
+    def test_pragmas_are_applied(self):
+        conn = database.get_connection()
+        self.assertEqual(conn.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+        self.assertEqual(conn.execute("PRAGMA synchronous").fetchone()[0], 1)  # NORMAL
+        self.assertEqual(conn.execute("PRAGMA busy_timeout").fetchone()[0], 10000)
+        self.assertEqual(conn.execute("PRAGMA temp_store").fetchone()[0], 2)  # MEMORY
+
+    def test_failed_statement_is_rolled_back(self):
+        def register_then_fail(cur):
+            cur.execute("INSERT INTO users (telegram_id, first_name, last_name, phone_number) VALUES ('300000', 'A', 'B', 'C')")
+            cur.execute("SELECT * FROM missing_table")
+
+        with self.assertLogs('database', level='ERROR'):
+            self.assertIsNone(database.safe_db_operation_with_retry(register_then_fail))
+        self.assertFalse(database.get_connection().in_transaction)
+        self.assertFalse(database.is_user_registered("300000"))
+
+    def test_closed_connection_is_replaced(self):
+        conn = database.get_connection()
+        database.close_connection()
+        self.assertIsNot(database.get_connection(), conn)
+        self.assertEqual(database.get_user_count(), 0)
+
+    def test_broken_connection_is_replaced(self):
+        broken = mock.Mock()
+        broken.cursor.side_effect = sqlite3.OperationalError("disk I/O error")
+        broken.rollback.side_effect = sqlite3.ProgrammingError("Cannot operate on a closed database.")
+        database._local.conn = broken
+        with self.assertLogs('database', level='ERROR'):
+            self.assertEqual(database.get_user_count(), 0)
+        broken.close.assert_called_once()
+        self.assertIsNot(database.get_connection(), broken)
+        database.register_user("300001", "Ism", "Familiya", "+998901234567")
+        self.assertEqual(database.get_user_count(), 1)
+
+
+class AsyncDatabaseTests(BotDatabaseTestCase):
+    def test_run_db_uses_worker_thread_and_keeps_loop_responsive(self):
+        def slow_query():
+            time.sleep(0.2)
+            return threading.current_thread().name
+
+        async def scenario():
+            ticks = 0
+
+            async def ticker():
+                nonlocal ticks
+                while True:
+                    await asyncio.sleep(0.01)
+                    ticks += 1
+
+            task = asyncio.create_task(ticker())
+            thread_name = await database.run_db(slow_query)
+            task.cancel()
+            return thread_name, ticks
+
+        thread_name, ticks = asyncio.run(scenario())
+        self.assertTrue(thread_name.startswith("db"))
+        self.assertNotEqual(thread_name, threading.current_thread().name)
+        # So'rov davomida event loop ishlashda davom etdi
+        self.assertGreaterEqual(ticks, 10)
+
+    def test_handler_errors_come_back_through_safe_db_operation(self):
+        def failing(telegram_id):
+            raise ValueError(f"bad id {telegram_id}")
+
+        with self.assertLogs('handlers', level='ERROR') as logs:
+            self.assertIsNone(asyncio.run(handlers.safe_db_operation(failing, "42")))
+        self.assertIn("Database error in failing: bad id 42", logs.output[0])
+        database.register_user("300002", "Ism", "Familiya", "+998901234567")
+        self.assertTrue(asyncio.run(handlers.safe_db_operation(database.is_user_registered, "300002")))
+
+    def test_shutdown_drains_queued_calls(self):
+        done = []
+
+        def slow_write(i):
+            time.sleep(0.02)
+            done.append(i)
+
+        executor = database._get_executor()
+        for i in range(database.DATABASE_WORKERS * 3):
+            executor.submit(slow_write, i)
+        database.shutdown_db_executor()
+        self.assertEqual(sorted(done), list(range(database.DATABASE_WORKERS * 3)))
+        self.assertIsNone(database._executor)
+        # Keyingi run_db yangi havza ochadi
+        self.assertEqual(asyncio.run(database.run_db(database.get_user_count)), 0)
+
+
+class UserPaginationTests(BotDatabaseTestCase):
+    def register_users(self, count):
+        for i in range(count):
+            database.register_user(f"{100000 + i}", "Ism", "Familiya", "+998901234567")
+
+    def fetch(self, page, cursor=""):
+        users, total_pages, has_prev, has_next = asyncio.run(handlers.fetch_users_page(page, cursor, 10))
+        return [user[0] for user in users], total_pages, has_prev, has_next
+
+    def navigation(self, page, cursor=""):
+        users, _, has_prev, has_next = asyncio.run(handlers.fetch_users_page(page, cursor, 10))
+        buttons = handlers.page_navigation("view_users_page_", page, users, has_prev, has_next)
+        return [row[0].callback_data for row in buttons]
+
+    def test_next_and_previous_cursors(self):
+        self.register_users(25)
+        self.assertEqual(self.fetch(1), (list(range(1, 11)), 3, False, True))
+        self.assertEqual(self.navigation(1), ["view_users_page_2_n10"])
+        self.assertEqual(handlers.parse_page_callback("view_users_page_2_n10", "view_users_page_"), (2, "n10"))
+
+        self.assertEqual(self.fetch(2, "n10"), (list(range(11, 21)), 3, True, True))
+        self.assertEqual(self.navigation(2, "n10"), ["view_users_page_1_p11", "view_users_page_3_n20"])
+        # Oxirgi sahifa: keyingi tugma yo'q
+        self.assertEqual(self.fetch(3, "n20"), (list(range(21, 26)), 3, True, False))
+        # Orqaga: birinchi sahifada oldingi tugma yo'q
+        self.assertEqual(self.fetch(2, "p21"), (list(range(11, 21)), 3, True, True))
+        self.assertEqual(self.fetch(1, "p11"), (list(range(1, 11)), 3, False, True))
+
+    def test_has_more_on_exact_last_page(self):
+        self.register_users(20)
+        rows, has_more = database.get_users_page(10, after_id=10)
+        self.assertEqual(([row[0] for row in rows], has_more), (list(range(11, 21)), False))
+        self.assertEqual(self.fetch(2, "n10"), (list(range(11, 21)), 2, True, False))
+
+    def test_empty_table(self):
+        self.assertEqual(database.get_users_page(10), ([], False))
+        self.assertEqual(self.fetch(1), ([], 1, False, False))
+
+    def test_offset_fallback_for_old_buttons(self):
+        self.register_users(25)
+        self.assertEqual(handlers.parse_page_callback("view_users_page_3", "view_users_page_"), (3, ""))
+        self.assertEqual(self.fetch(3), (list(range(21, 26)), 3, True, False))
+        self.assertEqual(self.fetch(2), (list(range(11, 21)), 3, True, True))
+
+
+class UserStatsQueryTests(BotDatabaseTestCase):
+    # Chegaraning ikki tomonidagi vaqtlar (SQLite UTC 'now' ga nisbatan)
+    CREATED_AT = [
+        ("now",),
+        ("now", "start of day"),
+        ("now", "start of day", "-1 second"),
+        ("now", "start of day", "-6 days"),
+        ("now", "start of day", "-6 days", "-1 second"),
+        ("now", "-30 days"),
+    ]
+
+    def setUp(self):
+        super().setUp()
+        conn = database.get_connection()
+        for i, modifiers in enumerate(self.CREATED_AT * 2):
+            database.register_user(f"{200000 + i}", "Ism", "Familiya", "+998901234567")
+            placeholders = ", ".join("?" * len(modifiers))
+            conn.execute(
+                f"UPDATE users SET created_at = DATETIME({placeholders}), banned = ? WHERE telegram_id = ?",
+                (*modifiers, i % 3 == 0, f"{200000 + i}")
+            )
+        conn.commit()
+
+    def old_stats(self):
+        """Optimallashtirishdan oldingi alohida hisoblash so'rovlari."""
+        conn = database.get_connection()
+
+        def count(sql):
+            return conn.execute(sql).fetchone()[0]
+
+        total = count("SELECT COUNT(*) FROM users")
+        last_7_days = count("SELECT COUNT(*) FROM users WHERE DATE(created_at) >= DATE('now', '-6 days')")
+        return {
+            "total": total,
+            "today": count("SELECT COUNT(*) FROM users WHERE DATE(created_at) = DATE('now')"),
+            "banned": count("SELECT COUNT(*) FROM users WHERE banned = 1"),
+            "last_7_days": last_7_days,
+            "growth_7_days": round(last_7_days / (total - last_7_days) * 100, 2),
+        }
+
+    def test_matches_per_count_queries(self):
+        expected = self.old_stats()
+        self.assertEqual(
+            (expected["total"], expected["today"], expected["banned"], expected["last_7_days"]), (12, 4, 4, 8)
+        )
+        self.assertEqual(database.get_user_stats(), expected)
+
+    def test_no_growth_without_older_users(self):
+        database.get_connection().execute("DELETE FROM users WHERE created_at < DATE('now', '-6 days')")
+        database.get_connection().commit()
+        self.assertEqual(database.get_user_stats()["growth_7_days"], 0.0)
+
+
+class StubChannelBot:
+    """get_chat/get_chat_member ni taqlid qiladi; foydalanuvchi so'rovlarini va parallelligini yozib boradi."""
+
+    id = 1
+
+    def __init__(self, left=()):
+        self.left = set(left)
+        self.member_calls = []
+        self.in_flight = self.max_in_flight = 0
+
+    async def get_chat(self, channel_id):
+        return SimpleNamespace(type='channel', title=channel_id)
+
+    async def get_chat_member(self, channel_id, user_id):
+        if user_id == self.id:
+            return SimpleNamespace(status='administrator')
+        self.member_calls.append(channel_id)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        return SimpleNamespace(status='left' if channel_id in self.left else 'member')
+
+
+@mock.patch('handlers.MANDATORY_CHANNELS', ['@kanal1', '@kanal2', '@kanal3'])
+class SubscriptionCacheTests(SimpleTestCase):
+    def setUp(self):
+        for subscription_cache in (handlers.channel_cache, handlers.bot_admin_cache, handlers.member_cache):
+            subscription_cache.clear()
+            self.addCleanup(subscription_cache.clear)
+
+    def check(self, bot, fresh=False):
+        return asyncio.run(handlers.check_subscription(bot, 500, fresh=fresh))
+
+    def test_channels_are_checked_concurrently_once_each(self):
+        bot = StubChannelBot()
+        self.assertEqual(self.check(bot), (True, []))
+        self.assertEqual(sorted(bot.member_calls), ['@kanal1', '@kanal2', '@kanal3'])
+        self.assertEqual(bot.max_in_flight, 3)
+
+    def test_positive_result_is_cached(self):
+        bot = StubChannelBot()
+        self.check(bot)
+        self.assertEqual(self.check(bot), (True, []))
+        self.assertEqual(len(bot.member_calls), 3)
+
+    def test_negative_result_expires_sooner(self):
+        bot = StubChannelBot(left={'@kanal2'})
+        self.assertEqual(self.check(bot), (False, ['@kanal2']))
+        self.assertEqual(self.check(bot), (False, ['@kanal2']))
+        self.assertEqual(len(bot.member_calls), 3)
+        # Salbiy natija muddati o'tdi, ijobiylari hali keshda
+        later = time.monotonic() + handlers.SUBSCRIPTION_NEGATIVE_TTL + 1
+        with mock.patch('cache.time', SimpleNamespace(monotonic=lambda: later)):
+            self.check(bot)
+        self.assertEqual(bot.member_calls[3:], ['@kanal2'])
+
+    def test_check_button_bypasses_cache(self):
+        bot = StubChannelBot(left={'@kanal2'})
+        self.check(bot)
+        bot.left.clear()  # foydalanuvchi endi obuna bo'ldi
+        callback_query = SimpleNamespace(
+            data="check_subscription", from_user=SimpleNamespace(id=500),
+            message=SimpleNamespace(answer=mock.AsyncMock()), answer=mock.AsyncMock(),
+        )
+        asyncio.run(handlers.admin_callback_query(callback_query, None, bot))
+        self.assertIn("Obuna tasdiqlandi", callback_query.message.answer.await_args.args[0])
+        self.assertEqual(len(bot.member_calls), 6)
+
+
+class WebhookSecretTests(SimpleTestCase):
+    def test_secret_is_required(self):
+        with self.assertRaises(RuntimeError):
+            webhook.WebhookUpdateHandler(mock.Mock(), mock.Mock(), secret_token=None)
+
+    def test_rejects_missing_or_wrong_secret(self):
+        dispatcher = mock.Mock(feed_raw_update=mock.AsyncMock())
+        handler = webhook.WebhookUpdateHandler(dispatcher, mock.Mock(), secret_token="sirli")
+
+        async def post(headers):
+            return (await handler.handle(make_mocked_request('POST', '/webhook', headers=headers))).status
+
+        self.assertEqual(asyncio.run(post({})), 401)
+        self.assertEqual(asyncio.run(post({webhook.SECRET_HEADER: "boshqa"})), 401)
+        dispatcher.feed_raw_update.assert_not_awaited()
+
+
+class UserStatusCacheTests(TestCase):
+    def setUp(self):
+        database.user_cache.clear()
+        self.addCleanup(database.user_cache.clear)
+
+    def test_status_read_during_ban_is_not_cached(self):
+        stale = {'registered': True, 'banned': False, 'profile': None}
+
+        def read_then_ban(func, *args):
+            # Boshqa oqim o'qish tugashidan oldin ban qilib, keshni tozalaydi
+            database.invalidate_user('42')
+            return stale
+
+        with mock.patch('database.safe_db_operation_with_retry', side_effect=read_then_ban):
+            self.assertEqual(database.get_user_status(42), stale)
+        self.assertIsNone(database.user_cache.get('42'))
+
+    def test_status_is_cached(self):
+        status = {'registered': True, 'banned': False, 'profile': None}
+        with mock.patch('database.safe_db_operation_with_retry', return_value=status) as read:
+            database.get_user_status(42)
+            database.get_user_status(42)
+        read.assert_called_once()
+
+    def test_site_process_uses_short_ttl(self):
+        self.assertEqual(database.user_cache.ttl, 30)
+
+
+@override_settings(TELEGRAM_BOT_TOKEN="123:test-token")
+class TelegramAuthViewTests(TestCase):
+    profile = ("777", "Ali", "Valiyev", "+998901234567", 0, "2025-01-01 00:00:00")
+
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch('app.views.get_user_status', return_value={
+            'registered': True, 'banned': False, 'profile': self.profile
+        })
+        self.get_user_status = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def auth_url(self, telegram_id="777", **kwargs):
+        token = make_login_token(telegram_id, "123:test-token", **kwargs)
+        return reverse('app:telegram_auth', kwargs={'token': token})
+
+    def test_valid_token_creates_user_and_logs_in(self):
+        response = self.client.get(self.auth_url())
+        self.assertRedirects(response, reverse('app:home'), fetch_redirect_response=False)
+        user = User.objects.get(username="777")
+        self.assertEqual(int(self.client.session['_auth_user_id']), user.id)
+        self.assertEqual(user.userprofile.phone_number, "+998901234567")
+        self.assertFalse(user.has_usable_password())
+
+    def test_cached_identity_skips_bot_db_and_user_lookup(self):
+        self.client.get(self.auth_url())
+        self.client.logout()
+        # Foydalanuvchi keshdan olinadi: qolgani Django login ishlari
+        # (yangi sessiya: tekshiruv + INSERT + UPDATE, last_login UPDATE va savepointlar)
+        with self.assertNumQueries(8):
+            self.client.get(self.auth_url())
+        self.get_user_status.assert_called_once()
+
+    def test_rejects_forged_and_expired_tokens(self):
+        forged = self.auth_url().replace("777.", "778.", 1)
+        expired = self.auth_url(issued_at=0)
+        for url in (forged, expired, reverse('app:telegram_auth', kwargs={'token': '777'})):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('_auth_user_id', self.client.session)
+        self.get_user_status.assert_not_called()
+
+    def test_banned_user_is_rejected(self):
+        self.get_user_status.return_value = {'registered': True, 'banned': True, 'profile': self.profile}
+        self.client.get(self.auth_url())
+        self.assertNotIn('_auth_user_id', self.client.session)
+        self.assertFalse(User.objects.exists())
+
+
+class HomePageCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="1000005", password="parol")
+        Subject.objects.create(name="Matematika")
+
+    def setUp(self):
+        cache.clear()
+        self.url = reverse('app:home')
+
+    def test_anonymous_page_is_served_from_cache(self):
+        self.assertContains(self.client.get(self.url), "Matematika")
+        with self.assertNumQueries(0):
+            self.assertContains(self.client.get(self.url), "Matematika")
+
+    def test_subject_change_invalidates_page_and_fragment(self):
+        self.client.force_login(self.user)
+        self.client.get(self.url)
+        # Fragment keshdan: faqat sessiya foydalanuvchisi o‘qiladi, fan/reklama so‘rovlari yo‘q
+        with self.assertNumQueries(1):
+            self.client.get(self.url)
+        Subject.objects.create(name="Fizika")
+        self.assertContains(self.client.get(self.url), "Fizika")
+        self.client.logout()
+        self.assertContains(self.client.get(self.url), "Fizika")
+
+    def test_conditional_get_returns_304(self):
+        response = self.client.get(self.url)
+        self.assertTrue(response.has_header('Last-Modified'))
+        not_modified = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+        not_modified = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(not_modified.status_code, 304)
+        # Boshqa foydalanuvchi uchun ETag mos kelmaydi
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+
+class UserStatsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="1000006", password="parol")
+        cls.math = Subject.objects.create(name="Matematika")
+        cls.physics = Subject.objects.create(name="Fizika")
+
+    def add_result(self, subject, correct, total=10):
+        session = TestSession.objects.create(user=self.user, subject=subject, completed=True)
+        return Result.objects.create(test_session=session, correct_answers=correct, total_questions=total, percent=0)
+
+    def test_result_updates_profile_and_subject_stats(self):
+        self.add_result(self.math, 6)
+        self.add_result(self.math, 9)
+        self.add_result(self.physics, 5)
+        profile = UserProfile.objects.get(user=self.user)
+        self.assertEqual((profile.total_tests, profile.total_score, profile.average_score), (3, 200.0, 66.67))
+        math = UserSubjectStats.objects.get(user=self.user, subject=self.math)
+        self.assertEqual((math.tests_count, math.best_score, math.average_score), (2, 90.0, 75.0))
+
+    def test_rebuild_matches_incremental_stats(self):
+        self.add_result(self.math, 6)
+        self.add_result(self.math, 9)
+        self.add_result(self.physics, 5)
+        expected = list(UserSubjectStats.objects.order_by('subject_id').values_list(
+            'subject_id', 'tests_count', 'total_score', 'best_score', 'average_score'))
+        UserSubjectStats.objects.all().delete()
+        UserProfile.objects.update(total_tests=0, total_score=0)
+        call_command('rebuild_user_stats', stdout=StringIO())
+        self.assertEqual(list(UserSubjectStats.objects.order_by('subject_id').values_list(
+            'subject_id', 'tests_count', 'total_score', 'best_score', 'average_score')), expected)
+        self.assertEqual(UserProfile.objects.get(user=self.user).total_tests, 3)
+
+
+class LeaderboardTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.subject = Subject.objects.create(name="Matematika")
+        cls.users = [
+            User.objects.create_user(username=str(2000000 + i), password="parol", first_name=f"Ism{i}")
+            for i in range(4)
+        ]
+
+    def add_result(self, user, correct, total=10):
+        session = TestSession.objects.create(user=user, subject=self.subject, completed=True)
+        Result.objects.create(test_session=session, correct_answers=correct, total_questions=total, percent=0)
+
+    def test_top_and_rank_with_ties_and_improvements(self):
+        for user, correct in zip(self.users, (5, 8, 8, 3)):
+            self.add_result(user, correct)
+        # Yomonroq natija reytingni o‘zgartirmaydi, yaxshisi ball hisoblagichini ko‘chiradi
+        self.add_result(self.users[1], 2)
+        self.add_result(self.users[3], 9)
+        top = get_leaderboard(self.subject.id, 'all')
+        self.assertEqual([(row['rank'], row['name'], row['score']) for row in top], [
+            (1, "Ism3", 90.0), (2, "Ism1", 80.0), (2, "Ism2", 80.0), (4, "Ism0", 50.0),
+        ])
+        with self.assertNumQueries(2):
+            rank = get_user_rank(self.subject.id, self.users[0].id, 'week')
+        self.assertEqual(rank, {'rank': 4, 'score': 50.0, 'participants': 4})
+        self.assertIsNone(get_user_rank(self.subject.id, self.users[0].id, 'day', day=date(2000, 1, 1)))
+
+    def test_rebuild_matches_incremental_boards(self):
+        for user, correct in zip(self.users, (5, 8, 8, 3)):
+            self.add_result(user, correct)
+        self.add_result(self.users[3], 9)
+        expected = {period: get_leaderboard(self.subject.id, period) for period in ('day', 'week', 'all')}
+        ranks = [get_user_rank(self.subject.id, user.id) for user in self.users]
+        rebuild_leaderboards()
+        for period, rows in expected.items():
+            self.assertEqual(
+                [(r['rank'], r['score']) for r in get_leaderboard(self.subject.id, period)],
+                [(r['rank'], r['score']) for r in rows]
+            )
+        self.assertEqual([get_user_rank(self.subject.id, user.id) for user in self.users], ranks)
+
+    def test_api_returns_top_and_my_rank_for_bot(self):
+        self.add_result(self.users[0], 7)
+        self.add_result(self.users[1], 9)
+        url = reverse('app:leaderboard_api_subject', kwargs={'subject_slug': self.subject.slug})
+        data = self.client.get(url, {'period': 'week', 'telegram_id': self.users[0].username}).json()
+        self.assertEqual(data['top'], [
+            {'rank': 1, 'name': "Ism1", 'score': 90.0}, {'rank': 2, 'name': "Ism0", 'score': 70.0},
+        ])
+        self.assertEqual(data['me'], {'rank': 2, 'score': 70.0, 'participants': 2})
+        subjects = self.client.get(reverse('app:leaderboard_api')).json()['subjects']
+        self.assertEqual(subjects, [{'slug': self.subject.slug, 'name': "Matematika"}])
+        self.client.force_login(self.users[0])
+        page = self.client.get(reverse('app:leaderboard', kwargs={'subject_slug': self.subject.slug}))
+        self.assertContains(page, "Ism1")
+        self.assertEqual(page.context['my_rank']['rank'], 2)
+
+
+def question_item(text, correct='A'):
+    return {
+        "text": text,
+        "difficulty": "easy",
+        "options": [{"label": label, "text": f"{text} {label}", "is_correct": label == correct} for label in 'ABCD'],
+    }
+
+
+class QuestionImportTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+
+    def write_json(self, name, items):
+        path = os.path.join(self.dir, name)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(items, f, ensure_ascii=False, indent=2)
+        return path
+
+    def import_bank(self, path, subject="Fizika"):
+        out = StringIO()
+        call_command('import_question_bank', f"{subject}={path}", stdout=out, stderr=StringIO())
+        return out.getvalue()
+
+    def test_element_split_across_chunks(self):
+        items = [question_item(f"Savol {i} — o‘zbekcha matn") for i in range(5)]
+        path = self.write_json("savollar.json", items)
+        # Kichik bo‘lak: har bir element bir nechta o‘qishga bo‘linadi
+        self.assertEqual(list(iter_json_array(path, chunk_size=7)), items)
+
+    def test_invalid_file_writes_nothing(self):
+        items = [question_item("Savol 1"), question_item("Savol 2", correct=None)]
+        path = self.write_json("xato.json", items)
+        with self.assertRaises(CommandError):
+            self.import_bank(path)
+        self.assertFalse(Subject.objects.filter(name="Fizika").exists())
+        self.assertFalse(Question.objects.exists())
+
+    def test_second_import_creates_no_duplicates(self):
+        path = self.write_json("fizika.json", [question_item(f"Savol {i}") for i in range(3)])
+        self.assertIn("3 ta yangi savol", self.import_bank(path))
+        self.assertIn("0 ta yangi savol, 3 ta takroriy", self.import_bank(path))
+        self.assertEqual(Question.objects.filter(topic__subject__name="Fizika").count(), 3)
+        self.assertEqual(AnswerOption.objects.filter(question__topic__subject__name="Fizika").count(), 12)
+
+
+class QuestionPoolTests(TestCase):
+    def setUp(self):
+        self.subject, self.questions = create_question_bank()
+
+    def test_invalidation_reaches_other_processes(self):
+        self.assertEqual(len(question_pool.get_question_pool(self.subject.id)), 30)
+        version = QuestionPoolVersion.objects.get(subject=self.subject).version
+        # Boshqa worker xotirasidagi eski pool: invalidatsiya faqat bazadagi versiya orqali yetib boradi
+        stale_pools = dict(question_pool._pools)
+        Question.objects.filter(id=self.questions[0].id).update(is_active=False)
+        question_pool.invalidate_question_pool(self.subject.id)
+        question_pool._pools.update(stale_pools)
+        self.assertNotEqual(QuestionPoolVersion.objects.get(subject=self.subject).version, version)
+
+        pool = question_pool.get_question_pool(self.subject.id)
+        self.assertEqual(len(pool), 29)
+        self.assertNotIn(self.questions[0].id, pool)
+
+    def test_question_save_invalidates_pool(self):
+        question_pool.get_question_pool(self.subject.id)
+        question = self.questions[1]
+        question.is_deleted = True
+        question.save()
+        self.assertNotIn(question.id, question_pool.get_question_pool(self.subject.id))
+
+
+class ResultsViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="1000007", password="parol")
+        cls.subject, cls.questions = create_question_bank()
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+        self.session = TestSession.objects.create(
+            user=self.user, subject=self.subject, completed=True,
+            randomized_question_ids=[question.id for question in self.questions]
+        )
+        UserAnswer.objects.bulk_create([
+            UserAnswer(test_session=self.session, question=question,
+                       selected_option=question.options.get(label='B'), is_correct=False)
+            for question in self.questions
+        ])
+        Result.objects.create(test_session=self.session, correct_answers=0, total_questions=30, percent=0)
+        self.url = reverse('app:view_results', kwargs={'session_id': self.session.id})
+
+    def test_renders_30_wrong_answers_in_constant_queries(self):
+        # foydalanuvchi + sessiya (fan, natija bilan) + javoblar + to‘g‘ri variantlar
+        with self.assertNumQueries(4):
+            response = self.client.get(self.url)
+        self.assertContains(response, "To'g'ri javob: Variant A", count=30)
+        # Ikkinchi marta tayyor sahifa keshdan: faqat foydalanuvchi so‘rovi
+        with self.assertNumQueries(1):
+            cached = self.client.get(self.url)
+        self.assertEqual(cached.content, response.content)
+
+    def test_cached_page_is_not_served_to_other_users(self):
+        self.client.get(self.url)
+        self.client.force_login(User.objects.create_user(username="1000008", password="parol"))
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+
+class MetricsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Subject.objects.create(name="Matematika")
+
+    def setUp(self):
+        cache.clear()
+
+    def test_requests_queries_and_cache_are_counted(self):
+        labels = {'view': 'app:home', 'method': 'GET', 'status': 200}
+        requests_before = metrics.REQUESTS.value(**labels)
+        queries_before = metrics.DB_QUERIES.value(view='app:home')
+        hits_before = metrics.CACHE_REQUESTS.value(result='hit')
+        self.client.get(reverse('app:home'))
+        self.client.get(reverse('app:home'))
+        self.assertEqual(metrics.REQUESTS.value(**labels), requests_before + 2)
+        self.assertGreater(metrics.DB_QUERIES.value(view='app:home'), queries_before)
+        self.assertGreater(metrics.CACHE_REQUESTS.value(result='hit'), hits_before)
+
+        staff = User.objects.create_user(username="metrics-admin", password="parol", is_staff=True)
+        self.client.force_login(staff)
+        body = self.client.get(reverse('app:metrics')).content.decode()
+        self.assertIn('# TYPE django_http_request_duration_seconds histogram', body)
+        self.assertIn('django_http_requests_total{view="app:home",method="GET",status="200"}', body)
+        self.assertIn('django_http_request_duration_seconds_bucket{view="app:home",method="GET",le="+Inf"}', body)
+
+    @override_settings(METRICS_TOKEN="sirli-token")
+    def test_metrics_require_staff_or_bearer_token(self):
+        url = reverse('app:metrics')
+        # Reverse proxy ortida barcha so‘rovlar 127.0.0.1 dan keladi
+        self.assertEqual(self.client.get(url, REMOTE_ADDR='127.0.0.1').status_code, 404)
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer boshqa').status_code, 404)
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer sirli-token').status_code, 200)
+
+    @override_settings(METRICS_TOKEN=None)
+    def test_metrics_closed_without_token(self):
+        response = self.client.get(reverse('app:metrics'), HTTP_AUTHORIZATION='Bearer ')
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(METRICS_TOKEN=None)
+    def test_worker_metrics_public_bind_needs_token(self):
+        with mock.patch('app.management.commands.send_telegram_outbox.make_server') as make_server:
+            with self.assertRaises(CommandError):
+                serve_metrics(9100, '0.0.0.0')
+            make_server.assert_not_called()
+
+    @override_settings(SLOW_REQUEST_MS=0)
+    def test_slow_request_is_logged_with_sql(self):
+        with self.assertLogs('app.middleware', level='WARNING') as logs:
+            self.client.get(reverse('app:home'))
+        self.assertIn('Slow request GET / (app:home)', logs.output[0])
+        self.assertIn('SELECT', logs.output[0])
+
+
+@override_settings(ANSWER_WRITE_BEHIND=True)
+class WriteBehindAnswerTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="1000009", password="parol")
+        cls.subject, cls.questions = create_question_bank()
+
+    def setUp(self):
+        cache.clear()
+        journal_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(journal_dir.cleanup)
+        self.journal_dir = os.path.join(journal_dir.name, "journal")
+        # Javoblar keshi umumiy (fayl) kesh, xuddi bir nechta worker bilan ishlagandek
+        answers_cache = {
+            'BACKEND': 'app.cache_backends.AnswerFileCache',
+            'LOCATION': os.path.join(journal_dir.name, "cache"),
+        }
+        self.enterContext(override_settings(CACHES={**settings.CACHES, 'answers': answers_cache}))
+        self.store = self.make_store()
+        patcher = mock.patch('app.views.get_answer_store', return_value=self.store)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client.force_login(self.user)
+        self.session = TestSession.objects.create(
+            user=self.user, subject=self.subject,
+            randomized_question_ids=[question.id for question in self.questions]
+        )
+
+    def make_store(self):
+        store = AnswerStore('answers', self.journal_dir)
+        store.cache.clear()
+        return store
+
+    def save(self, question, label):
+        return self.post_answer(question, question.options.get(label=label).id)
+
+    def post_answer(self, question, option_id):
+        url = reverse('app:save_answer', kwargs={'session_id': self.session.id, 'question_id': question.id})
+        return self.client.post(url, {'answer_id': option_id}).json()
+
+    def test_answer_click_does_not_write_database(self):
+        option = self.questions[0].options.get(label='A')
+        # foydalanuvchi + tekshiruv; UserAnswer ga yozuv yo‘q
+        with self.assertNumQueries(2):
+            self.assertEqual(self.post_answer(self.questions[0], option.id)['status'], 'success')
+        self.assertFalse(UserAnswer.objects.exists())
+        response = self.client.get(reverse('app:test_session', kwargs={'session_id': self.session.id}))
+        self.assertEqual(response.context['answered_count'], 1)
+
+    def test_submit_flushes_cached_answers(self):
+        for question in self.questions[:10]:
+            self.save(question, 'A')
+        self.save(self.questions[10], 'B')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('app:submit_test', kwargs={'session_id': self.session.id}))
+        result = Result.objects.get(test_session=self.session)
+        self.assertEqual((result.correct_answers, result.total_questions), (10, 11))
+        # Fon flusher yakunlangan sessiyani eski qiymatlar bilan qayta yozmaydi
+        self.assertEqual(self.store.flush(), 0)
+        self.assertFalse(os.listdir(self.journal_dir))
+
+    def test_flush_writes_pending_answers_in_bulk(self):
+        for question in self.questions[:5]:
+            self.save(question, 'A')
+        self.save(self.questions[0], 'C')
+        # yakunlangan sessiyalar + bitta upsert (va SAVEPOINT/RELEASE)
+        with self.assertNumQueries(4):
+            self.assertEqual(self.store.flush(), 5)
+        self.assertEqual(UserAnswer.objects.filter(test_session=self.session, is_correct=True).count(), 4)
+        self.assertFalse(os.listdir(self.journal_dir))
+
+    def test_journal_of_crashed_process_is_replayed(self):
+        for question in self.questions[:3]:
+            self.save(question, 'A')
+        # Jarayon qulashi: jurnal qoladi, qulf bo‘shaydi, xotiradagi navbat yo‘qoladi
+        os.close(self.store._segment[1])
+        self.store.cache.clear()
+        with self.assertLogs('app.answer_store', level='WARNING'):
+            self.assertEqual(self.make_store().flush(), 3)
+        self.assertEqual(UserAnswer.objects.filter(test_session=self.session).count(), 3)
+        self.assertFalse(os.listdir(self.journal_dir))
+
+    def test_answer_after_submit_is_logged_not_silently_dropped(self):
+        self.save(self.questions[0], 'A')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('app:submit_test', kwargs={'session_id': self.session.id}))
+        # Boshqa workerda submit dan keyin kelgan bosish
+        self.store.record(self.session.id, self.questions[1].id, self.questions[1].options.get(label='A').id, True)
+        with self.assertLogs('app.answer_store', level='WARNING') as logs:
+            self.assertEqual(self.store.flush(), 0)
+        self.assertIn("Dropped 1 answers", logs.output[0])
+
+    def test_answer_saved_by_another_submit_is_not_reported(self):
+        option = self.questions[0].options.get(label='A')
+        self.store.record(self.session.id, self.questions[0].id, option.id, True)
+        # Boshqa workerdagi submit_test xuddi shu javobni yozib, sessiyani yakunlagan
+        upsert_answers([(self.session.id, self.questions[0].id, option.id, True)])
+        TestSession.objects.filter(id=self.session.id).update(completed=True)
+        with self.assertNoLogs('app.answer_store', level='WARNING'):
+            self.assertEqual(self.store.flush(), 0)
+
+    def test_answer_cache_never_evicts_live_entries(self):
+        answers = AnswerFileCache(os.path.join(self.journal_dir, "evict"), {'OPTIONS': {'MAX_ENTRIES': 5}})
+        for i in range(20):
+            answers.set(f"answer:{i}", i)
+        self.assertEqual(len(answers.get_many([f"answer:{i}" for i in range(20)])), 20)
+        answers.set("expired", 1, timeout=-1)
+        answers._next_cull = 0
+        answers.set("answer:20", 20)
+        self.assertEqual(len(answers._list_cache_files()), 21)
+
+    def test_per_process_cache_is_refused(self):
+        with self.assertRaises(ImproperlyConfigured):
+            check_answer_cache('default')
+        check_answer_cache('answers')
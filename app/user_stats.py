@@ -0,0 +1,96 @@
+import logging
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max, Sum
+from django.db.models.functions import Greatest
+from .models import Result, UserProfile, UserSubjectStats
+
+logger = logging.getLogger(__name__)
+
+
+def record_result(user_id, subject_id, percent):
+    """Yangi natijani profil va fan statistikasiga qo‘shish (atomar UPDATE, F-ifodalar bilan).
+
+    Odatda natija bilan bir tranzaksiyada chaqiriladi; yozuvlar mavjud bo‘lsa ikki UPDATE bajariladi.
+    """
+    with transaction.atomic(savepoint=False):
+        if not _update_profile(user_id, percent):
+            create_or_update(
+                UserProfile, {'user_id': user_id},
+                {'total_tests': 1, 'total_score': percent},
+                lambda: _update_profile(user_id, percent),
+            )
+        if not _update_subject_stats(user_id, subject_id, percent):
+            create_or_update(
+                UserSubjectStats, {'user_id': user_id, 'subject_id': subject_id},
+                {'tests_count': 1, 'total_score': percent, 'best_score': percent, 'average_score': percent},
+                lambda: _update_subject_stats(user_id, subject_id, percent),
+            )
+
+
+def _update_profile(user_id, percent):
+    return UserProfile.objects.filter(user_id=user_id).update(
+        total_tests=F('total_tests') + 1,
+        total_score=F('total_score') + percent,
+    )
+
+
+def _update_subject_stats(user_id, subject_id, percent):
+    return UserSubjectStats.objects.filter(user_id=user_id, subject_id=subject_id).update(
+        tests_count=F('tests_count') + 1,
+        total_score=F('total_score') + percent,
+        best_score=Greatest(F('best_score'), percent),
+        average_score=(F('total_score') + percent) / (F('tests_count') + 1),
+    )
+
+
+def create_or_update(model, lookup, values, update):
+    """Yozuv yo‘q bo‘lsa yaratish; parallel so‘rov oldinroq yaratgan bo‘lsa, UPDATE ni takrorlash."""
+    try:
+        with transaction.atomic():
+            model.objects.create(**lookup, **values)
+    except IntegrityError:
+        update()
+
+
+def rebuild_user_stats(batch_size=1000):
+    """Barcha statistikani Result jadvalidan qayta hisoblash (bitta GROUP BY so‘rov bilan)."""
+    rows = Result.objects.filter(
+        is_deleted=False, test_session__is_deleted=False
+    ).values(
+        user_id=F('test_session__user_id'), subject_id=F('test_session__subject_id')
+    ).annotate(
+        tests_count=Count('id'), total_score=Sum('percent'), best_score=Max('percent')
+    ).order_by()
+
+    subject_stats = []
+    profiles = {}
+    for row in rows.iterator(chunk_size=batch_size):
+        subject_stats.append(UserSubjectStats(
+            user_id=row['user_id'],
+            subject_id=row['subject_id'],
+            tests_count=row['tests_count'],
+            total_score=row['total_score'],
+            best_score=row['best_score'],
+            average_score=row['total_score'] / row['tests_count'],
+        ))
+        tests, score = profiles.get(row['user_id'], (0, 0.0))
+        profiles[row['user_id']] = (tests + row['tests_count'], score + row['total_score'])
+
+    with transaction.atomic():
+        UserSubjectStats.objects.all().delete()
+        UserSubjectStats.objects.bulk_create(subject_stats, batch_size=batch_size)
+
+        existing = UserProfile.objects.only('id', 'user_id', 'total_tests', 'total_score')
+        to_update = []
+        for profile in existing.iterator(chunk_size=batch_size):
+            profile.total_tests, profile.total_score = profiles.pop(profile.user_id, (0, 0.0))
+            to_update.append(profile)
+        UserProfile.objects.bulk_update(to_update, ['total_tests', 'total_score'], batch_size=batch_size)
+        UserProfile.objects.bulk_create([
+            UserProfile(user_id=user_id, total_tests=tests, total_score=score)
+            for user_id, (tests, score) in profiles.items()
+        ], batch_size=batch_size)
+
+    stats = {'subject_stats': len(subject_stats), 'profiles': len(to_update) + len(profiles)}
+    logger.info(f"User stats rebuilt: {stats}")
+    return stats
@@ -1,21 +1,30 @@
 import logging
-import random
-import secrets
-import requests
 from django.conf import settings
 from django.contrib.auth import login
+from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import User
 from django.shortcuts import render, redirect
-from django.http import JsonResponse, Http404
+from django.http import HttpResponse, JsonResponse, Http404
+from django.core.cache import cache
 from django.urls import reverse
 from django.utils import timezone
 from django.db import transaction
-from django.db.models import Count
-from django.views.decorators.http import require_POST
+from django.db.models import Count, Prefetch, Q, Subquery
+from django.views.decorators.http import require_POST, condition
 from django_ratelimit.decorators import ratelimit
 import re
-import sqlite3
 from .models import *
+from .question_pool import sample_question_ids
+from .notifications import enqueue_telegram_message
+from .answer_store import get_answer_store, upsert_answers as upsert_answer_rows, write_behind_enabled
+from .site_cache import (
+    SITE_CACHE_TIMEOUT, cache_anonymous_page, content_etag, content_last_modified, content_timestamp,
+    result_page_cache_key
+)
+from .leaderboard import PERIODS, get_leaderboard, get_user_rank
+from . import metrics as app_metrics
+from database import get_user_status
+from login_token import verify_login_token
 logger = logging.getLogger(__name__)
 
 # Konstantalar
@@ -45,15 +54,23 @@ def testlarni_yuklash_view(request):
     # except Exception as e:
     #     return HttpResponse(f"❌ Xatolik yuz berdi: {str(e)}")
     
-def home(request):
-    subjects = Subject.objects.filter(is_deleted=False)
+def render_home(request, **context):
+    """Bosh sahifa. Querysetlar dangasa: fragment keshda bo‘lsa bazaga so‘rov yuborilmaydi."""
     now = timezone.now()
-    reklamalar = Reklama.objects.filter(
+    context.setdefault('subjects', Subject.objects.filter(is_deleted=False))
+    context.setdefault('reklamalar', Reklama.objects.filter(
         is_active=True,
         start_date__lte=now,
         end_date__gte=now
-    )
-    return render(request, 'home.html', {'subjects': subjects,'reklamalar': reklamalar})
+    ))
+    context['content_version'] = content_timestamp()
+    context['cache_timeout'] = SITE_CACHE_TIMEOUT
+    return render(request, 'home.html', context)
+
+@condition(etag_func=content_etag, last_modified_func=content_last_modified)
+@cache_anonymous_page
+def home(request):
+    return render_home(request)
 
 @ratelimit(key='user_or_ip', rate='5/m')
 def contact(request):
@@ -71,7 +88,7 @@ def contact(request):
             if not message or len(message) < 10:
                 return JsonResponse({'status': 'error', 'message': 'Xabar kamida 10 harfdan iborat bo‘lishi kerak.'})
 
-            # Feedback modeliga saqlash
+            # Feedback va Telegram xabari bitta tranzaksiyada saqlanadi, yuborishni fon worker bajaradi
             with transaction.atomic():
                 feedback = Feedback.objects.create(
                     user=request.user if request.user.is_authenticated else None,
@@ -79,27 +96,14 @@ def contact(request):
                     message=f"Ism: {name}\nTelefon: {phone}\nXabar: {message}",
                     status='pending'
                 )
-
-            # Telegramga xabar yuborish
-            telegram_message = (
-                f"📬 Yangi xabar:\n"
-                f"Ism: {name}\n"
-                f"Telefon: {phone}\n"
-                f"Xabar: {message}\n"
-                f"Vaqt: {timezone.now().strftime('%Y-%m-%d %H:%M')}"
-            )
-            telegram_url = f"https://api.telegram.org/bot{settings.TELEGRAM_BOT_TOKEN}/sendMessage"
-            telegram_data = {
-                'chat_id': settings.ADMIN_TELEGRAM_ID,
-                'text': telegram_message
-            }
-            try:
-                response = requests.post(telegram_url, data=telegram_data)
-                response.raise_for_status()
-                logger.info(f"Telegram message sent for feedback from {phone}")
-            except requests.RequestException as e:
-                logger.error(f"Failed to send Telegram message for feedback: {e}")
-                return JsonResponse({'status': 'error', 'message': 'Xabar Telegramga yuborilmadi, lekin saqlandi.'})
+                enqueue_telegram_message(settings.ADMIN_TELEGRAM_ID, (
+                    f"📬 Yangi xabar:\n"
+                    f"Ism: {name}\n"
+                    f"Telefon: {phone}\n"
+                    f"Xabar: {message}\n"
+                    f"Vaqt: {timezone.now().strftime('%Y-%m-%d %H:%M')}"
+                ))
+            logger.info(f"Feedback {feedback.id} saved, Telegram notification queued")
 
             return JsonResponse({'status': 'success', 'message': 'Xabar muvaffaqiyatli yuborildi!'})
 
@@ -107,99 +111,110 @@ def contact(request):
             logger.error(f"Error processing contact form: {e}")
             return JsonResponse({'status': 'error', 'message': 'Xabar yuborishda xato yuz berdi.'})
     else:
-        return render(request, 'contact.html')
+        return render(request, 'contact.html', {'cache_timeout': SITE_CACHE_TIMEOUT})
+@condition(etag_func=content_etag, last_modified_func=content_last_modified)
+@cache_anonymous_page
 def about(request):
     return render(request, 'about.html')
 
-import sqlite3
-import secrets
-import requests
-from django.contrib.auth import login
-from django.conf import settings
-from django.shortcuts import render
-from django.contrib.auth.models import User
-from app.models import UserProfile, Subject  # model nomlarini moslashtir
-import logging
+TELEGRAM_IDENTITY_TIMEOUT = getattr(settings, 'TELEGRAM_IDENTITY_TIMEOUT', 600)
+
+def get_telegram_user(telegram_id):
+    """Tasdiqlangan Telegram foydalanuvchisiga mos Django User (keshlanadi).
+
+    Bot bazasi (users.db) database.py ning umumiy ulanishlar havzasi orqali o‘qiladi.
+    Ro‘yxatdan o‘tmagan yoki banlangan foydalanuvchi uchun None qaytaradi.
+    Ban holati kesh muddati (TELEGRAM_IDENTITY_TIMEOUT) ichida kuchga kiradi.
+    """
+    cache_key = f"telegram_identity:{telegram_id}"
+    user = cache.get(cache_key)
+    if user is not None:
+        return user
+    status = get_user_status(telegram_id)
+    if not status or not status['registered'] or status['banned']:
+        return None
+    tg_id, first_name, last_name, phone, _, _ = status['profile']
+    user, created = User.objects.get_or_create(username=tg_id, defaults={
+        # Kirish faqat Telegram orqali: parol ishlatilmaydi (va xeshlash vaqti ketmaydi)
+        'password': make_password(None),
+        'email': f"{tg_id}@example.com",
+        'first_name': first_name,
+        'last_name': last_name,
+    })
+    if created:
+        UserProfile.objects.create(user=user, phone_number=phone or '')
+        logger.info(f"Yangi foydalanuvchi yaratildi: {tg_id}")
+    cache.set(cache_key, user, TELEGRAM_IDENTITY_TIMEOUT)
+    return user
 
-logger = logging.getLogger(__name__)
+def telegram_auth(request, token):
+    # Bot bergan imzolangan token tekshiriladi, Telegram API ga murojaat qilinmaydi
+    telegram_id = verify_login_token(token, settings.TELEGRAM_BOT_TOKEN)
+    if telegram_id is None:
+        logger.warning("Invalid or expired Telegram login token")
+        return render_home(request, error="Havola eskirgan yoki noto‘g‘ri. Botga /test buyrug‘ini yuboring.")
 
-def telegram_auth(request, telegram_id):
-    # 1. Telegram orqali ID ni tekshirish
-    try:
-        response = requests.get(
-            f"https://api.telegram.org/bot{settings.TELEGRAM_BOT_TOKEN}/getChat",
-            params={'chat_id': telegram_id}
-        )
-        response.raise_for_status()
-        if not response.json().get('ok'):
-            logger.warning(f"Invalid Telegram ID: {telegram_id}")
-            return render(request, 'home.html', {'error': "Noto‘g‘ri Telegram ID."})
-    except requests.RequestException as e:
-        logger.error(f"Telegram API error: {e}")
-        return render(request, 'home.html', {'error': "Telegram autentifikatsiyasi xatosi."})
-
-    # 2. SQLite bazadan foydalanuvchi ma'lumotini olish
-    conn = sqlite3.connect("users.db")
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM users WHERE telegram_id = ?", (telegram_id,))
-    user_data = cursor.fetchone()
-    conn.close()
-
-    if not user_data:
-        logger.warning(f"Telegram ID {telegram_id} users.db bazasida topilmadi.")
-        return render(request, 'home.html', {'error': "Foydalanuvchi bazada topilmadi."})
-
-    _, tg_id, first_name, last_name, phone,banned, created_at = user_data
-    try:
-        user = User.objects.get(username=tg_id)
-    except User.DoesNotExist:
-        # Yangi foydalanuvchini ro'yxatdan o'tkazamiz
-        user = User.objects.create_user(
-            username=tg_id,
-            password=secrets.token_hex(8),
-            email=f"{tg_id}@example.com",
-            first_name=first_name,
-            last_name=last_name
-        )
-        UserProfile.objects.create(user=user, phone_number=phone)
-        logger.info(f"Yangi foydalanuvchi yaratildi: {tg_id}")
+    user = get_telegram_user(telegram_id)
+    if user is None:
+        logger.warning(f"Telegram ID {telegram_id} users.db bazasida topilmadi yoki banlangan.")
+        return render_home(request, error="Foydalanuvchi bazada topilmadi.")
 
-    # 4. Login qildiramiz
     login(request, user, backend='django.contrib.auth.backends.ModelBackend')
-    logger.info(f"Telegram orqali login qilindi: {tg_id}")
-    print(f"User {user.username} ({user.first_name} {user.last_name}) Telegram orqali tizimga kirdi.")
-
-    subjects = Subject.objects.filter(is_deleted=False)
-    return render(request, 'home.html', {'subjects': subjects})
+    logger.info(f"Telegram orqali login qilindi: {telegram_id}")
+    return redirect('app:home')
 
 def start_test(request, subject_slug):
-    logger.info(f"User: {request.user.username if request.user.is_authenticated else 'None'}")
+    logger.debug(f"User: {request.user.username if request.user.is_authenticated else 'None'}")
     if not request.user.is_authenticated:
         logger.warning("Unauthenticated user attempted to start test")
-        return render(request, 'home.html', {'error': 'Iltimos, avval tizimga kiring.'})
+        return render_home(request, error='Iltimos, avval tizimga kiring.')
     try:
         subject = Subject.objects.get(slug=subject_slug, is_deleted=False)
     except Subject.DoesNotExist:
         raise Http404("Fan topilmadi.")
-    with transaction.atomic():
-        session = TestSession.objects.create(user=request.user, subject=subject)
-        question_ids = list(Question.objects.filter(
-            topic__subject=subject, is_active=True, is_deleted=False
-        ).annotate(option_count=Count('options')).filter(option_count=OPTIONS_PER_QUESTION).values_list('id', flat=True))
-        if len(question_ids) < DEFAULT_QUESTION_COUNT:
-            return render(request, 'home.html', {'error': 'Bu fanda yetarli savol mavjud emas.'})
-        selected_ids = random.sample(question_ids, min(DEFAULT_QUESTION_COUNT, len(question_ids)))
-        session.randomized_question_ids = selected_ids
-        session.save()
-        request.session['selected_answers'] = {}
+    # Savollar fan bo‘yicha xotiradagi pooldan tanlanadi (app.question_pool)
+    selected_ids = sample_question_ids(subject.id, DEFAULT_QUESTION_COUNT)
+    if selected_ids is None:
+        return render_home(request, error='Bu fanda yetarli savol mavjud emas.')
+    session = TestSession.objects.create(user=request.user, subject=subject, randomized_question_ids=selected_ids)
     return redirect('app:test_session', session_id=session.id)
+SESSION_PAYLOAD_TIMEOUT = getattr(settings, 'SESSION_PAYLOAD_TIMEOUT', 60 * 60 * 6)
+
+def get_session_payload(session):
+    """Test sahifasi uchun savollar va variantlar (sessiya davomida o‘zgarmaydi, keshlanadi).
+
+    Savollar randomized_question_ids tartibida, har biri:
+    {'id', 'text', 'image_url', 'options': [{'id', 'text'}, ...]}
+    """
+    cache_key = f"test_session_payload:{session.id}"
+    payload = cache.get(cache_key)
+    if payload is not None:
+        return payload
+    questions = {}
+    options = AnswerOption.objects.filter(
+        question_id__in=session.randomized_question_ids
+    ).select_related('question').order_by('question_id', 'label')
+    for option in options:
+        question = option.question
+        if question.id not in questions:
+            questions[question.id] = {
+                'id': question.id,
+                'text': question.text,
+                'image_url': question.image.url if question.image else None,
+                'options': [],
+            }
+        questions[question.id]['options'].append({'id': option.id, 'text': option.text})
+    payload = [questions[question_id] for question_id in session.randomized_question_ids if question_id in questions]
+    cache.set(cache_key, payload, SESSION_PAYLOAD_TIMEOUT)
+    return payload
+
 def test_session(request, session_id):
     try:
-        session = TestSession.objects.prefetch_related('answers__question__options').get(
+        session = TestSession.objects.select_related('subject').get(
             id=session_id, user=request.user, is_deleted=False
         )
     except TestSession.DoesNotExist:
-        logger.error(f"Test session {session_id} not found for user喧_0x1Ffor user {request.user.username}")
+        logger.error(f"Test session {session_id} not found for user {request.user.username}")
         raise Http404("Test sessiyasi topilmadi.")
 
     if session.completed:
@@ -207,30 +222,28 @@ def test_session(request, session_id):
 
     question_ids = session.randomized_question_ids
     if not question_ids:
-        session.completed = True
-        session.ended_at = timezone.now()
-        session.save()
         calculate_result(session)
         send_telegram_result(request.user.username, session)
         return redirect('app:view_results', session_id=session.id)
 
-    questions = Question.objects.filter(id__in=question_ids).prefetch_related('options')
-    answered_count = UserAnswer.objects.filter(test_session=session).count()
-
-    # Sessiya va ma'lumotlar bazasidagi javoblarni sinxronlashtirish
-    selected_answers = request.session.get("selected_answers", {}).get(str(session_id), {})
-    # Ma'lumotlar bazasidagi javoblarni qo'shish
-    user_answers = UserAnswer.objects.filter(test_session=session).select_related('selected_option')
-    for answer in user_answers:
-        selected_answers[str(answer.question.id)] = str(answer.selected_option.id)
-    request.session['selected_answers'][str(session_id)] = selected_answers
-    request.session.modified = True
+    questions = get_session_payload(session)
+    # Tanlangan javoblar: {question_id: option_id} (satr ko‘rinishida, shablon filtri uchun)
+    selected_answers = {
+        str(question_id): str(option_id)
+        for question_id, option_id in UserAnswer.objects.filter(test_session=session).values_list('question_id', 'selected_option_id')
+    }
+    if write_behind_enabled():
+        # Hali bazaga yozilmagan javoblar keshda
+        selected_answers.update({
+            str(question_id): str(option_id)
+            for question_id, (option_id, _) in get_answer_store().get_answers(session.id, question_ids).items()
+        })
 
     return render(request, 'test_session.html', {
         'session': session,
         'questions': questions,
-        'answered_count': answered_count,
-        'questions_count': questions.count(),
+        'answered_count': len(selected_answers),
+        'questions_count': len(questions),
         'selected_answers': selected_answers,
     })
 
@@ -238,31 +251,33 @@ def test_session(request, session_id):
 @require_POST
 def save_answer_session(request, session_id, question_id):
     answer_id = request.POST.get("answer_id")
-    if not answer_id:
+    if not answer_id or not answer_id.isdigit():
         return JsonResponse({"status": "error", "message": "answer_id topilmadi"})
 
+    # Bitta so‘rovda: sessiya foydalanuvchiga tegishli va yakunlanmagan, variant shu savolga tegishli
+    option_is_correct = AnswerOption.objects.filter(
+        id=answer_id, question_id=question_id, is_deleted=False
+    ).values('is_correct')[:1]
+    row = TestSession.objects.filter(
+        id=session_id, user=request.user, is_deleted=False, completed=False
+    ).annotate(option_is_correct=Subquery(option_is_correct)).values_list(
+        'randomized_question_ids', 'option_is_correct'
+    ).first()
+    if row is None:
+        return JsonResponse({"status": "error", "message": "Test sessiyasi topilmadi."})
+    question_ids, is_correct = row
+    if is_correct is None or question_id not in question_ids:
+        return JsonResponse({"status": "error", "message": "Javob varianti topilmadi."})
+
     try:
-        with transaction.atomic():
-            session = TestSession.objects.get(id=session_id, user=request.user, is_deleted=False)
-            question = Question.objects.get(id=question_id, is_deleted=False)
-            selected_option = AnswerOption.objects.get(id=answer_id, is_deleted=False)
-            user_answer, created = UserAnswer.objects.update_or_create(
-                test_session=session,
-                question=question,
-                defaults={'selected_option': selected_option, 'is_correct': selected_option.is_correct}
-            )
-            logger.info(f"Answer saved for question {question_id} in session {session_id} by user {request.user.username}")
+        if write_behind_enabled():
+            get_answer_store().record(session_id, question_id, int(answer_id), is_correct)
+        else:
+            upsert_answers(session_id, [(question_id, int(answer_id), is_correct)])
     except Exception as e:
         logger.error(f"Error saving answer to DB: {e}")
         return JsonResponse({"status": "error", "message": "Javobni saqlashda xato yuz berdi."})
-
-    selected_answers = request.session.get("selected_answers", {})
-    session_key = str(session_id)
-    if session_key not in selected_answers:
-        selected_answers[session_key] = {}
-    selected_answers[session_key][str(question_id)] = answer_id
-    request.session["selected_answers"] = selected_answers
-    request.session.modified = True
+    logger.debug(f"Answer saved for question {question_id} in session {session_id} by user {request.user.username}")
 
     return JsonResponse({"status": "success"})
 
@@ -285,11 +300,7 @@ def save_answer_db(request, session_id, question_id):
                 question=question,
                 defaults={'selected_option': selected_option, 'is_correct': selected_option.is_correct}
             )
-            if 'selected_answers' not in request.session:
-                request.session['selected_answers'] = {}
-            request.session['selected_answers'][str(question_id)] = str(selected_option.id)
-            request.session.modified = True
-            logger.info(f"Answer saved for question {question_id} in session {session_id} by user {request.user.username}")
+            logger.debug(f"Answer saved for question {question_id} in session {session_id} by user {request.user.username}")
             return JsonResponse({'status': 'success'})
     except TestSession.DoesNotExist:
         logger.error(f"Test session {session_id} not found")
@@ -309,7 +320,7 @@ def save_answer_db(request, session_id, question_id):
 def submit_test(request, session_id):
     try:
         with transaction.atomic():
-            session = TestSession.objects.select_for_update().get(
+            session = TestSession.objects.select_for_update(of=('self',)).select_related('subject').get(
                 id=session_id, user=request.user, is_deleted=False
             )
 
@@ -320,38 +331,21 @@ def submit_test(request, session_id):
                     'redirect_url': reverse('app:view_results', kwargs={'session_id': session.id})
                 })
 
-            # Sessiyadagi vaqtincha javoblarni saqlash
-            selected_answers = request.session.get('selected_answers', {}).get(str(session_id), {})
-            for question_id, answer_id in selected_answers.items():
-                try:
-                    question = Question.objects.get(id=question_id, is_deleted=False)
-                    selected_option = question.options.get(id=answer_id, is_deleted=False)
-                    UserAnswer.objects.update_or_create(
-                        test_session=session,
-                        question=question,
-                        defaults={'selected_option': selected_option}
-                    )
-                except Exception as e:
-                    logger.warning(f"Error saving answer for question {question_id}: {e}")
-                    continue
-
-            # Sessiyani yakunlash
-            odi = TestSession.objects.get(id=session.id)
-            session.completed = True
-            session.ended_at = timezone.now()
-            session.score = odi.calculate_score() if hasattr(odi, 'calculate_score') else 0
-            session.save()
-
-            # Natijalarni hisoblash va xabar yuborish
+            if write_behind_enabled():
+                # Keshdagi (fon flusher hali yozmagan) javoblarni darhol bazaga o‘tkazish
+                get_answer_store().flush_session(session.id, session.randomized_question_ids)
+            # Formadagi hali saqlanmagan javoblarni bitta so‘rov bilan yozish
+            save_pending_answers(session, request.POST)
+            # Sessiyani yakunlash va natijani hisoblash
             calculate_result(session)
             send_telegram_result(request.user.username, session)
 
-            logger.info(f"Test session {session_id} completed for user {request.user.username}")
+        logger.info(f"Test session {session_id} completed for user {request.user.username}")
 
-            return JsonResponse({
-                'status': 'success',
-                'redirect_url': reverse('app:view_results', kwargs={'session_id': session.id})
-            })
+        return JsonResponse({
+            'status': 'success',
+            'redirect_url': reverse('app:view_results', kwargs={'session_id': session.id})
+        })
 
     except TestSession.DoesNotExist:
         logger.error(f"Test session {session_id} not found")
@@ -360,36 +354,137 @@ def submit_test(request, session_id):
         logger.error(f"Unexpected error in submit_test: {e}")
         return JsonResponse({'status': 'error', 'message': f'Xato yuz berdi: {str(e)}'})
 
+def upsert_answers(session_id, answers):
+    """Javoblarni bitta INSERT ... ON CONFLICT (test_session_id, question_id) DO UPDATE bilan yozish.
+
+    answers: (question_id, option_id, is_correct) kortejlari.
+    """
+    upsert_answer_rows([(session_id, *answer) for answer in answers])
+
+def save_pending_answers(session, data):
+    """POST dagi answer_<question_id>=<option_id> juftliklarini tekshirib, ommaviy saqlash."""
+    question_ids = set(session.randomized_question_ids)
+    pending = {}
+    for key, value in data.items():
+        if not key.startswith('answer_') or not value.isdigit():
+            continue
+        question_id = key[len('answer_'):]
+        if question_id.isdigit() and int(question_id) in question_ids:
+            pending[int(value)] = int(question_id)
+    if not pending:
+        return 0
+    options = AnswerOption.objects.filter(id__in=pending, is_deleted=False).values_list('id', 'question_id', 'is_correct')
+    answers = [
+        (question_id, option_id, is_correct)
+        for option_id, question_id, is_correct in options
+        if pending[option_id] == question_id
+    ]
+    if answers:
+        upsert_answers(session.id, answers)
+    return len(answers)
+
 def calculate_result(session):
+    """Sessiyani yakunlash: natija bitta agregat so‘rov bilan hisoblanadi, TestSession va Result yoziladi.
+
+    Chaqiruvchi sessiyani select_for_update bilan qulflagan bo‘lishi kerak (yoki yakka jarayon).
+    """
+    counts = UserAnswer.objects.filter(test_session=session).aggregate(
+        total=Count('id'),
+        correct=Count('id', filter=Q(is_correct=True)),
+    )
+    correct_answers, total_questions = counts['correct'], counts['total']
+    percent = (correct_answers / total_questions) * 100 if total_questions else 0
     with transaction.atomic():
-        session = TestSession.objects.select_for_update().get(id=session.id)
-        correct_answers = UserAnswer.objects.filter(
-            test_session=session,
-            selected_option__is_correct=True
-        ).count()
-        total_questions = session.answers.count()
-        percent = (correct_answers / total_questions) * 100 if total_questions else 0
+        session.completed = True
+        session.ended_at = session.ended_at or timezone.now()
         session.score = percent
-        session.save()
+        session.save(update_fields=['completed', 'ended_at', 'score', 'updated_at'])
         Result.objects.create(
             test_session=session,
             correct_answers=correct_answers,
             total_questions=total_questions,
             percent=percent
         )
-        logger.info(f"Result calculated for session {session.id}: {percent}%")
+    logger.info(f"Result calculated for session {session.id}: {percent}%")
+
+RESULT_PAGE_TIMEOUT = getattr(settings, 'RESULT_PAGE_TIMEOUT', 60 * 60 * 24)
 
 def view_results(request, session_id):
+    # Yakunlangan natija o‘zgarmaydi: tayyor sahifa sessiya egasi uchun keshdan beriladi
+    cache_key = result_page_cache_key(session_id)
+    cached = cache.get(cache_key)
+    if cached is not None and cached[0] == request.user.id:
+        return HttpResponse(cached[1])
     try:
-        session = TestSession.objects.get(id=session_id, user=request.user, is_deleted=False)
-        result = session.result
-        answers = session.answers.all()
-        return render(request, 'results.html', {'session': session, 'result': result, 'answers': answers})
+        session = TestSession.objects.select_related('subject', 'result').get(
+            id=session_id, user=request.user, is_deleted=False
+        )
     except TestSession.DoesNotExist:
         logger.error(f"Test session {session_id} not found for user {request.user.username}")
         raise Http404("Test sessiyasi topilmadi.")
+    if not hasattr(session, 'result'):
+        return redirect('app:test_session', session_id=session.id)
+    # Javoblar, savollar, tanlangan va to‘g‘ri variantlar: jami ikki so‘rov
+    answers = session.answers.select_related('question', 'selected_option').prefetch_related(
+        Prefetch('question__options', queryset=AnswerOption.objects.filter(is_correct=True), to_attr='correct_options')
+    )
+    response = render(request, 'results.html', {'session': session, 'result': session.result, 'answers': answers})
+    cache.set(cache_key, (request.user.id, response.content), RESULT_PAGE_TIMEOUT)
+    return response
+
+LEADERBOARD_SIZE = getattr(settings, 'LEADERBOARD_SIZE', 20)
+
+def leaderboard(request, subject_slug):
+    try:
+        subject = Subject.objects.get(slug=subject_slug, is_deleted=False)
+    except Subject.DoesNotExist:
+        raise Http404("Fan topilmadi.")
+    period = request.GET.get('period', 'all')
+    if period not in PERIODS:
+        period = 'all'
+    my_rank = get_user_rank(subject.id, request.user.id, period) if request.user.is_authenticated else None
+    return render(request, 'leaderboard.html', {
+        'subject': subject,
+        'period': period,
+        'periods': LEADERBOARD_PERIODS,
+        'top': get_leaderboard(subject.id, period, LEADERBOARD_SIZE),
+        'my_rank': my_rank,
+    })
+
+def leaderboard_api(request, subject_slug=None):
+    """Bot uchun JSON: slug bo‘lmasa fanlar ro‘yxati, aks holda top-10 va (telegram_id berilsa) o‘rin."""
+    if subject_slug is None:
+        subjects = Subject.objects.filter(is_deleted=False).order_by('name').values('slug', 'name')
+        return JsonResponse({'subjects': list(subjects)})
+    subject = Subject.objects.filter(slug=subject_slug, is_deleted=False).values('id', 'name').first()
+    if subject is None:
+        return JsonResponse({'status': 'error', 'message': 'Fan topilmadi.'}, status=404)
+    period = request.GET.get('period', 'all')
+    if period not in PERIODS:
+        period = 'all'
+    top = get_leaderboard(subject['id'], period, 10)
+    me = None
+    telegram_id = request.GET.get('telegram_id', '')
+    if telegram_id.isdigit():
+        user_id = User.objects.filter(username=telegram_id).values_list('id', flat=True).first()
+        if user_id is not None:
+            me = get_user_rank(subject['id'], user_id, period)
+    return JsonResponse({
+        'subject': subject['name'],
+        'period': period,
+        'top': [{'rank': row['rank'], 'name': row['name'], 'score': row['score']} for row in top],
+        'me': me,
+    })
+
+def metrics(request):
+    """Prometheus uchun jarayon metrikalari (staff foydalanuvchi yoki METRICS_TOKEN bearer tokeni)."""
+    allowed = request.user.is_staff or app_metrics.has_valid_token(request.headers.get('Authorization'))
+    if not allowed:
+        raise Http404
+    return HttpResponse(app_metrics.render(), content_type=app_metrics.CONTENT_TYPE)
 
 def send_telegram_result(telegram_id, session):
+    """Natija xabarini outbox navbatiga qo‘yish (send_telegram_outbox buyrug‘i yuboradi)."""
     message = (
         f"\U0001F4CA Test natijasi:\n"
         f"Fan: {session.subject.name}\n"
@@ -401,11 +496,5 @@ def send_telegram_result(telegram_id, session):
         )
     else:
         message += "Natija hisoblanmadi."
-    url = f"https://api.telegram.org/bot{settings.TELEGRAM_BOT_TOKEN}/sendMessage"
-    data = {'chat_id': telegram_id, 'text': message}
-    try:
-        response = requests.post(url, data=data)
-        response.raise_for_status()
-        logger.info(f"Telegram message sent to {telegram_id}")
-    except requests.RequestException as e:
-        logger.error(f"Failed to send Telegram message to {telegram_id}: {e}")
\ No newline at end of file
+    enqueue_telegram_message(telegram_id, message)
+    logger.info(f"Telegram result for {telegram_id} queued")
@@ -0,0 +1,205 @@
+"""Bot handlerlari benchmarki: sintetik update'larni register_handlers orqali soxta Bot API ga qarshi o'ynatish.
+
+Har bir sintetik foydalanuvchi: /start -> /register -> ism -> familiya -> telefon -> /profile -> /test.
+Adminlar: /admin -> foydalanuvchilar ro'yxati -> keyingi sahifa -> statistika -> kanal statistikasi.
+Hisobot: update/s, update turi bo'yicha kechikish gistogrammasi va event loop kechikishi.
+
+Ishga tushirish:
+    python benchmarks/bot_replay.py --users 500 --concurrency 50 --api-latency 20 --rate-limit 0.01
+"""
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+# get_login_url imzolash uchun token kerak; haqiqiy token ishlatilmaydi
+os.environ.setdefault("BOT_TOKEN", "123456:bench-token")
+
+from aiogram import Bot, Dispatcher  # noqa: E402
+from aiogram.client.session.aiohttp import AiohttpSession  # noqa: E402
+from aiogram.client.telegram import TelegramAPIServer  # noqa: E402
+
+import bot_metrics  # noqa: E402
+import database  # noqa: E402
+import handlers  # noqa: E402
+from config import ADMIN_IDS, BOT_TOKEN  # noqa: E402
+from fake_bot_api import FakeBotAPI  # noqa: E402
+from webhook_client import _update_ids, make_message_update  # noqa: E402
+
+BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+
+def make_contact_update(user_id: int, phone_number: str) -> dict:
+    update = make_message_update(user_id, "")
+    message = update["message"]
+    del message["text"]
+    message["contact"] = {"phone_number": phone_number, "first_name": f"User{user_id}", "user_id": user_id}
+    return update
+
+
+def make_callback_update(user_id: int, data: str) -> dict:
+    update_id = next(_update_ids)
+    user = {"id": user_id, "is_bot": False, "first_name": f"User{user_id}"}
+    return {
+        "update_id": update_id,
+        "callback_query": {
+            "id": str(update_id),
+            "from": user,
+            "chat_instance": str(user_id),
+            "data": data,
+            "message": {
+                "message_id": update_id,
+                "date": int(time.time()),
+                "chat": {"id": user_id, "type": "private", "first_name": user["first_name"]},
+                "text": "🔐 Admin panel:",
+            },
+        },
+    }
+
+
+def student_script(user_id: int) -> list:
+    """Ro'yxatdan o'tish FSM bilan to'liq oqim: (tur, update) juftliklari."""
+    return [
+        ("/start", make_message_update(user_id, "/start")),
+        ("/register", make_message_update(user_id, "/register")),
+        ("first_name", make_message_update(user_id, "Ali")),
+        ("last_name", make_message_update(user_id, "Valiyev")),
+        ("phone_number", make_contact_update(user_id, "+998901234567")),
+        ("/profile", make_message_update(user_id, "/profile")),
+        ("/test", make_message_update(user_id, "/test")),
+    ]
+
+
+def admin_script(user_id: int, first_user_id: int) -> list:
+    return [
+        ("/admin", make_message_update(user_id, "/admin")),
+        ("admin:view_users", make_callback_update(user_id, "view_users")),
+        ("admin:next_page", make_callback_update(user_id, f"view_users_page_2_n{first_user_id + 10}")),
+        ("admin:stats", make_callback_update(user_id, "stats")),
+        ("admin:channel_stats", make_callback_update(user_id, "channel_stats")),
+    ]
+
+
+async def replay(dp: Dispatcher, bot: Bot, script: list, latencies: dict, errors: dict):
+    for kind, update in script:
+        start = time.perf_counter()
+        try:
+            await dp.feed_raw_update(bot, update)
+        except Exception as e:
+            errors[f"{kind}: {type(e).__name__}"] += 1
+        latencies[kind].append(time.perf_counter() - start)
+
+
+async def monitor_loop_lag(samples: list, interval: float = 0.01):
+    """Event loop qancha kechikib uyg'onishini o'lchash (bloklovchi kod belgisi)."""
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        samples.append(loop.time() - start - interval)
+
+
+def percentile(values: list, q: int) -> float:
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[q - 1]
+
+
+def histogram(values_ms: list) -> str:
+    counts = [0] * (len(BUCKETS_MS) + 1)
+    for value in values_ms:
+        counts[next((i for i, bound in enumerate(BUCKETS_MS) if value <= bound), len(BUCKETS_MS))] += 1
+    labels = [f"≤{bound}" for bound in BUCKETS_MS] + [f">{BUCKETS_MS[-1]}"]
+    return " ".join(f"{label}:{count}" for label, count in zip(labels, counts) if count)
+
+
+def print_report(latencies: dict, lag: list, elapsed: float, api: FakeBotAPI, errors: dict):
+    total = sum(len(values) for values in latencies.values())
+    print(f"{total} update {elapsed:.2f} s ichida: {total / elapsed:.0f} update/s\n")
+    print(f"{'tur':<22} {'soni':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}  gistogramma (ms:soni)")
+    for kind, values in latencies.items():
+        values_ms = [value * 1000 for value in values]
+        print(f"{kind:<22} {len(values):>6} {percentile(values_ms, 50):>8.2f} {percentile(values_ms, 95):>8.2f} "
+              f"{percentile(values_ms, 99):>8.2f}  {histogram(values_ms)}")
+    if lag:
+        lag_ms = [value * 1000 for value in lag]
+        print(f"\nEvent loop kechikishi: p50={percentile(lag_ms, 50):.2f} ms  p99={percentile(lag_ms, 99):.2f} ms  "
+              f"max={max(lag_ms):.2f} ms")
+    print("\nHandler ichidagi amallar va Bot API (bot_metrics):")
+    for metric in (bot_metrics.OPERATION_LATENCY, bot_metrics.API_LATENCY):
+        for name, labels, value in metric.samples():
+            if name.endswith("_sum"):
+                total = value
+            elif name.endswith("_count") and value:
+                label = ",".join(str(v) for _, v in labels)
+                print(f"  {label:<36} {value:>7.0f} ta  o'rtacha {total / value * 1000:8.2f} ms  jami {total:7.2f} s")
+    print(f"Bot API chaqiruvlari: {dict(api.calls)}")
+    if api.rate_limited:
+        print(f"429 javoblar: {dict(api.rate_limited)}")
+    if errors:
+        print(f"Handler xatolari: {dict(errors)}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--admins", type=int, default=5, help="Parallel admin panel oqimlari soni")
+    parser.add_argument("--concurrency", type=int, default=50, help="Bir vaqtda faol foydalanuvchilar")
+    parser.add_argument("--channels", type=int, default=1, help="Majburiy kanallar soni (getChat/getChatMember)")
+    parser.add_argument("--api-latency", type=float, default=0.0, help="Soxta Bot API javob kechikishi (ms)")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="429 qaytariladigan so'rovlar ulushi")
+    parser.add_argument("--retry-after", type=int, default=1)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.CRITICAL)
+
+    api = FakeBotAPI(latency=args.api_latency / 1000, rate_limit=args.rate_limit, retry_after=args.retry_after, seed=1)
+    await api.start()
+    bot = Bot(token=BOT_TOKEN, session=AiohttpSession(api=TelegramAPIServer.from_base(api.url)))
+    handlers.MANDATORY_CHANNELS[:] = [f"@bench_channel_{i}" for i in range(args.channels)]
+
+    # Benchmark repodagi bazaga tegmaydi: vaqtinchalik fayl, joriy oqim ulanishi ham yangidan ochiladi
+    original_path = database.DATABASE_PATH
+    database.close_connection()
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DATABASE_PATH = os.path.join(tmp, "users.db")
+        try:
+            database.init_db()
+            dp = Dispatcher()
+            handlers.register_handlers(dp)
+            bot_metrics.setup_bot_metrics(dp, bot)
+
+            first_user_id = 1000000
+            admin_ids = [int(admin_id) for admin_id in ADMIN_IDS]
+            scripts = [student_script(first_user_id + i) for i in range(args.users)]
+            scripts += [admin_script(admin_ids[i % len(admin_ids)], first_user_id) for i in range(args.admins)]
+
+            latencies, errors, lag = defaultdict(list), defaultdict(int), []
+            semaphore = asyncio.Semaphore(args.concurrency)
+
+            async def run(script):
+                async with semaphore:
+                    await replay(dp, bot, script, latencies, errors)
+
+            monitor = asyncio.create_task(monitor_loop_lag(lag))
+            start = time.perf_counter()
+            await asyncio.gather(*(run(script) for script in scripts))
+            elapsed = time.perf_counter() - start
+            monitor.cancel()
+
+            print_report(latencies, lag, elapsed, api, errors)
+        finally:
+            await bot.session.close()
+            await api.close()
+            database.shutdown_db_executor()
+            database.close_connection()
+            database.DATABASE_PATH = original_path
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,78 @@
+"""database.py uchun mikro-benchmark: har chaqiruvda yangi ulanish vs doimiy ulanish.
+
+Ishga tushirish:
+    python benchmarks/db_bench.py --users 5000 --queries 20000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database  # noqa: E402
+
+
+def legacy_is_user_registered(path, telegram_id):
+    """Eski kod yo'li: har bir so'rov uchun connect/close."""
+    conn = sqlite3.connect(path, timeout=10)
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT 1 FROM users WHERE telegram_id = ?", (str(telegram_id),))
+        result = cur.fetchone() is not None
+        conn.commit()
+        return result
+    finally:
+        cur.close()
+        conn.close()
+
+
+def pooled_is_user_registered(telegram_id):
+    """Doimiy ulanish orqali, foydalanuvchi keshisiz."""
+    def _check_registered(cur, telegram_id):
+        cur.execute("SELECT 1 FROM users WHERE telegram_id = ?", (str(telegram_id),))
+        return cur.fetchone() is not None
+    return database.safe_db_operation_with_retry(_check_registered, telegram_id)
+
+
+def measure(label, func, ids):
+    start = time.perf_counter()
+    for telegram_id in ids:
+        func(telegram_id)
+    elapsed = time.perf_counter() - start
+    qps = len(ids) / elapsed if elapsed else float("inf")
+    print(f"{label:<24} {len(ids):>8} so'rov  {elapsed:8.3f} s  {qps:12.0f} so'rov/s")
+    return qps
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=20000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        database.DATABASE_PATH = path
+        database.init_db()
+        conn = database.get_connection()
+        conn.executemany(
+            "INSERT INTO users (telegram_id, first_name, last_name, phone_number) VALUES (?, ?, ?, ?)",
+            [(str(1000000 + i), "Ism", "Familiya", "+998901234567") for i in range(args.users)],
+        )
+        conn.commit()
+
+        ids = [1000000 + random.randrange(args.users * 2) for _ in range(args.queries)]
+        legacy = measure("connect-per-call", lambda t: legacy_is_user_registered(path, t), ids)
+        pooled = measure("pooled", pooled_is_user_registered, ids)
+        cached = measure("pooled + user cache", database.is_user_registered, ids)
+        print(f"Tezlanish: pooled {pooled / legacy:.1f}x, pooled + cache {cached / legacy:.1f}x")
+        print(f"Kesh: {database.get_user_cache_stats()}")
+        database.close_connection()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+"""Imtihon oqimi uchun yuklama testi: parallel o'quvchilar, kechikish persentillari va so'rovlar soni.
+
+Har bir o'quvchi: telegram_auth -> start_test -> test_session -> 30 x save_answer -> submit_test -> view_results.
+Bot bazasi (get_user_status) stub bilan almashtiriladi, Telegram xabarlari outbox'da qoladi.
+
+Ishga tushirish:
+    python benchmarks/exam_load.py --students 100 --concurrency 10
+    python benchmarks/exam_load.py --update-baseline   # joriy natijani baseline sifatida saqlash
+
+Baseline'dan yomonlashsa (o'rtacha so'rovlar soni oshsa, p95 yoki o'tkazuvchanlik --tolerance dan ko'proq
+yomonlashsa) 1 kod bilan chiqadi.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test import Client  # noqa: E402
+from django.test.utils import CaptureQueriesContext  # noqa: E402
+from django.urls import reverse  # noqa: E402
+from app import answer_store  # noqa: E402
+from app.models import AnswerOption, Question, Subject, TestSession, Topic  # noqa: E402
+from app.question_pool import invalidate_question_pool  # noqa: E402
+from login_token import make_login_token  # noqa: E402
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "exam_load_baseline.json")
+# Birinchi natijada profil/reyting yozuvlari yaratiladi, ularning soni oqimlar tartibiga
+# bog'liq; o'rtacha SQL soni shundan ortiq oshsa regressiya hisoblanadi
+QUERY_SLACK = 0.5
+STEPS = ("telegram_auth", "start_test", "test_session", "save_answer", "submit_test", "view_results")
+
+
+def generate_data(subjects, questions, students):
+    """N ta fan (har birida `questions` ta 4 variantli savol) va bot foydalanuvchilari profillari."""
+    slugs = []
+    for index in range(subjects):
+        subject = Subject.objects.create(name=f"Fan {index + 1}")
+        topic = Topic.objects.create(subject=subject, name=f"Fan {index + 1} umumiy")
+        created = Question.objects.bulk_create([
+            Question(topic=topic, text=f"Fan {index + 1} savol {i}") for i in range(questions)
+        ])
+        AnswerOption.objects.bulk_create([
+            AnswerOption(question=question, label=label, text=f"Variant {label}", is_correct=(label == 'A'))
+            for question in created
+            for label in 'ABCD'
+        ])
+        invalidate_question_pool(subject.id)
+        slugs.append(subject.slug)
+    options = defaultdict(list)
+    for option_id, question_id in AnswerOption.objects.values_list('id', 'question_id'):
+        options[question_id].append(option_id)
+    profiles = {
+        str(5000000 + i): {
+            'registered': True, 'banned': False,
+            'profile': (str(5000000 + i), "Ism", "Familiya", "+998901234567", 0, "2025-01-01 00:00:00"),
+        }
+        for i in range(students)
+    }
+    return slugs, dict(options), profiles
+
+
+class Recorder:
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def call(self, step, func, *args, **kwargs):
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            response = func(*args, **kwargs)
+            elapsed = time.perf_counter() - started
+        if response.status_code >= 400:
+            raise RuntimeError(f"{step}: HTTP {response.status_code}")
+        with self._lock:
+            self.samples[step].append((elapsed, len(queries)))
+        return response
+
+
+def run_student(telegram_id, slug, options, recorder):
+    client = Client()
+    try:
+        token = make_login_token(telegram_id, settings.TELEGRAM_BOT_TOKEN)
+        recorder.call("telegram_auth", client.get, reverse('app:telegram_auth', kwargs={'token': token}))
+        response = recorder.call("start_test", client.get, reverse('app:start_test', kwargs={'subject_slug': slug}))
+        session_id = int(response.url.rstrip('/').rsplit('/', 1)[-1])
+        recorder.call("test_session", client.get, response.url)
+        question_ids = TestSession.objects.values_list('randomized_question_ids', flat=True).get(id=session_id)
+        for question_id in question_ids:
+            url = reverse('app:save_answer', kwargs={'session_id': session_id, 'question_id': question_id})
+            result = recorder.call("save_answer", client.post, url, {'answer_id': random.choice(options[question_id])})
+            if result.json()['status'] != 'success':
+                raise RuntimeError(f"save_answer: {result.json()}")
+        result = recorder.call("submit_test", client.post, reverse('app:submit_test', kwargs={'session_id': session_id}))
+        if result.json()['status'] != 'success':
+            raise RuntimeError(f"submit_test: {result.json()}")
+        recorder.call("view_results", client.get, result.json()['redirect_url'])
+    finally:
+        connection.close()
+
+
+def percentile(values, q):
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method='inclusive')[q - 1]
+
+
+def summarize(recorder, elapsed, students):
+    report = {'steps': {}}
+    total_requests = 0
+    for step in STEPS:
+        samples = recorder.samples[step]
+        latencies = [s[0] * 1000 for s in samples]
+        total_requests += len(samples)
+        report['steps'][step] = {
+            'requests': len(samples),
+            'p50_ms': round(percentile(latencies, 50), 3),
+            'p95_ms': round(percentile(latencies, 95), 3),
+            'p99_ms': round(percentile(latencies, 99), 3),
+            'queries': round(statistics.mean(s[1] for s in samples), 2),
+            'max_queries': max(s[1] for s in samples),
+        }
+    report['requests_per_second'] = round(total_requests / elapsed, 1)
+    report['sessions_per_second'] = round(students / elapsed, 2)
+    return report
+
+
+def print_report(report):
+    print(f"{'qadam':<14} {'so‘rov':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'SQL':>6} {'max SQL':>8}")
+    for step, row in report['steps'].items():
+        print(f"{step:<14} {row['requests']:>7} {row['p50_ms']:>9.2f} {row['p95_ms']:>9.2f} "
+              f"{row['p99_ms']:>9.2f} {row['queries']:>6} {row['max_queries']:>8}")
+    print(f"O'tkazuvchanlik: {report['requests_per_second']} so'rov/s, {report['sessions_per_second']} sessiya/s")
+
+
+def compare(report, baseline, tolerance):
+    """Baseline bilan solishtirish; regressiyalar ro'yxatini qaytaradi."""
+    problems = []
+    for step, row in report['steps'].items():
+        base = baseline['steps'].get(step)
+        if base is None:
+            continue
+        if row['queries'] > base['queries'] + QUERY_SLACK:
+            problems.append(f"{step}: SQL so'rovlar {base['queries']} -> {row['queries']}")
+        if row['p95_ms'] > base['p95_ms'] * (1 + tolerance):
+            problems.append(f"{step}: p95 {base['p95_ms']} ms -> {row['p95_ms']} ms")
+    if report['requests_per_second'] < baseline['requests_per_second'] * (1 - tolerance):
+        problems.append(
+            f"o'tkazuvchanlik {baseline['requests_per_second']} -> {report['requests_per_second']} so'rov/s"
+        )
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--students", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--subjects", type=int, default=3)
+    parser.add_argument("--questions", type=int, default=300, help="Har bir fandagi savollar soni")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="p95 va o'tkazuvchanlik uchun ruxsat etilgan nisbiy yomonlashish")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    settings.DEBUG = False
+    settings.TELEGRAM_BOT_TOKEN = settings.TELEGRAM_BOT_TOKEN or "load-test-token"
+    with tempfile.TemporaryDirectory() as tmp:
+        # Parallel oqimlar uchun fayldagi WAL baza (xotiradagi SQLite yozishda bloklanadi)
+        connection.settings_dict['TEST']['NAME'] = os.path.join(tmp, "load.sqlite3")
+        # ANSWER_WRITE_BEHIND=1 bilan ishga tushirilsa jurnal ham vaqtinchalik papkada
+        settings.ANSWER_JOURNAL_DIR = os.path.join(tmp, "answer_journal")
+        settings.CACHES[settings.ANSWER_STORE_CACHE]['LOCATION'] = os.path.join(tmp, "answer_cache")
+        connection.creation.create_test_db(verbosity=0)
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA journal_mode=WAL")
+        slugs, options, profiles = generate_data(args.subjects, args.questions, args.students)
+        connection.close()
+
+        recorder = Recorder()
+        with mock.patch('app.views.get_user_status', side_effect=profiles.get):
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+                futures = [
+                    executor.submit(run_student, telegram_id, slugs[i % len(slugs)], options, recorder)
+                    for i, telegram_id in enumerate(profiles)
+                ]
+                for future in futures:
+                    future.result()
+            elapsed = time.perf_counter() - started
+        if answer_store.write_behind_enabled():
+            answer_store.get_answer_store().stop()
+
+    report = summarize(recorder, elapsed, args.students)
+    report['config'] = {key: getattr(args, key) for key in ('students', 'concurrency', 'subjects', 'questions')}
+    print_report(report)
+
+    if args.update_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+            f.write("\n")
+        print(f"Baseline saqlandi: {args.baseline}")
+        return
+    if not os.path.exists(args.baseline):
+        print("Baseline topilmadi, solishtirish o'tkazib yuborildi (--update-baseline bilan yarating).")
+        return
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline.get('config') != report['config']:
+        print(f"Diqqat: baseline boshqa sozlamalarda olingan: {baseline.get('config')}")
+    problems = compare(report, baseline, args.tolerance)
+    if problems:
+        print("❌ Regressiya:\n  " + "\n  ".join(problems))
+        sys.exit(1)
+    print("✅ Baseline darajasida.")
+
+
+if __name__ == "__main__":
+    main()
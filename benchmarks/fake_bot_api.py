@@ -0,0 +1,138 @@
+"""Soxta Telegram Bot API serveri (aiohttp): bot benchmarklari uchun tarmoqsiz stub.
+
+sendMessage, editMessageText, getChat, getChatMember, getChatMemberCount va boshqa
+metodlarga javob beradi. Javob kechikishi va 429 (Too Many Requests) ulushini sozlash mumkin.
+
+Alohida ishga tushirish:
+    python benchmarks/fake_bot_api.py --port 8081 --latency 50 --rate-limit 0.05
+Botni unga ulash: Bot(token, session=AiohttpSession(api=TelegramAPIServer.from_base(url)))
+"""
+import argparse
+import asyncio
+import itertools
+import random
+import time
+from collections import Counter
+
+from aiohttp import web
+
+
+class FakeBotAPI:
+    """Bot API metodlariga minimal to'g'ri javoblar; chaqiruvlar va 429 lar sanaladi."""
+
+    def __init__(self, latency: float = 0.0, rate_limit: float = 0.0, retry_after: int = 1, seed: int = None):
+        self.latency = latency  # sekundlarda, har bir javob uchun
+        self.rate_limit = rate_limit  # 429 qaytariladigan so'rovlar ulushi (0..1)
+        self.retry_after = retry_after
+        self.calls = Counter()
+        self.rate_limited = Counter()
+        self.url = None
+        self._random = random.Random(seed)
+        self._message_ids = itertools.count(1)
+        self._runner = None
+
+    def create_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self.handle)
+        return app
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Serverni ishga tushirish; port=0 bo'lsa bo'sh port tanlanadi. Asosiy URL ni qaytaradi."""
+        self._runner = web.AppRunner(self.create_app())
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        host, port = self._runner.addresses[0][:2]
+        self.url = f"http://{host}:{port}"
+        return self.url
+
+    async def close(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        token = request.match_info["token"]
+        params = dict(await request.post())
+        self.calls[method] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.rate_limit and self._random.random() < self.rate_limit:
+            self.rate_limited[method] += 1
+            return web.json_response({
+                "ok": False,
+                "error_code": 429,
+                "description": f"Too Many Requests: retry after {self.retry_after}",
+                "parameters": {"retry_after": self.retry_after},
+            })
+        handler = getattr(self, f"_{method.lower()}", None)
+        result = handler(params, token) if handler else True
+        return web.json_response({"ok": True, "result": result})
+
+    # Metodlar (nomlari Bot API metodining kichik harfdagi ko'rinishi)
+    def _message(self, params):
+        return {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": self._chat(params.get("chat_id", "0")),
+            "text": params.get("text", ""),
+        }
+
+    @staticmethod
+    def _chat(chat_id):
+        chat_id = str(chat_id)
+        if chat_id.isdigit():
+            return {"id": int(chat_id), "type": "private", "first_name": f"User{chat_id}"}
+        # Kanal: -100... yoki @username
+        numeric = int(chat_id) if chat_id.lstrip("-").isdigit() else -1000000000001
+        return {"id": numeric, "type": "channel", "title": f"Kanal {chat_id}"}
+
+    def _sendmessage(self, params, token):
+        return self._message(params)
+
+    def _editmessagetext(self, params, token):
+        return self._message(params)
+
+    def _getchat(self, params, token):
+        # getChat to'liq ChatFullInfo qaytaradi
+        chat = self._chat(params["chat_id"])
+        return {**chat, "accent_color_id": 0, "max_reaction_count": 11,
+                "accepted_gift_types": {"unlimited_gifts": False, "limited_gifts": False,
+                                        "unique_gifts": False, "premium_subscription": False}}
+
+    def _getchatmember(self, params, token):
+        user_id = int(params["user_id"])
+        user = {"id": user_id, "is_bot": False, "first_name": f"User{user_id}"}
+        if str(user_id) == token.split(":", 1)[0]:
+            return {"status": "creator", "user": {**user, "is_bot": True}, "is_anonymous": False}
+        return {"status": "member", "user": user}
+
+    def _getchatmembercount(self, params, token):
+        return 1000
+
+    def _getme(self, params, token):
+        bot_id = int(token.split(":", 1)[0])
+        return {"id": bot_id, "is_bot": True, "first_name": "Bench bot", "username": "bench_bot"}
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0.0, help="Javob kechikishi (ms)")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="429 qaytariladigan so'rovlar ulushi")
+    parser.add_argument("--retry-after", type=int, default=1)
+    args = parser.parse_args()
+
+    api = FakeBotAPI(latency=args.latency / 1000, rate_limit=args.rate_limit, retry_after=args.retry_after)
+    print(f"Soxta Bot API: {await api.start(args.host, args.port)} (to'xtatish: Ctrl+C)")
+    try:
+        while True:
+            await asyncio.sleep(10)
+            print(dict(api.calls), "429:", dict(api.rate_limited))
+    finally:
+        await api.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
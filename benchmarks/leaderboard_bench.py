@@ -0,0 +1,111 @@
+"""Reyting benchmarki: Result bo'yicha to'g'ridan-to'g'ri agregat vs oldindan hisoblangan reyting jadvallari.
+
+Ishga tushirish (xotiradagi test bazasida):
+    python benchmarks/leaderboard_bench.py --results 1000000 --users 100000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.db import connection, transaction  # noqa: E402
+from django.db.models import Max  # noqa: E402
+from django.utils import timezone  # noqa: E402
+from app.leaderboard import get_leaderboard, get_user_rank, rebuild_leaderboards, record_score  # noqa: E402
+from app.models import Result, Subject, TestSession  # noqa: E402
+from django.contrib.auth.models import User  # noqa: E402
+
+
+def naive_top(subject_id, limit=10):
+    """Eski yo'l: har so'rovda barcha natijalarni foydalanuvchi bo'yicha guruhlash."""
+    return list(Result.objects.filter(test_session__subject_id=subject_id).values(
+        'test_session__user_id'
+    ).annotate(best=Max('percent')).order_by('-best')[:limit])
+
+
+def naive_rank(subject_id, user_id):
+    results = Result.objects.filter(test_session__subject_id=subject_id)
+    best = results.filter(test_session__user_id=user_id).aggregate(best=Max('percent'))['best']
+    above = results.values('test_session__user_id').annotate(best=Max('percent')).filter(best__gt=best).count()
+    return above + 1
+
+
+def measure(label, func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    elapsed = (time.perf_counter() - start) / repeat
+    print(f"{label:<20} {elapsed * 1000:10.3f} ms/so'rov  {str(result)[:60]}")
+
+
+def populate(subject, users, results):
+    now = timezone.now()
+    user_table, session_table, result_table = (
+        User._meta.db_table, TestSession._meta.db_table, Result._meta.db_table
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f"INSERT INTO {user_table} (id, password, is_superuser, username, first_name, last_name, email, "
+            f"is_staff, is_active, date_joined) VALUES (%s, '!', 0, %s, 'Ism', 'Familiya', '', 0, 1, %s)",
+            [(i, str(1000000 + i), now) for i in range(1, users + 1)],
+        )
+        for start in range(0, results, 100000):
+            batch = range(start + 1, min(start + 100000, results) + 1)
+            created = [now - timedelta(minutes=random.randint(0, 60 * 24 * 30)) for _ in batch]
+            cursor.executemany(
+                f"INSERT INTO {session_table} (id, created_at, updated_at, is_deleted, user_id, subject_id, "
+                f"started_at, ended_at, completed, score, randomized_question_ids) "
+                f"VALUES (%s, %s, %s, 0, %s, %s, %s, %s, 1, 0, '[]')",
+                [(i, c, c, random.randint(1, users), subject.id, c, c) for i, c in zip(batch, created)],
+            )
+            rows = []
+            for i, c in zip(batch, created):
+                correct = random.randint(0, 30)
+                rows.append((i, c, c, i, correct, round(correct / 30 * 100, 2)))
+            cursor.executemany(
+                f"INSERT INTO {result_table} (id, created_at, updated_at, is_deleted, test_session_id, "
+                f"correct_answers, total_questions, percent) VALUES (%s, %s, %s, 0, %s, %s, 30, %s)",
+                rows,
+            )
+        cursor.execute("ANALYZE")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--results", type=int, default=1000000)
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    connection.creation.create_test_db(verbosity=0)
+    subject = Subject.objects.create(name="Matematika")
+
+    started = time.perf_counter()
+    with transaction.atomic():
+        populate(subject, args.users, args.results)
+    print(f"{args.results} ta natija yozildi: {time.perf_counter() - started:.1f} s")
+    started = time.perf_counter()
+    print(f"rebuild_leaderboards: {rebuild_leaderboards()} ({time.perf_counter() - started:.1f} s)")
+
+    user_id = random.randint(1, args.users)
+    slow_repeat = max(1, args.repeat // 100)
+    measure("naive_top", lambda: naive_top(subject.id), slow_repeat)
+    measure("get_leaderboard", lambda: get_leaderboard(subject.id), args.repeat)
+    measure("naive_rank", lambda: naive_rank(subject.id, user_id), slow_repeat)
+    measure("get_user_rank", lambda: get_user_rank(subject.id, user_id), args.repeat)
+    measure("get_user_rank week", lambda: get_user_rank(subject.id, user_id, 'week'), args.repeat)
+    measure("record_score", lambda: record_score(random.randint(1, args.users), subject.id,
+                                                 round(random.randint(0, 30) / 30 * 100, 2)), args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Admin statistikasi benchmarki: eski uch bosqichli yo'l vs get_user_stats.
+
+Ishga tushirish:
+    python benchmarks/stats_bench.py --users 1000000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database  # noqa: E402
+
+
+def legacy_stats():
+    """Eski kod yo'li: COUNT(*), DATE(created_at) va barcha foydalanuvchilarni Python'da filtrlash."""
+    conn = database.get_connection()
+    total = conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+    today = conn.execute("SELECT COUNT(*) FROM users WHERE DATE(created_at) = DATE('now')").fetchone()[0]
+    rows = conn.execute("SELECT telegram_id, first_name, last_name, phone_number, banned FROM users").fetchall()
+    banned = len([u for u in rows if u[4]])
+    return total, today, banned
+
+
+def measure(label, func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    elapsed = (time.perf_counter() - start) / repeat
+    print(f"{label:<16} {elapsed * 1000:10.3f} ms/so'rov  {result}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=1000000)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DATABASE_PATH = os.path.join(tmp, "bench.db")
+        database.init_db()
+        conn = database.get_connection()
+        rows = (
+            (str(1000000 + i), "Ism", "Familiya", "+998901234567", int(random.random() < 0.01),
+             f"2025-{random.randint(1, 12):02d}-{random.randint(1, 28):02d} 12:00:00")
+            for i in range(args.users)
+        )
+        conn.executemany(
+            "INSERT INTO users (telegram_id, first_name, last_name, phone_number, banned, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+        conn.executemany(
+            "INSERT INTO users (telegram_id, first_name, last_name, phone_number) VALUES (?, ?, ?, ?)",
+            [(str(9000000 + i), "Ism", "Familiya", "+998901234567") for i in range(100)],
+        )
+        conn.commit()
+        conn.execute("ANALYZE")
+
+        measure("legacy", legacy_stats, max(1, args.repeat // 100))
+        measure("get_user_stats", database.get_user_stats, args.repeat)
+        database.close_connection()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Soxta Telegram mijozi: webhook serveriga sintetik update'larni POST qiladi.
+
+Botni webhook rejimida ishga tushiring (BOT_MODE=webhook, WEBHOOK_SECRET=bench-secret, WEBHOOK_URL bo'sh) va:
+    python benchmarks/webhook_client.py --url http://127.0.0.1:8080 --updates 1000 --concurrency 50 --secret bench-secret
+
+--secret berilmasa WEBHOOK_SECRET muhit o'zgaruvchisidan olinadi.
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import time
+
+import aiohttp
+
+_update_ids = itertools.count(1)
+
+
+def make_message_update(user_id: int, text: str) -> dict:
+    """Shaxsiy chatdan kelgan matnli xabar update'i."""
+    update_id = next(_update_ids)
+    user = {"id": user_id, "is_bot": False, "first_name": f"User{user_id}"}
+    message = {
+        "message_id": update_id,
+        "date": int(time.time()),
+        "chat": {"id": user_id, "type": "private", "first_name": user["first_name"]},
+        "from": user,
+        "text": text,
+    }
+    if text.startswith("/"):
+        message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+    return {"update_id": update_id, "message": message}
+
+
+async def post_updates(url: str, updates: list, concurrency: int, secret: str = None) -> list:
+    headers = {"X-Telegram-Bot-Api-Secret-Token": secret} if secret else {}
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async with aiohttp.ClientSession(headers=headers) as session:
+        async def post(update):
+            async with semaphore:
+                start = time.perf_counter()
+                async with session.post(url, json=update) as response:
+                    response.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+
+        await asyncio.gather(*(post(update) for update in updates))
+    return latencies
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:8080")
+    parser.add_argument("--path", default="/webhook")
+    parser.add_argument("--updates", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--secret", default=os.environ.get("WEBHOOK_SECRET"),
+                        help="X-Telegram-Bot-Api-Secret-Token (standart: WEBHOOK_SECRET)")
+    args = parser.parse_args()
+
+    updates = [make_message_update(1000000 + i % 500, "/start") for i in range(args.updates)]
+    start = time.perf_counter()
+    latencies = sorted(await post_updates(args.url + args.path, updates, args.concurrency, args.secret))
+    elapsed = time.perf_counter() - start
+    print(f"{len(updates)} update {elapsed:.2f} s ichida, {len(updates) / elapsed:.0f} update/s")
+    print(f"p50={latencies[len(latencies) // 2] * 1000:.1f} ms  p99={latencies[int(len(latencies) * 0.99)] * 1000:.1f} ms")
+
+    async with aiohttp.ClientSession() as session:
+        async with session.get(args.url + "/health") as response:
+            print(await response.json())
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -2,9 +2,11 @@ import asyncio
 import logging
 from aiogram import Bot, Dispatcher, types
 # from aiogram.utils.exceptions import TelegramAPIError
-from config import BOT_TOKEN
-from database import init_db
-from handlers import register_handlers
+from config import BOT_TOKEN, BOT_MODE
+from database import init_db, shutdown_db_executor
+from handlers import register_handlers, resume_ad_broadcasts
+from bot_metrics import setup_bot_metrics, start_metrics_server
+from webhook import run_webhook
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -16,6 +18,7 @@ async def set_default_commands(bot: Bot):
         types.BotCommand(command="register", description="📋 Ro'yxatdan o'tish"),
         types.BotCommand(command="test", description="📝 Test topshirish"),
         types.BotCommand(command="profile", description="👤 Profil ma'lumotlari"),
+        types.BotCommand(command="top", description="🏆 Reyting"),
         types.BotCommand(command="help", description="❓ Yordam"),
         types.BotCommand(command="cancel", description="❌ Jarayonni bekor qilish"),
         types.BotCommand(command="admin", description="🔐 Admin panel (faqat adminlar uchun)"),
@@ -28,16 +31,26 @@ async def main():
 
     init_db()  # Initialize database
     register_handlers(dp)  # Register handlers
+    setup_bot_metrics(dp, bot)  # Update, handler va Bot API metrikalari
+    metrics_runner = await start_metrics_server()
 
     await set_default_commands(bot)  # Set bot commands
+    await resume_ad_broadcasts(bot)  # Resume broadcasts interrupted by a restart
 
     try:
-        logger.info("Bot polling started")
-        await dp.start_polling(bot)
+        if BOT_MODE == "webhook":
+            logger.info("Bot webhook mode started")
+            await run_webhook(bot, dp)
+        else:
+            logger.info("Bot polling started")
+            await dp.start_polling(bot)
     except Exception as e:
-        logger.error(f"Bot polling error: {e}")
+        logger.error(f"Bot {BOT_MODE} error: {e}")
     finally:
         await bot.session.close()
+        if metrics_runner:
+            await metrics_runner.cleanup()
+        shutdown_db_executor()
         logger.info("Bot session closed")
 
 if __name__ == "__main__":
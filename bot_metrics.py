@@ -0,0 +1,187 @@
+import asyncio
+import logging
+import sys
+import threading
+import time
+from collections import Counter as StackCounter
+from contextlib import contextmanager
+from functools import wraps
+from aiohttp import web
+from aiogram import BaseMiddleware, Bot, Dispatcher
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.dispatcher.event.bases import UNHANDLED
+from config import BOT_METRICS_HOST, BOT_METRICS_PORT, BOT_PROFILER_ENABLED
+from prometheus import CONTENT_TYPE, Registry
+
+logger = logging.getLogger(__name__)
+
+# Bot jarayonining metrikalari; alohida aiohttp server /metrics orqali beradi.
+REGISTRY = Registry()
+
+UPDATE_LATENCY = REGISTRY.histogram(
+    'bot_update_duration_seconds', "Update'ni qayta ishlash vaqti (handler bo'yicha)", ('event', 'handler'))
+UPDATES = REGISTRY.counter(
+    'bot_updates_total', "Qayta ishlangan update'lar", ('event', 'handler', 'status'))
+HANDLER_ERRORS = REGISTRY.counter(
+    'bot_handler_errors_total', "Handlerlardagi xatolar", ('handler', 'error'))
+API_LATENCY = REGISTRY.histogram(
+    'bot_api_request_duration_seconds', "Bot API chaqiruvlari vaqti", ('method', 'outcome'))
+FSM_TRANSITIONS = REGISTRY.counter(
+    'bot_fsm_transitions_total', "FSM holat o'tishlari", ('from_state', 'to_state'))
+OPERATION_LATENCY = REGISTRY.histogram(
+    'bot_operation_duration_seconds', "Handler ichidagi amallar (obuna tekshiruvi, baza) vaqti", ('operation',))
+
+
+@contextmanager
+def track(operation):
+    """Blok bajarilish vaqtini OPERATION_LATENCY ga yozish."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        OPERATION_LATENCY.observe(time.perf_counter() - started, operation=operation)
+
+
+def timed(operation):
+    """Async funksiya uchun track() dekoratori."""
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            with track(operation):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class UpdateMetricsMiddleware(BaseMiddleware):
+    """Update darajasidagi tashqi middleware: vaqt, natija, xatolar va FSM o'tishlari.
+
+    Handler nomi update darajasida hali ma'lum emas, uni HandlerNameMiddleware
+    data['metrics'] lug'atiga yozib qo'yadi.
+    """
+
+    async def __call__(self, handler, event, data):
+        context = data['metrics'] = {'handler': 'unhandled'}
+        state = data.get('state')
+        before = await state.get_state() if state else None
+        started = time.perf_counter()
+        status = 'ok'
+        try:
+            result = await handler(event, data)
+            if result is UNHANDLED:
+                status = 'unhandled'
+            return result
+        except Exception as e:
+            status = 'error'
+            HANDLER_ERRORS.inc(handler=context['handler'], error=type(e).__name__)
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            event_type = event.event_type
+            UPDATE_LATENCY.observe(elapsed, event=event_type, handler=context['handler'])
+            UPDATES.inc(event=event_type, handler=context['handler'], status=status)
+            if state:
+                after = await state.get_state()
+                if after != before:
+                    FSM_TRANSITIONS.inc(from_state=before or 'none', to_state=after or 'none')
+
+
+class HandlerNameMiddleware(BaseMiddleware):
+    """Ichki middleware: tanlangan handler nomini UpdateMetricsMiddleware ga uzatish."""
+
+    async def __call__(self, handler, event, data):
+        context = data.get('metrics')
+        if context is not None:
+            context['handler'] = data['handler'].callback.__name__
+        return await handler(event, data)
+
+
+class BotAPIMetricsMiddleware(BaseRequestMiddleware):
+    """Bot sessiyasi middleware'i: har bir Bot API chaqiruvining vaqti va natijasi."""
+
+    async def __call__(self, make_request, bot, method):
+        started = time.perf_counter()
+        outcome = 'ok'
+        try:
+            return await make_request(bot, method)
+        except Exception as e:
+            outcome = type(e).__name__
+            raise
+        finally:
+            API_LATENCY.observe(time.perf_counter() - started, method=method.__api_method__, outcome=outcome)
+
+
+def setup_bot_metrics(dp: Dispatcher, bot: Bot):
+    """Middleware'larni ulash. register_handlers dan oldin yoki keyin chaqirish mumkin."""
+    dp.update.outer_middleware(UpdateMetricsMiddleware())
+    for observer in (dp.message, dp.callback_query):
+        observer.middleware(HandlerNameMiddleware())
+    bot.session.middleware(BotAPIMetricsMiddleware())
+
+
+class SamplingProfiler:
+    """Event loop oqimining stekini fon oqimidan davriy o'qiydigan profiler.
+
+    Natija flamegraph uchun "folded" formatda: `modul:funksiya;...;modul:funksiya soni`.
+    Event loop'ni to'xtatmaydi, shuning uchun ishlab turgan botda yoqish mumkin.
+    """
+
+    def __init__(self, thread_id: int, interval: float = 0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self._lock = threading.Lock()
+
+    def sample(self, seconds: float) -> str:
+        if not self._lock.acquire(blocking=False):
+            raise RuntimeError("Profiler allaqachon ishlamoqda")
+        try:
+            stacks = StackCounter()
+            deadline = time.monotonic() + seconds
+            while time.monotonic() < deadline:
+                frame = sys._current_frames().get(self.thread_id)
+                names = []
+                while frame is not None:
+                    names.append(f"{frame.f_globals.get('__name__', '?')}:{frame.f_code.co_name}")
+                    frame = frame.f_back
+                stacks[";".join(reversed(names))] += 1
+                time.sleep(self.interval)
+        finally:
+            self._lock.release()
+        return "\n".join(f"{stack} {count}" for stack, count in stacks.most_common()) + "\n"
+
+
+async def metrics_handler(request: web.Request) -> web.Response:
+    return web.Response(body=REGISTRY.render().encode(), headers={'Content-Type': CONTENT_TYPE})
+
+
+async def profile_handler(request: web.Request) -> web.Response:
+    try:
+        seconds = min(float(request.query.get('seconds', 10)), 60)
+    except ValueError:
+        return web.Response(status=400, text="seconds son bo'lishi kerak")
+    try:
+        text = await asyncio.to_thread(request.app['profiler'].sample, seconds)
+    except RuntimeError as e:
+        return web.Response(status=409, text=str(e))
+    return web.Response(text=text)
+
+
+def create_metrics_app(profiler_enabled: bool = BOT_PROFILER_ENABLED) -> web.Application:
+    """/metrics va (yoqilgan bo'lsa) /profile?seconds=N. Event loop ichida chaqirilishi kerak."""
+    app = web.Application()
+    app.router.add_get('/metrics', metrics_handler)
+    if profiler_enabled:
+        app['profiler'] = SamplingProfiler(threading.get_ident())
+        app.router.add_get('/profile', profile_handler)
+    return app
+
+
+async def start_metrics_server(host: str = BOT_METRICS_HOST, port: int = BOT_METRICS_PORT):
+    """Metrikalar serverini ishga tushirish; port 0 bo'lsa hech narsa qilinmaydi. AppRunner qaytaradi."""
+    if not port:
+        return None
+    runner = web.AppRunner(create_metrics_app())
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info(f"Bot metrics server started on {host}:{port}")
+    return runner
@@ -0,0 +1,278 @@
+import asyncio
+import logging
+import time
+from aiogram import Bot
+from aiogram.exceptions import TelegramAPIError, TelegramRetryAfter, TelegramNetworkError, TelegramServerError
+from config import BROADCAST_RATE, BROADCAST_CONCURRENCY, BROADCAST_PROGRESS_INTERVAL
+from database import (
+    run_db, create_broadcast, get_pending_recipients, mark_broadcast_recipients,
+    get_broadcast_stats, get_failed_recipients, finish_broadcast, get_unfinished_broadcasts
+)
+
+logger = logging.getLogger(__name__)
+
+STATUS_PENDING = "pending"
+STATUS_SENT = "sent"
+STATUS_FAILED = "failed"
+STATUS_SKIPPED = "skipped"
+
+FETCH_BATCH_SIZE = 500
+FLUSH_BATCH_SIZE = 100
+FINAL_FLUSH_ATTEMPTS = 3
+FLUSH_RETRY_DELAY = 1.0
+MAX_SEND_ATTEMPTS = 5
+PER_CHAT_INTERVAL = 1.0
+
+# Ishlayotgan tarqatishlar (task GC tomonidan yo'qolib ketmasligi uchun)
+_running = {}
+
+
+class TokenBucket:
+    """Asinxron token bucket: sekundiga `rate` ta, `capacity` gacha portlash."""
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds: float):
+        """RetryAfter kelganda barcha yuboruvchilarni to'xtatib turish."""
+        self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+        self._tokens = 0
+        # To'xtash vaqtida tokenlar yig'ilmaydi, aks holda undan keyin darhol portlash bo'ladi
+        self._updated = self._blocked_until
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._blocked_until:
+                    await asyncio.sleep(self._blocked_until - now)
+                    continue
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class RateLimiter:
+    """Umumiy token bucket va har bir chat uchun minimal interval."""
+
+    def __init__(self, rate: float = BROADCAST_RATE, per_chat_interval: float = PER_CHAT_INTERVAL):
+        self.bucket = TokenBucket(rate)
+        self.per_chat_interval = per_chat_interval
+        self._last_sent = {}
+
+    def pause(self, seconds: float):
+        self.bucket.pause(seconds)
+
+    async def acquire(self, chat_id):
+        last = self._last_sent.get(chat_id)
+        if last is not None:
+            wait = last + self.per_chat_interval - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+        await self.bucket.acquire()
+        self._last_sent[chat_id] = time.monotonic()
+        if len(self._last_sent) > 10000:
+            cutoff = time.monotonic() - self.per_chat_interval
+            self._last_sent = {k: v for k, v in self._last_sent.items() if v > cutoff}
+
+
+async def _backoff_sleep(attempt):
+    """Vaqtinchalik xatodan keyin qayta urinishdan oldin kutish: 1, 2, 4, ... sekund."""
+    await asyncio.sleep(2 ** (attempt - 1))
+
+
+class BroadcastEngine:
+    """Bitta tarqatishni parallel yuboruvchilar bilan bajaradi va holatini bazaga yozadi."""
+
+    def __init__(self, bot: Bot, broadcast_id: int, message: str, admin_chat_id=None,
+                 recipient_filter=None, limiter: RateLimiter = None,
+                 concurrency: int = BROADCAST_CONCURRENCY,
+                 progress_interval: float = BROADCAST_PROGRESS_INTERVAL):
+        self.bot = bot
+        self.broadcast_id = broadcast_id
+        self.message = message
+        self.admin_chat_id = admin_chat_id
+        self.recipient_filter = recipient_filter
+        self.limiter = limiter or RateLimiter()
+        self.concurrency = concurrency
+        self.progress_interval = progress_interval
+        self.counts = {}
+        self._results = []
+        self._progress_message = None
+
+    @property
+    def total(self):
+        return sum(self.counts.values())
+
+    @property
+    def done(self):
+        return self.total - self.counts.get(STATUS_PENDING, 0)
+
+    async def run(self):
+        self.counts = await run_db(get_broadcast_stats, self.broadcast_id)
+        await self._send_progress()
+        queue = asyncio.Queue(maxsize=self.concurrency * 4)
+        workers = [asyncio.create_task(self._worker(queue)) for _ in range(self.concurrency)]
+        reporter = asyncio.create_task(self._report_progress())
+        flushed = False
+        try:
+            produced = await self._produce(queue)
+            await queue.join()
+        finally:
+            for task in workers + [reporter]:
+                task.cancel()
+            await asyncio.gather(*workers, reporter, return_exceptions=True)
+            flushed = await self._final_flush()
+        if not produced or not flushed:
+            # Qabul qiluvchilarni o'qib yoki holatini yozib bo'lmadi: tarqatish 'running' holida
+            # qoladi va bot qayta ishga tushganda resume_broadcasts uni davom ettiradi
+            reason = "pending recipients could not be loaded" if not produced else "recipient statuses could not be saved"
+            logger.error(f"Broadcast {self.broadcast_id} stopped: {reason}")
+            await self._send_progress()
+            return self.counts
+        await run_db(finish_broadcast, self.broadcast_id)
+        await self._send_progress(final=True)
+        logger.info(f"Broadcast {self.broadcast_id} finished: {self.counts}")
+        return self.counts
+
+    async def _produce(self, queue: asyncio.Queue):
+        """Kutilayotgan qabul qiluvchilarni navbatga qo'yish. Baza xatosida False qaytaradi."""
+        last_id = ""
+        while True:
+            batch = await run_db(get_pending_recipients, self.broadcast_id, last_id, FETCH_BATCH_SIZE)
+            if batch is None:
+                return False
+            if not batch:
+                return True
+            for telegram_id in batch:
+                await queue.put(telegram_id)
+            last_id = batch[-1]
+
+    async def _worker(self, queue: asyncio.Queue):
+        while True:
+            telegram_id = await queue.get()
+            try:
+                try:
+                    status, error = await self._deliver(telegram_id)
+                except Exception as e:
+                    logger.error(f"Unexpected broadcast error for {telegram_id}: {e}")
+                    status, error = STATUS_FAILED, str(e)[:200]
+                self.counts[STATUS_PENDING] = self.counts.get(STATUS_PENDING, 0) - 1
+                self.counts[status] = self.counts.get(status, 0) + 1
+                self._results.append((telegram_id, status, error))
+                if len(self._results) >= FLUSH_BATCH_SIZE:
+                    await self._flush()
+            finally:
+                queue.task_done()
+
+    async def _deliver(self, telegram_id):
+        if self.recipient_filter is not None and not await self.recipient_filter(telegram_id):
+            return STATUS_SKIPPED, None
+        # Faqat tarmoq/server xatolari urinish hisoblanadi; flood limit (RetryAfter) da
+        # tarqatish to'xtab turadi va xabar qayta yuboriladi
+        attempt = 0
+        while True:
+            await self.limiter.acquire(telegram_id)
+            try:
+                await self.bot.send_message(telegram_id, self.message, parse_mode='HTML')
+                return STATUS_SENT, None
+            except TelegramRetryAfter as e:
+                logger.warning(f"Flood limit hit, pausing broadcast for {e.retry_after}s")
+                self.limiter.pause(e.retry_after)
+            except (TelegramNetworkError, TelegramServerError) as e:
+                logger.warning(f"Transient error sending ad to {telegram_id}: {e}")
+                attempt += 1
+                if attempt >= MAX_SEND_ATTEMPTS:
+                    return STATUS_FAILED, "retry limit exceeded"
+                await _backoff_sleep(attempt)
+            except TelegramAPIError as e:
+                logger.error(f"Failed to send ad to {telegram_id}: {e}")
+                return STATUS_FAILED, str(e)[:200]
+
+    async def _flush(self):
+        """Yig'ilgan natijalarni bazaga yozish. Xatoda ular keyingi urinish uchun qaytariladi."""
+        if not self._results:
+            return True
+        results, self._results = self._results, []
+        if await run_db(mark_broadcast_recipients, self.broadcast_id, results):
+            return True
+        logger.warning(f"Failed to save {len(results)} recipient statuses for broadcast {self.broadcast_id}, will retry")
+        self._results = results + self._results
+        return False
+
+    async def _final_flush(self):
+        for attempt in range(FINAL_FLUSH_ATTEMPTS):
+            if attempt:
+                await asyncio.sleep(FLUSH_RETRY_DELAY)
+            if await self._flush():
+                return True
+        return False
+
+    async def _report_progress(self):
+        while True:
+            await asyncio.sleep(self.progress_interval)
+            await self._flush()
+            await self._send_progress()
+
+    def _progress_text(self, final=False):
+        header = "📢 Reklama yuborish yakunlandi." if final else "📢 Reklama yuborilmoqda..."
+        return (
+            f"{header}\n"
+            f"Jarayon: {self.done}/{self.total}\n"
+            f"✅ Yuborildi: {self.counts.get(STATUS_SENT, 0)}\n"
+            f"❌ Yuborilmadi: {self.counts.get(STATUS_FAILED, 0)}\n"
+            f"⏭ O'tkazib yuborildi: {self.counts.get(STATUS_SKIPPED, 0)}"
+        )
+
+    async def _send_progress(self, final=False):
+        if self.admin_chat_id is None:
+            return
+        text = self._progress_text(final)
+        if final and self.counts.get(STATUS_FAILED):
+            failed_user_ids = await run_db(get_failed_recipients, self.broadcast_id, 11)
+            text += f"\nXatolik yuz bergan foydalanuvchilar: {', '.join(failed_user_ids[:10])}"
+            if len(failed_user_ids) > 10:
+                text += "..."
+        try:
+            if self._progress_message is None:
+                self._progress_message = await self.bot.send_message(self.admin_chat_id, text[:4000])
+            else:
+                await self._progress_message.edit_text(text[:4000])
+        except TelegramAPIError as e:
+            logger.warning(f"Failed to update broadcast progress for {self.admin_chat_id}: {e}")
+
+
+def _spawn(engine: BroadcastEngine):
+    task = asyncio.create_task(engine.run())
+    _running[engine.broadcast_id] = task
+    task.add_done_callback(lambda _: _running.pop(engine.broadcast_id, None))
+    return task
+
+
+async def start_broadcast(bot: Bot, message: str, admin_chat_id=None, recipient_filter=None):
+    """Tarqatishni yaratib, uni fon vazifasi sifatida ishga tushirish. Broadcast ID ni qaytaradi."""
+    broadcast_id = await run_db(create_broadcast, message, admin_chat_id)
+    if broadcast_id is None:
+        return None
+    _spawn(BroadcastEngine(bot, broadcast_id, message, admin_chat_id, recipient_filter))
+    logger.info(f"Broadcast {broadcast_id} started")
+    return broadcast_id
+
+
+async def resume_broadcasts(bot: Bot, recipient_filter=None):
+    """Bot qayta ishga tushganda tugallanmagan tarqatishlarni davom ettirish."""
+    broadcasts = await run_db(get_unfinished_broadcasts)
+    for broadcast_id, message, admin_chat_id in broadcasts:
+        if broadcast_id in _running:
+            continue
+        logger.info(f"Resuming broadcast {broadcast_id}")
+        _spawn(BroadcastEngine(bot, broadcast_id, message, admin_chat_id, recipient_filter))
+    return len(broadcasts)
@@ -4,7 +4,33 @@ from dotenv import load_dotenv
 load_dotenv()
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 DATABASE_PATH = "users.db"
+DATABASE_WORKERS = 4  # Bot uchun ma'lumotlar bazasi oqimlari soni
+# Update'larni qabul qilish rejimi: "polling" yoki "webhook"
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")  # tashqi manzil, masalan https://bot.example.com (bo'sh bo'lsa set_webhook chaqirilmaydi)
+WEBHOOK_PATH = "/webhook"
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")  # webhook rejimida majburiy (A-Z, a-z, 0-9, _ va -)
+WEBAPP_HOST = os.getenv("WEBAPP_HOST", "0.0.0.0")
+WEBAPP_PORT = int(os.getenv("WEBAPP_PORT", "8080"))
+WEBHOOK_MAX_CONCURRENCY = 100  # bir vaqtda qayta ishlanadigan update'lar soni
 WEBSITE_URL = "http://3.112.252.179:80" 
 # WEBSITE_URL = "http://127.0.0.1:8000" 
+LOGIN_TOKEN_TTL = 3600  # saytga kirish havolasining amal qilish muddati (sekundlarda)
+LEADERBOARD_CACHE_TTL = 30  # /top uchun saytdan olingan reyting keshi (sekundlarda)
 ADMIN_IDS = ["5306481482","5287450751"]
-MANDATORY_CHANNELS = []  
\ No newline at end of file
+MANDATORY_CHANNELS = []
+# Reklama tarqatish sozlamalari (Telegram: ~30 xabar/s umumiy, 1 xabar/s bitta chatga)
+BROADCAST_RATE = 25
+BROADCAST_CONCURRENCY = 20
+BROADCAST_PROGRESS_INTERVAL = 5
+# Majburiy kanal obunasini tekshirish keshi (sekundlarda)
+SUBSCRIPTION_CHANNEL_TTL = 3600  # kanal ma'lumoti va bot admin holati
+SUBSCRIPTION_MEMBER_TTL = 300  # foydalanuvchi obuna bo'lgan
+SUBSCRIPTION_NEGATIVE_TTL = 15  # foydalanuvchi obuna bo'lmagan yoki xatolik
+# Foydalanuvchi holati (ban/ro'yxatdan o'tish/profil) keshi
+USER_CACHE_SIZE = 50000
+USER_CACHE_TTL = 600
+# Bot metrikalari (Prometheus /metrics) uchun alohida HTTP server; port 0 - o'chirilgan
+BOT_METRICS_HOST = os.getenv("BOT_METRICS_HOST", "127.0.0.1")
+BOT_METRICS_PORT = int(os.getenv("BOT_METRICS_PORT", "0"))
+BOT_PROFILER_ENABLED = os.getenv("BOT_PROFILER_ENABLED") == "1"  # /profile?seconds=N (namunaviy profiler)
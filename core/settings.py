@@ -29,6 +29,8 @@ SECRET_KEY = 'django-insecure-(#f6c_6pd07r^j$v53q6fby&gctarvg=iof%wv5@@%#lshhv24
 DEBUG =True
 
 TELEGRAM_BOT_TOKEN=os.getenv("BOT_TOKEN")
+# Bot API manzili (testlarda mahalliy stub server ko‘rsatilishi mumkin)
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org")
 
 ALLOWED_HOSTS = ["*"]
 
@@ -47,6 +49,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'app.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -83,6 +86,12 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Tranzaksiya yozish qulfini darhol oladi: parallel submit_test da
+            # o‘qishdan yozishga o‘tishdagi "database is locked" xatosi bo‘lmaydi
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
     }
 }
 
@@ -117,12 +126,45 @@ USE_I18N = True
 
 USE_TZ = True
 ADMIN_TELEGRAM_ID=5306481482
+# database.user_cache muddati sayt jarayonida (bot ban qilganda bu kesh tozalanmaydi)
+BOT_USER_CACHE_TTL = 30
 
 SESSION_COOKIE_AGE = 1209600  # 2 hafta
 SESSION_COOKIE_SECURE = False
 SESSION_COOKIE_SAMESITE = 'Lax'
-SESSION_SAVE_EVERY_REQUEST = True
-SESSION_ENGINE = 'django.contrib.sessions.backends.db'  # yoki cached_db
+# Sessiya faqat ma'lumot o'zgarganda yoziladi; javoblar sessiyada emas, UserAnswer da saqlanadi
+SESSION_SAVE_EVERY_REQUEST = False
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+# /metrics (Prometheus) faqat staff foydalanuvchilarga yoki "Authorization: Bearer <METRICS_TOKEN>"
+# bilan ochiq. REMOTE_ADDR ga ishonilmaydi: reverse proxy ortida u har doim 127.0.0.1
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+# Shundan sekin so‘rovlar SQL ro‘yxati bilan loglanadi (millisekund); None - o‘chirilgan
+SLOW_REQUEST_MS = int(os.getenv("SLOW_REQUEST_MS")) if os.getenv("SLOW_REQUEST_MS") else None
+
+CACHES = {
+    'default': {
+        'BACKEND': 'app.cache_backends.InstrumentedLocMemCache',
+        'LOCATION': 'dtm-test',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+    # Write-behind javoblar keshi barcha worker jarayonlarida umumiy bo‘lishi shart
+    # (LocMem bilan ANSWER_WRITE_BEHIND ishga tushmaydi) va flush qilinmagan javoblarni
+    # o‘chirmasligi kerak. Bir nechta server uchun RedisCache (maxmemory-policy noeviction).
+    'answers': {
+        'BACKEND': 'app.cache_backends.AnswerFileCache',
+        'LOCATION': BASE_DIR / 'answer_cache',
+        'OPTIONS': {'CULL_INTERVAL': 600},  # muddati o‘tgan fayllarni tozalash oralig‘i
+    },
+}
+
+# Write-behind rejimi: bosilgan javob SQLite ga emas, jurnal + keshga yoziladi; fon oqimi
+# har ANSWER_FLUSH_INTERVAL soniyada UserAnswer ga ommaviy yozadi, submit_test da darhol
+ANSWER_WRITE_BEHIND = os.getenv("ANSWER_WRITE_BEHIND") == "1"
+ANSWER_STORE_CACHE = 'answers'
+ANSWER_JOURNAL_DIR = BASE_DIR / 'answer_journal'
+ANSWER_FLUSH_INTERVAL = 2
+ANSWER_JOURNAL_FSYNC = False  # True: server (OS) qulashiga ham chidamli, har javobda fsync
 
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/5.2/howto/static-files/
@@ -1,21 +1,89 @@
+import asyncio
 import sqlite3
+import threading
 import time
 import logging
-from config import DATABASE_PATH
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from cache import TTLCache
+from config import DATABASE_PATH, DATABASE_WORKERS, USER_CACHE_SIZE, USER_CACHE_TTL
 
 logger = logging.getLogger(__name__)
 
+# Har bir ulanish uchun bir marta o'rnatiladigan sozlamalar
+DATABASE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-16000",  # ~16 MB sahifa keshi
+    "PRAGMA mmap_size=134217728",  # 128 MB
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA busy_timeout=10000",
+)
+STATEMENT_CACHE_SIZE = 256
+
+_local = threading.local()
+
+# telegram_id -> {"registered": bool, "banned": bool, "profile": tuple | None}
+user_cache = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+# invalidate_user chaqiruvlari hisoblagichi: o'qish davomida o'zgargan bo'lsa natija keshga yozilmaydi
+_user_cache_generation = 0
+_user_cache_lock = threading.Lock()
+
+def get_connection():
+    """Joriy oqim uchun uzoq yashaydigan ulanishni qaytarish (kerak bo'lsa yaratish)."""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(DATABASE_PATH, timeout=10, cached_statements=STATEMENT_CACHE_SIZE)
+        for pragma in DATABASE_PRAGMAS:
+            conn.execute(pragma)
+        _local.conn = conn
+        logger.debug(f"Yangi SQLite ulanishi ochildi: {threading.current_thread().name}")
+    return conn
+
+def close_connection():
+    """Joriy oqimning ulanishini yopish."""
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        conn.close()
+        _local.conn = None
+
+# Async kod (aiogram handlerlari) uchun alohida oqimlar havzasi.
+# Har bir oqim o'z doimiy ulanishidan foydalanadi, shuning uchun
+# qulflangan baza faqat bitta oqimni (va bitta update'ni) kutdiradi.
+_executor = None
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=DATABASE_WORKERS, thread_name_prefix="db")
+    return _executor
+
+async def run_db(func, *args, **kwargs):
+    """Sinxron baza funksiyasini event loop'ni bloklamasdan bajarish."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), partial(func, *args, **kwargs))
+
+def shutdown_db_executor():
+    """Oqimlar havzasini to'xtatish (navbatdagi so'rovlar tugashini kutib)."""
+    global _executor
+    if _executor is None:
+        return
+    executor, _executor = _executor, None
+    executor.shutdown(wait=True)
+
 def safe_db_operation_with_retry(func, *args, retries=3, delay=1, **kwargs):
     """Ma'lumotlar bazasi operatsiyalarini xavfsiz bajarish uchun qayta urinish."""
     for attempt in range(retries):
+        cur = None
         try:
-            conn = sqlite3.connect(DATABASE_PATH, timeout=10)
+            conn = get_connection()
             cur = conn.cursor()
             result = func(cur, *args, **kwargs)
             conn.commit()
-            logger.info(f"Ma'lumotlar bazasi operatsiyasi {func.__name__} muvaffaqiyatli")
+            logger.debug(f"Ma'lumotlar bazasi operatsiyasi {func.__name__} muvaffaqiyatli")
             return result
         except sqlite3.OperationalError as e:
+            _rollback()
             if "database is locked" in str(e) and attempt < retries - 1:
                 logger.warning(f"Ma'lumotlar bazasi qulflangan, qayta urinish {attempt + 1}/{retries}")
                 time.sleep(delay)
@@ -23,13 +91,25 @@ def safe_db_operation_with_retry(func, *args, retries=3, delay=1, **kwargs):
             logger.error(f"{func.__name__} da ma'lumotlar bazasi xatosi: {str(e)}")
             return None
         except Exception as e:
+            _rollback()
             logger.error(f"{func.__name__} da xato: {str(e)}")
             return None
         finally:
-            cur.close()
-            conn.close()
+            if cur is not None:
+                cur.close()
     return None
 
+def _rollback():
+    """Muvaffaqiyatsiz operatsiyadan keyin ulanishni toza holatga qaytarish."""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        return
+    try:
+        conn.rollback()
+    except sqlite3.Error:
+        # Buzilgan ulanishni tashlab yuborish, keyingi chaqiruv yangisini ochadi
+        close_connection()
+
 def init_db():
     """Ma'lumotlar bazasini ishga tushirish va kerakli jadvallarni yaratish."""
     def _init_db(cur):
@@ -50,6 +130,28 @@ def init_db():
             cur.execute("ALTER TABLE users ADD COLUMN banned BOOLEAN DEFAULT 0")
         except sqlite3.OperationalError:
             pass  # Agar ustun allaqachon mavjud bo'lsa, o'tkazib yuborish
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_users_banned ON users (banned)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_users_created_at ON users (created_at)")
+        # Foydalanuvchilar soni trigger orqali yuritiladi (COUNT(*) to'liq skanersiz)
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS user_counters (
+                name TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            ) WITHOUT ROWID
+        """)
+        cur.execute("INSERT OR IGNORE INTO user_counters (name, value) SELECT 'total', COUNT(*) FROM users")
+        cur.execute("""
+            CREATE TRIGGER IF NOT EXISTS users_count_insert AFTER INSERT ON users
+            BEGIN
+                UPDATE user_counters SET value = value + 1 WHERE name = 'total';
+            END
+        """)
+        cur.execute("""
+            CREATE TRIGGER IF NOT EXISTS users_count_delete AFTER DELETE ON users
+            BEGIN
+                UPDATE user_counters SET value = value - 1 WHERE name = 'total';
+            END
+        """)
         # Channels jadvali
         cur.execute("""
             CREATE TABLE IF NOT EXISTS channels (
@@ -72,8 +174,59 @@ def init_db():
                 admin_id TEXT UNIQUE NOT NULL
             )
         """)
+        # Broadcasts jadvali (reklama tarqatish jarayonlari)
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS broadcasts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                message TEXT NOT NULL,
+                admin_chat_id TEXT,
+                status TEXT NOT NULL DEFAULT 'running',
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                finished_at TIMESTAMP
+            )
+        """)
+        # Har bir qabul qiluvchi bo'yicha holat (to'xtagan joydan davom ettirish uchun)
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS broadcast_recipients (
+                broadcast_id INTEGER NOT NULL,
+                telegram_id TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                error TEXT,
+                PRIMARY KEY (broadcast_id, telegram_id)
+            ) WITHOUT ROWID
+        """)
     safe_db_operation_with_retry(_init_db)
 
+def get_user_status(telegram_id):
+    """Foydalanuvchi holatini keshdan yoki (kesh bo'sh bo'lsa) bazadan olish."""
+    key = str(telegram_id)
+    status = user_cache.get(key)
+    if status is not None:
+        return status
+    generation = _user_cache_generation
+    def _get_user_status(cur, telegram_id):
+        cur.execute("SELECT telegram_id, first_name, last_name, phone_number, banned, created_at FROM users WHERE telegram_id = ?", (telegram_id,))
+        row = cur.fetchone()
+        return {"registered": row is not None, "banned": bool(row[4]) if row else False, "profile": row}
+    status = safe_db_operation_with_retry(_get_user_status, key)
+    if status is not None:
+        with _user_cache_lock:
+            # O'qish paytida ban/unban/ro'yxatdan o'tish bo'lgan bo'lsa, qator eski bo'lishi mumkin
+            if generation == _user_cache_generation:
+                user_cache.set(key, status)
+    return status
+
+def invalidate_user(telegram_id):
+    """Foydalanuvchi yozuvini keshdan o'chirish (ma'lumot o'zgarganda, commit dan keyin)."""
+    global _user_cache_generation
+    with _user_cache_lock:
+        _user_cache_generation += 1
+        user_cache.pop(str(telegram_id))
+
+def get_user_cache_stats():
+    """Kesh statistikasi: hajm, hit/miss soni va hit rate."""
+    return user_cache.stats()
+
 def register_user(telegram_id, first_name, last_name, phone_number):
     """Yangi foydalanuvchini ro'yxatdan o'tkazish."""
     def _register(cur, telegram_id, first_name, last_name, phone_number):
@@ -82,43 +235,42 @@ def register_user(telegram_id, first_name, last_name, phone_number):
             VALUES (?, ?, ?, ?)
         """, (str(telegram_id), first_name, last_name, phone_number))
         return cur.rowcount > 0
-    return safe_db_operation_with_retry(_register, telegram_id, first_name, last_name, phone_number) or False
+    result = safe_db_operation_with_retry(_register, telegram_id, first_name, last_name, phone_number) or False
+    invalidate_user(telegram_id)
+    return result
 
 def is_user_registered(telegram_id):
     """Foydalanuvchi ro'yxatdan o'tganligini tekshirish."""
-    def _check_registered(cur, telegram_id):
-        cur.execute("SELECT 1 FROM users WHERE telegram_id = ?", (str(telegram_id),))
-        return cur.fetchone() is not None
-    return safe_db_operation_with_retry(_check_registered, telegram_id) or False
+    status = get_user_status(telegram_id)
+    return status["registered"] if status else False
 
 def get_user(telegram_id):
     """Foydalanuvchi ma'lumotlarini olish."""
-    def _get_user(cur, telegram_id):
-        cur.execute("SELECT telegram_id, first_name, last_name, phone_number, banned, created_at FROM users WHERE telegram_id = ?", (str(telegram_id),))
-        return cur.fetchone()
-    return safe_db_operation_with_retry(_get_user, telegram_id)
+    status = get_user_status(telegram_id)
+    return status["profile"] if status else None
 
 def is_user_banned(telegram_id):
     """Foydalanuvchi banlanganligini tekshirish."""
-    def _check_banned(cur, telegram_id):
-        cur.execute("SELECT banned FROM users WHERE telegram_id = ?", (str(telegram_id),))
-        result = cur.fetchone()
-        return result[0] if result else False
-    return safe_db_operation_with_retry(_check_banned, telegram_id) or False
+    status = get_user_status(telegram_id)
+    return status["banned"] if status else False
 
 def ban_user(telegram_id):
     """Foydalanuvchini ban qilish."""
     def _ban_user(cur, telegram_id):
         cur.execute("UPDATE users SET banned = 1 WHERE telegram_id = ?", (str(telegram_id),))
         return cur.rowcount > 0
-    return safe_db_operation_with_retry(_ban_user, telegram_id) or False
+    result = safe_db_operation_with_retry(_ban_user, telegram_id) or False
+    invalidate_user(telegram_id)
+    return result
 
 def unban_user(telegram_id):
     """Foydalanuvchi bandan chiqarish."""
     def _unban_user(cur, telegram_id):
         cur.execute("UPDATE users SET banned = 0 WHERE telegram_id = ?", (str(telegram_id),))
         return cur.rowcount > 0
-    return safe_db_operation_with_retry(_unban_user, telegram_id) or False
+    result = safe_db_operation_with_retry(_unban_user, telegram_id) or False
+    invalidate_user(telegram_id)
+    return result
 
 def update_user(telegram_id, field, value):
     """Foydalanuvchi ma'lumotlarini yangilash."""
@@ -126,7 +278,9 @@ def update_user(telegram_id, field, value):
         query = f"UPDATE users SET {field} = ? WHERE telegram_id = ?"
         cur.execute(query, (value, str(telegram_id)))
         return cur.rowcount > 0
-    return safe_db_operation_with_retry(_update_user, telegram_id, field, value) or False
+    result = safe_db_operation_with_retry(_update_user, telegram_id, field, value) or False
+    invalidate_user(telegram_id)
+    return result
 
 def get_all_users():
     """Barcha foydalanuvchilarni olish."""
@@ -135,20 +289,62 @@ def get_all_users():
         return cur.fetchall()
     return safe_db_operation_with_retry(_get_all_users) or []
 
+def get_users_page(limit=10, after_id=0, before_id=None, offset=0):
+    """Foydalanuvchilarni id bo'yicha keyset sahifalash bilan olish.
+
+    after_id berilsa undan keyingi, before_id berilsa undan oldingi sahifa olinadi.
+    Qaytaradi: (rows, has_more), rows: (id, telegram_id, first_name, last_name, phone_number, banned).
+    has_more: shu yo'nalishda yana yozuvlar borligi.
+    """
+    def _get_users_page(cur, limit, after_id, before_id, offset):
+        columns = "id, telegram_id, first_name, last_name, phone_number, banned"
+        if before_id is not None:
+            cur.execute(f"SELECT {columns} FROM users WHERE id < ? ORDER BY id DESC LIMIT ?", (before_id, limit + 1))
+            rows = cur.fetchall()
+            return list(reversed(rows[:limit])), len(rows) > limit
+        cur.execute(f"SELECT {columns} FROM users WHERE id > ? ORDER BY id LIMIT ? OFFSET ?", (after_id, limit + 1, offset))
+        rows = cur.fetchall()
+        return rows[:limit], len(rows) > limit
+    return safe_db_operation_with_retry(_get_users_page, limit, after_id, before_id, offset) or ([], False)
+
 def get_user_count():
     """Foydalanuvchilar sonini olish."""
     def _get_user_count(cur):
-        cur.execute("SELECT COUNT(*) FROM users")
+        cur.execute("SELECT value FROM user_counters WHERE name = 'total'")
         return cur.fetchone()[0]
     return safe_db_operation_with_retry(_get_user_count) or 0
 
 def get_users_today():
     """Bugun ro'yxatdan o'tgan foydalanuvchilar sonini olish."""
     def _get_users_today(cur):
-        cur.execute("SELECT COUNT(*) FROM users WHERE DATE(created_at) = DATE('now')")
+        cur.execute("SELECT COUNT(*) FROM users WHERE created_at >= DATE('now')")
         return cur.fetchone()[0]
     return safe_db_operation_with_retry(_get_users_today) or 0
 
+def get_user_stats():
+    """Admin statistikasi bitta so'rovda: jami, bugun, banlangan va oxirgi 7 kun.
+
+    Jami son user_counters dan, qolganlari indekslangan diapazon so'rovlari bilan olinadi.
+    """
+    def _get_user_stats(cur):
+        cur.execute("""
+            SELECT
+                (SELECT value FROM user_counters WHERE name = 'total'),
+                (SELECT COUNT(*) FROM users WHERE created_at >= DATE('now')),
+                (SELECT COUNT(*) FROM users WHERE banned = 1),
+                (SELECT COUNT(*) FROM users WHERE created_at >= DATE('now', '-6 days'))
+        """)
+        total, today, banned, last_7_days = cur.fetchone()
+        previous = total - last_7_days
+        return {
+            "total": total,
+            "today": today,
+            "banned": banned,
+            "last_7_days": last_7_days,
+            "growth_7_days": round(last_7_days / previous * 100, 2) if previous else 0.0,
+        }
+    return safe_db_operation_with_retry(_get_user_stats)
+
 def add_channel(channel_id):
     """Yangi majburiy kanal qo'shish."""
     def _add_channel(cur, channel_id):
@@ -203,4 +399,85 @@ def get_admins():
     def _get_admins(cur):
         cur.execute("SELECT admin_id FROM admins")
         return [row[0] for row in cur.fetchall()]
-    return safe_db_operation_with_retry(_get_admins) or []
\ No newline at end of file
+    return safe_db_operation_with_retry(_get_admins) or []
+
+def create_broadcast(message, admin_chat_id=None):
+    """Yangi tarqatish yaratish va faol foydalanuvchilarni qabul qiluvchi sifatida yozish."""
+    def _create_broadcast(cur, message, admin_chat_id):
+        cur.execute(
+            "INSERT INTO broadcasts (message, admin_chat_id) VALUES (?, ?)",
+            (message, str(admin_chat_id) if admin_chat_id is not None else None)
+        )
+        broadcast_id = cur.lastrowid
+        cur.execute("""
+            INSERT OR IGNORE INTO broadcast_recipients (broadcast_id, telegram_id)
+            SELECT ?, telegram_id FROM users WHERE banned = 0
+        """, (broadcast_id,))
+        return broadcast_id
+    return safe_db_operation_with_retry(_create_broadcast, message, admin_chat_id)
+
+def get_pending_recipients(broadcast_id, after_telegram_id="", limit=500):
+    """Hali yuborilmagan qabul qiluvchilarni keyset sahifalash bilan olish.
+
+    Baza xatosida None qaytaradi (bo'sh ro'yxat esa hamma yuborilganini bildiradi).
+    """
+    def _get_pending_recipients(cur, broadcast_id, after_telegram_id, limit):
+        cur.execute("""
+            SELECT telegram_id FROM broadcast_recipients
+            WHERE broadcast_id = ? AND telegram_id > ? AND status = 'pending'
+            ORDER BY telegram_id
+            LIMIT ?
+        """, (broadcast_id, after_telegram_id, limit))
+        return [row[0] for row in cur.fetchall()]
+    return safe_db_operation_with_retry(_get_pending_recipients, broadcast_id, after_telegram_id, limit)
+
+def mark_broadcast_recipients(broadcast_id, results):
+    """Qabul qiluvchilar holatini bitta tranzaksiyada yangilash.
+
+    results: (telegram_id, status, error) kortejlari ro'yxati.
+    """
+    def _mark_broadcast_recipients(cur, broadcast_id, results):
+        cur.executemany("""
+            UPDATE broadcast_recipients SET status = ?, error = ?
+            WHERE broadcast_id = ? AND telegram_id = ?
+        """, [(status, error, broadcast_id, str(telegram_id)) for telegram_id, status, error in results])
+        return True
+    return safe_db_operation_with_retry(_mark_broadcast_recipients, broadcast_id, results) or False
+
+def get_broadcast_stats(broadcast_id):
+    """Tarqatish bo'yicha holatlar sonini olish: {'pending': n, 'sent': n, ...}."""
+    def _get_broadcast_stats(cur, broadcast_id):
+        cur.execute("""
+            SELECT status, COUNT(*) FROM broadcast_recipients
+            WHERE broadcast_id = ? GROUP BY status
+        """, (broadcast_id,))
+        return dict(cur.fetchall())
+    return safe_db_operation_with_retry(_get_broadcast_stats, broadcast_id) or {}
+
+def get_failed_recipients(broadcast_id, limit=10):
+    """Xabar yetkazilmagan qabul qiluvchilar ID larini olish."""
+    def _get_failed_recipients(cur, broadcast_id, limit):
+        cur.execute("""
+            SELECT telegram_id FROM broadcast_recipients
+            WHERE broadcast_id = ? AND status = 'failed'
+            ORDER BY telegram_id LIMIT ?
+        """, (broadcast_id, limit))
+        return [row[0] for row in cur.fetchall()]
+    return safe_db_operation_with_retry(_get_failed_recipients, broadcast_id, limit) or []
+
+def finish_broadcast(broadcast_id, status="finished"):
+    """Tarqatishni yakunlangan deb belgilash."""
+    def _finish_broadcast(cur, broadcast_id, status):
+        cur.execute(
+            "UPDATE broadcasts SET status = ?, finished_at = CURRENT_TIMESTAMP WHERE id = ?",
+            (status, broadcast_id)
+        )
+        return cur.rowcount > 0
+    return safe_db_operation_with_retry(_finish_broadcast, broadcast_id, status) or False
+
+def get_unfinished_broadcasts():
+    """Bot to'xtab qolganda tugallanmagan tarqatishlarni olish."""
+    def _get_unfinished_broadcasts(cur):
+        cur.execute("SELECT id, message, admin_chat_id FROM broadcasts WHERE status = 'running' ORDER BY id")
+        return cur.fetchall()
+    return safe_db_operation_with_retry(_get_unfinished_broadcasts) or []
@@ -1,22 +1,45 @@
+import asyncio
 import logging
 import re
+import aiohttp
 from aiogram import Bot, Dispatcher, types
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.filters import Command
 from aiogram.types import ReplyKeyboardMarkup, KeyboardButton, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.exceptions import TelegramAPIError
-from config import WEBSITE_URL, ADMIN_IDS, MANDATORY_CHANNELS
+from config import (
+    BOT_TOKEN, WEBSITE_URL, ADMIN_IDS, MANDATORY_CHANNELS,
+    SUBSCRIPTION_CHANNEL_TTL, SUBSCRIPTION_MEMBER_TTL, SUBSCRIPTION_NEGATIVE_TTL,
+    LEADERBOARD_CACHE_TTL
+)
 from database import (
     register_user, is_user_registered, is_user_banned, ban_user, unban_user,
-    get_all_users, get_user_count, get_users_today, add_channel, remove_channel,
-    get_channels, save_ad, get_ad_history, update_user, get_user, add_admin, remove_admin, get_admins
+    get_all_users, get_users_page, get_user_count, get_user_stats,
+    add_channel, remove_channel,
+    get_channels, save_ad, get_ad_history, update_user, get_user, add_admin, remove_admin, get_admins,
+    run_db
 )
+from broadcast import start_broadcast, resume_broadcasts
+from bot_metrics import timed, track
+from cache import TTLCache
+from login_token import make_login_token
 from html import escape
-from asyncio import sleep
 
 logger = logging.getLogger(__name__)
 
+# Obuna tekshiruvi keshlari
+channel_cache = TTLCache(maxsize=256, ttl=SUBSCRIPTION_CHANNEL_TTL)
+bot_admin_cache = TTLCache(maxsize=256, ttl=SUBSCRIPTION_CHANNEL_TTL)
+member_cache = TTLCache(maxsize=100000, ttl=SUBSCRIPTION_MEMBER_TTL)
+# Saytdan olingan reytinglar keshi
+leaderboard_cache = TTLCache(maxsize=10000, ttl=LEADERBOARD_CACHE_TTL)
+LEADERBOARD_PERIODS = {"day": "Bugun", "week": "Hafta", "all": "Umumiy"}
+
+def get_login_url(telegram_id):
+    """Saytga imzolangan, muddatli kirish havolasi (sayt Telegram API ga murojaat qilmaydi)."""
+    return f"{WEBSITE_URL}/telegram-auth/{make_login_token(telegram_id, BOT_TOKEN)}/"
+
 # Registration states
 class Registration(StatesGroup):
     first_name = State()
@@ -70,7 +93,7 @@ async def get_subscription_keyboard(bot: Bot) -> InlineKeyboardMarkup:
     keyboard_buttons = []
     for channel_id in MANDATORY_CHANNELS:
         try:
-            chat = await bot.get_chat(channel_id)
+            chat = await get_channel_info(bot, channel_id)
             button = [InlineKeyboardButton(
                 text=f"Obuna bo'lish: {chat.title}",
                 url=f"https://t.me/{channel_id.lstrip('@')}"
@@ -87,9 +110,10 @@ async def get_subscription_keyboard(bot: Bot) -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(inline_keyboard=keyboard_buttons)
 
 # Utility Functions
-def safe_db_operation(func, *args, **kwargs):
+async def safe_db_operation(func, *args, **kwargs):
     try:
-        return func(*args, **kwargs)
+        with track(f"db:{func.__name__}"):
+            return await run_db(func, *args, **kwargs)
     except Exception as e:
         logger.error(f"Database error in {func.__name__}: {e}")
         return None
@@ -105,110 +129,142 @@ async def validate_channel(bot: Bot, channel_id: str) -> bool:
         logger.error(f"Invalid channel {channel_id}: {e}")
         return False
 
-async def check_subscription(bot: Bot, user_id: int) -> tuple[bool, list]:
-    unsubscribed_channels = []
-    for channel_id in MANDATORY_CHANNELS:
-        try:
-            chat = await bot.get_chat(channel_id)
-            if chat.type not in ["channel", "supergroup"]:
-                logger.error(f"Invalid channel type for {channel_id}: {chat.type}")
-                unsubscribed_channels.append(channel_id)
-                continue
-            bot_member = await bot.get_chat_member(channel_id, bot.id)
-            if bot_member.status not in ["administrator", "creator"]:
-                logger.warning(f"Bot is not an admin in {channel_id}")
-            member = await bot.get_chat_member(channel_id, user_id)
-            if member.status in ["left", "kicked"]:
-                unsubscribed_channels.append(channel_id)
-        except TelegramAPIError as e:
-            if "chat not found" in str(e).lower():
-                logger.error(f"Channel {channel_id} not found or bot lacks access")
-            elif "user not found" in str(e).lower():
-                logger.info(f"User {user_id} blocked the bot or is not in {channel_id}")
-            else:
-                logger.error(f"Error checking subscription for {channel_id}: {e}")
-            unsubscribed_channels.append(channel_id)
+async def get_channel_info(bot: Bot, channel_id: str):
+    chat = channel_cache.get(channel_id)
+    if chat is None:
+        chat = await bot.get_chat(channel_id)
+        channel_cache.set(channel_id, chat)
+    return chat
+
+async def check_bot_admin(bot: Bot, channel_id: str) -> bool:
+    is_admin = bot_admin_cache.get(channel_id)
+    if is_admin is None:
+        bot_member = await bot.get_chat_member(channel_id, bot.id)
+        is_admin = bot_member.status in ["administrator", "creator"]
+        if not is_admin:
+            logger.warning(f"Bot is not an admin in {channel_id}")
+        bot_admin_cache.set(channel_id, is_admin)
+    return is_admin
+
+async def is_channel_member(bot: Bot, channel_id: str, user_id: int, fresh: bool = False) -> bool:
+    key = (channel_id, str(user_id))
+    if not fresh:
+        cached = member_cache.get(key)
+        if cached is not None:
+            return cached
+    try:
+        chat = await get_channel_info(bot, channel_id)
+        if chat.type not in ["channel", "supergroup"]:
+            logger.error(f"Invalid channel type for {channel_id}: {chat.type}")
+            return False
+        await check_bot_admin(bot, channel_id)
+        member = await bot.get_chat_member(channel_id, user_id)
+        subscribed = member.status not in ["left", "kicked"]
+    except TelegramAPIError as e:
+        if "chat not found" in str(e).lower():
+            logger.error(f"Channel {channel_id} not found or bot lacks access")
+        elif "user not found" in str(e).lower():
+            logger.info(f"User {user_id} blocked the bot or is not in {channel_id}")
+        else:
+            logger.error(f"Error checking subscription for {channel_id}: {e}")
+        subscribed = False
+    member_cache.set(key, subscribed, ttl=SUBSCRIPTION_MEMBER_TTL if subscribed else SUBSCRIPTION_NEGATIVE_TTL)
+    return subscribed
+
+@timed("check_subscription")
+async def check_subscription(bot: Bot, user_id: int, fresh: bool = False) -> tuple[bool, list]:
+    channels = list(MANDATORY_CHANNELS)
+    results = await asyncio.gather(*(is_channel_member(bot, channel_id, user_id, fresh) for channel_id in channels))
+    unsubscribed_channels = [channel_id for channel_id, subscribed in zip(channels, results) if not subscribed]
     is_subscribed = len(unsubscribed_channels) == 0
-    logger.info(f"User {user_id} subscription check: {'subscribed' if is_subscribed else 'not subscribed'}")
+    logger.debug(f"User {user_id} subscription check: {'subscribed' if is_subscribed else 'not subscribed'}")
     return is_subscribed, unsubscribed_channels
 
-async def send_paginated_users(callback_query: types.CallbackQuery, page: int = 1, page_size: int = 10):
-    users = safe_db_operation(get_all_users) or []
+def parse_page_callback(data: str, prefix: str) -> tuple[int, str]:
+    """'{prefix}{page}_{cursor}' ko'rinishidagi callback'dan sahifa raqami va kursorni ajratish."""
+    page, _, cursor = data[len(prefix):].partition("_")
+    return int(page), cursor
+
+async def fetch_users_page(page: int, cursor: str, page_size: int):
+    """Bitta sahifa foydalanuvchilarni olish.
+
+    cursor: 'n<id>' - id dan keyingi sahifa, 'p<id>' - id dan oldingi sahifa,
+    bo'sh bo'lsa (eski tugmalar) sahifa raqami bo'yicha OFFSET ishlatiladi.
+    Qaytaradi: (users, total_pages, has_prev, has_next).
+    """
+    if cursor.startswith("p"):
+        users, has_more = await safe_db_operation(get_users_page, page_size, before_id=int(cursor[1:])) or ([], False)
+        has_prev, has_next = has_more, True
+    else:
+        if cursor.startswith("n"):
+            users, has_more = await safe_db_operation(get_users_page, page_size, after_id=int(cursor[1:])) or ([], False)
+        else:
+            users, has_more = await safe_db_operation(get_users_page, page_size, offset=(page - 1) * page_size) or ([], False)
+        has_prev, has_next = page > 1, has_more
+    total_users = await safe_db_operation(get_user_count) or 0
+    total_pages = max((total_users + page_size - 1) // page_size, page)
+    return users, total_pages, has_prev, has_next
+
+def page_navigation(prefix: str, page: int, users: list, has_prev: bool, has_next: bool) -> list:
+    buttons = []
+    if has_prev:
+        buttons.append([InlineKeyboardButton(text="⬅️ Oldingi", callback_data=f"{prefix}{page-1}_p{users[0][0]}")])
+    if has_next:
+        buttons.append([InlineKeyboardButton(text="➡️ Keyingi", callback_data=f"{prefix}{page+1}_n{users[-1][0]}")])
+    return buttons
+
+async def send_paginated_users(callback_query: types.CallbackQuery, page: int = 1, cursor: str = "", page_size: int = 10):
+    users, total_pages, has_prev, has_next = await fetch_users_page(page, cursor, page_size)
     if not users:
         await callback_query.message.answer("Foydalanuvchilar topilmadi.")
         return
 
-    total_users = len(users)
-    total_pages = (total_users + page_size - 1) // page_size
-    start_idx = (page - 1) * page_size
-    end_idx = min(start_idx + page_size, total_users)
-
     response = f"👥 Foydalanuvchilar (sahifa {page}/{total_pages}):\n"
-    for user in users[start_idx:end_idx]:
-        telegram_id, first_name, last_name, phone_number, banned = user
+    for user in users:
+        _, telegram_id, first_name, last_name, phone_number, banned = user
         status = "🚫 Banlangan" if banned else "✅ Faol"
         response += f"ID: {telegram_id}, Ism: {first_name} {last_name}, Telefon: {phone_number}, Holat: {status}\n"
 
-    keyboard = InlineKeyboardMarkup(inline_keyboard=[])
-    if page > 1:
-        keyboard.inline_keyboard.append([InlineKeyboardButton(text="⬅️ Oldingi", callback_data=f"view_users_page_{page-1}")])
-    if page < total_pages:
-        keyboard.inline_keyboard.append([InlineKeyboardButton(text="➡️ Keyingi", callback_data=f"view_users_page_{page+1}")])
-
+    keyboard = InlineKeyboardMarkup(inline_keyboard=page_navigation("view_users_page_", page, users, has_prev, has_next))
     await callback_query.message.answer(response[:4000], reply_markup=keyboard)
 
-async def send_user_selection(callback_query: types.CallbackQuery, state: FSMContext, page: int = 1, page_size: int = 5):
-    users = safe_db_operation(get_all_users) or []
+async def send_user_selection(callback_query: types.CallbackQuery, state: FSMContext, page: int = 1, cursor: str = "", page_size: int = 5):
+    users, total_pages, has_prev, has_next = await fetch_users_page(page, cursor, page_size)
     if not users:
         await callback_query.message.answer("Foydalanuvchilar topilmadi.")
         return
 
-    total_users = len(users)
-    total_pages = (total_users + page_size - 1) // page_size
-    start_idx = (page - 1) * page_size
-    end_idx = min(start_idx + page_size, total_users)
-
     keyboard = InlineKeyboardMarkup(inline_keyboard=[])
-    for user in users[start_idx:end_idx]:
-        telegram_id, first_name, last_name, _, _ = user
+    for user in users:
+        _, telegram_id, first_name, last_name, _, _ = user
         keyboard.inline_keyboard.append([InlineKeyboardButton(
             text=f"{first_name} {last_name} (ID: {telegram_id})",
             callback_data=f"select_user_{telegram_id}"
         )])
-    if page > 1:
-        keyboard.inline_keyboard.append([InlineKeyboardButton(text="⬅️ Oldingi", callback_data=f"select_user_page_{page-1}")])
-    if page < total_pages:
-        keyboard.inline_keyboard.append([InlineKeyboardButton(text="➡️ Keyingi", callback_data=f"select_user_page_{page+1}")])
+    keyboard.inline_keyboard.extend(page_navigation("select_user_page_", page, users, has_prev, has_next))
 
     await callback_query.message.answer(f"👤 Tahrirlash uchun foydalanuvchini tanlang (sahifa {page}/{total_pages}):", reply_markup=keyboard)
 
-async def send_ad_to_users(bot: Bot, ad_message: str) -> tuple[int, int, list]:
-    users = safe_db_operation(get_all_users) or []
-    sent_count = 0
-    failed_count = 0
-    failed_user_ids = []
+async def is_ad_recipient(bot: Bot, telegram_id) -> bool:
+    """Reklama faqat barcha majburiy kanallarga obuna bo'lganlarga yuboriladi."""
+    if not (await check_subscription(bot, telegram_id))[0]:
+        logger.info(f"Skipping ad for {telegram_id}: not subscribed to all channels")
+        return False
+    return True
 
-    for i, user in enumerate(users):
-        telegram_id, _, _, _, banned = user
-        if banned:
-            continue
-        if not (await check_subscription(bot, telegram_id))[0]:
-            logger.info(f"Skipping ad for {telegram_id}: not subscribed to all channels")
-            continue
-        try:
-            await bot.send_message(telegram_id, ad_message, parse_mode='HTML')
-            sent_count += 1
-            if i % 30 == 29:
-                await sleep(1)
-        except TelegramAPIError as e:
-            logger.error(f"Failed to send ad to {telegram_id}: {e}")
-            failed_count += 1
-            failed_user_ids.append(telegram_id)
+async def start_ad_broadcast(bot: Bot, ad_message: str, admin_chat_id):
+    return await start_broadcast(
+        bot, ad_message, admin_chat_id=admin_chat_id,
+        recipient_filter=lambda telegram_id: is_ad_recipient(bot, telegram_id)
+    )
 
-    return sent_count, failed_count, failed_user_ids
+async def resume_ad_broadcasts(bot: Bot):
+    return await resume_broadcasts(
+        bot, recipient_filter=lambda telegram_id: is_ad_recipient(bot, telegram_id)
+    )
 
 async def notify_users_new_channel(bot: Bot, channel_id: str):
-    users = safe_db_operation(get_all_users) or []
+    users = await safe_db_operation(get_all_users) or []
     for user in users:
         telegram_id, _, _, _, banned = user
         if banned:
@@ -226,7 +282,7 @@ async def get_channel_stats(bot: Bot):
     response = "📊 Kanal statistikasi:\n"
     for channel_id in MANDATORY_CHANNELS:
         try:
-            chat = await bot.get_chat(channel_id)
+            chat = await get_channel_info(bot, channel_id)
             member_count = await bot.get_chat_member_count(channel_id)
             response += f"{channel_id} ({chat.title}): {member_count} obunachi\n"
         except TelegramAPIError as e:
@@ -236,7 +292,7 @@ async def get_channel_stats(bot: Bot):
 
 # Handlers
 async def start_command(message: types.Message, bot: Bot):
-    if is_user_banned(message.from_user.id):
+    if await safe_db_operation(is_user_banned, message.from_user.id):
         await message.answer("Siz botdan foydalana olmaysiz, chunki siz ban qilingansiz.")
         return
     is_subscribed, unsubscribed_channels = await check_subscription(bot, message.from_user.id)
@@ -244,13 +300,13 @@ async def start_command(message: types.Message, bot: Bot):
         response = "Iltimos, quyidagi kanallarga obuna bo'ling:\n"
         for channel_id in unsubscribed_channels:
             try:
-                chat = await bot.get_chat(channel_id)
+                chat = await get_channel_info(bot, channel_id)
                 response += f"- {chat.title} (@{channel_id.lstrip('@')})\n"
             except TelegramAPIError:
                 response += f"- @{channel_id.lstrip('@')}\n"
         await message.answer(response, reply_markup=await get_subscription_keyboard(bot))
         return
-    if is_user_registered(message.from_user.id):
+    if await safe_db_operation(is_user_registered, message.from_user.id):
         await message.answer("Siz allaqachon ro'yxatdan o'tgansiz. Test topshirish uchun /test buyrug'ini yuboring yoki /profile orqali ma'lumotlaringizni ko'ring.")
         return
     await message.answer(
@@ -264,16 +320,17 @@ async def help_command(message: types.Message):
         "/register - Ro'yxatdan o'tish\n"
         "/test - Test topshirish uchun saytga o'tish\n"
         "/profile - O'z ma'lumotlaringizni ko'rish\n"
+        "/top - Fanlar bo'yicha reyting\n"
         "/cancel - Jarayonni bekor qilish\n"
         "/help - Ushbu yordam xabari\n\n"
         "Savollaringiz bo'lsa, @Dasturch1_asilbek bilan bog'laning."
     )
 
 async def profile_command(message: types.Message):
-    if not is_user_registered(message.from_user.id):
+    if not await safe_db_operation(is_user_registered, message.from_user.id):
         await message.answer("Siz hali ro'yxatdan o'tmagansiz. /register buyrug'ini yuboring.")
         return
-    user = safe_db_operation(get_user, message.from_user.id)
+    user = await safe_db_operation(get_user, message.from_user.id)
     if user:
         await message.answer(
             f"👤 Profil ma'lumotlari:\n"
@@ -287,7 +344,7 @@ async def profile_command(message: types.Message):
         await message.answer("Ma'lumotlar topilmadi. Qayta urinib ko'ring.")
 
 async def register_command(message: types.Message, state: FSMContext, bot: Bot):
-    if is_user_banned(message.from_user.id):
+    if await safe_db_operation(is_user_banned, message.from_user.id):
         await message.answer("Siz botdan foydalana olmaysiz, chunki siz ban qilingansiz.")
         return
     is_subscribed, unsubscribed_channels = await check_subscription(bot, message.from_user.id)
@@ -295,13 +352,13 @@ async def register_command(message: types.Message, state: FSMContext, bot: Bot):
         response = "Iltimos, quyidagi kanallarga obuna bo'ling:\n"
         for channel_id in unsubscribed_channels:
             try:
-                chat = await bot.get_chat(channel_id)
+                chat = await get_channel_info(bot, channel_id)
                 response += f"- {chat.title} (@{channel_id.lstrip('@')})\n"
             except TelegramAPIError:
                 response += f"- @{channel_id.lstrip('@')}\n"
         await message.answer(response, reply_markup=await get_subscription_keyboard(bot))
         return
-    if is_user_registered(message.from_user.id):
+    if await safe_db_operation(is_user_registered, message.from_user.id):
         await message.answer("Siz allaqachon ro'yxatdan o'tgansiz. Test topshirish uchun /test buyrug'ini yuboring.")
         return
     logger.info(f"User {message.from_user.id} started registration")
@@ -345,8 +402,8 @@ async def get_phone_number(message: types.Message, state: FSMContext):
     last_name = user_data["last_name"]
     telegram_id = message.from_user.id
 
-    if safe_db_operation(register_user, telegram_id, first_name, last_name, phone_number):
-        auth_url = f"{WEBSITE_URL}/telegram-auth/{telegram_id}/"
+    if await safe_db_operation(register_user, telegram_id, first_name, last_name, phone_number):
+        auth_url = get_login_url(telegram_id)
         inline_keyboard = InlineKeyboardMarkup(inline_keyboard=[
             [InlineKeyboardButton(text="Test saytiga o'tish", url=auth_url)]
         ])
@@ -371,7 +428,7 @@ async def cancel_command(message: types.Message, state: FSMContext):
     await message.answer("❌ Jarayon bekor Apar qilindi. /start buyrug'ini yuboring.")
 
 async def test_command(message: types.Message, bot: Bot):
-    if is_user_banned(message.from_user.id):
+    if await safe_db_operation(is_user_banned, message.from_user.id):
         await message.answer("Siz botdan foydalana olmaysiz, chunki siz ban qilingansiz.")
         return
     is_subscribed, unsubscribed_channels = await check_subscription(bot, message.from_user.id)
@@ -379,21 +436,78 @@ async def test_command(message: types.Message, bot: Bot):
         response = "Iltimos, quyidagi kanallarga obuna bo'ling:\n"
         for channel_id in unsubscribed_channels:
             try:
-                chat = await bot.get_chat(channel_id)
+                chat = await get_channel_info(bot, channel_id)
                 response += f"- {chat.title} (@{channel_id.lstrip('@')})\n"
             except TelegramAPIError:
                 response += f"- @{channel_id.lstrip('@')}\n"
         await message.answer(response, reply_markup=await get_subscription_keyboard(bot))
         return
-    if not is_user_registered(message.from_user.id):
+    if not await safe_db_operation(is_user_registered, message.from_user.id):
         await message.answer("Iltimos, avval ro'yxatdan o'ting: /register")
         return
-    auth_url = f"{WEBSITE_URL}/telegram-auth/{message.from_user.id}/"
+    auth_url = get_login_url(message.from_user.id)
     inline_keyboard = InlineKeyboardMarkup(inline_keyboard=[
         [InlineKeyboardButton(text="Test saytiga o'tish", url=auth_url)]
     ])
     await message.answer("📝 Test topshirish uchun quyidagi tugmani bosing:", reply_markup=inline_keyboard)
 
+async def fetch_leaderboard(path: str = "", **params):
+    """Sayt reyting API sidan JSON olish (qisqa muddat keshlanadi). Xatolikda None."""
+    key = (path, tuple(sorted(params.items())))
+    data = leaderboard_cache.get(key)
+    if data is not None:
+        return data
+    try:
+        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=5)) as session:
+            async with session.get(f"{WEBSITE_URL}/api/leaderboard/{path}", params=params) as response:
+                response.raise_for_status()
+                data = await response.json()
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logger.error(f"Leaderboard API error for '{path}': {e}")
+        return None
+    leaderboard_cache.set(key, data)
+    return data
+
+def format_leaderboard(data: dict) -> str:
+    lines = [f"🏆 {escape(data['subject'])} — {LEADERBOARD_PERIODS[data['period']]}\n"]
+    for row in data["top"]:
+        lines.append(f"{row['rank']}. {escape(row['name'])} — {row['score']}%")
+    if not data["top"]:
+        lines.append("Hali natijalar yo'q.")
+    me = data.get("me")
+    if me:
+        lines.append(f"\nSizning o'rningiz: {me['rank']}/{me['participants']} ({me['score']}%)")
+    return "\n".join(lines)
+
+async def top_command(message: types.Message):
+    data = await fetch_leaderboard()
+    if not data or not data["subjects"]:
+        await message.answer("Reytingni hozircha ko'rsatib bo'lmadi. Keyinroq urinib ko'ring.")
+        return
+    inline_keyboard = InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text=subject["name"], callback_data=f"top:{subject['slug']}:all")]
+        for subject in data["subjects"]
+    ])
+    await message.answer("🏆 Qaysi fan reytingini ko'rmoqchisiz?", reply_markup=inline_keyboard)
+
+async def top_callback(callback_query: types.CallbackQuery):
+    _, slug, period = callback_query.data.split(":", 2)
+    if period not in LEADERBOARD_PERIODS:
+        period = "all"
+    data = await fetch_leaderboard(f"{slug}/", period=period, telegram_id=str(callback_query.from_user.id))
+    if data is None:
+        await callback_query.answer("Reytingni olishda xatolik yuz berdi.", show_alert=True)
+        return
+    inline_keyboard = InlineKeyboardMarkup(inline_keyboard=[[
+        InlineKeyboardButton(text=("• " if value == period else "") + label, callback_data=f"top:{slug}:{value}")
+        for value, label in LEADERBOARD_PERIODS.items()
+    ]])
+    try:
+        await callback_query.message.edit_text(format_leaderboard(data), parse_mode="HTML", reply_markup=inline_keyboard)
+    except TelegramAPIError as e:
+        logger.debug(f"Leaderboard message not edited: {e}")
+    await callback_query.answer()
+
 async def admin_command(message: types.Message):
     if str(message.from_user.id) not in ADMIN_IDS:
         await message.answer("🚫 Sizda admin huquqlari yo'q.")
@@ -403,18 +517,18 @@ async def admin_command(message: types.Message):
 async def admin_callback_query(callback_query: types.CallbackQuery, state: FSMContext, bot: Bot):
     data = callback_query.data
     if data.startswith("view_users_page_"):
-        page = int(data.split("_")[-1])
-        await send_paginated_users(callback_query, page=page)
+        page, cursor = parse_page_callback(data, "view_users_page_")
+        await send_paginated_users(callback_query, page=page, cursor=cursor)
     elif data == "view_users":
         await send_paginated_users(callback_query)
     elif data == "edit_user":
         await send_user_selection(callback_query, state)
     elif data.startswith("select_user_page_"):
-        page = int(data.split("_")[-1])
-        await send_user_selection(callback_query, state, page=page)
+        page, cursor = parse_page_callback(data, "select_user_page_")
+        await send_user_selection(callback_query, state, page=page, cursor=cursor)
     elif data.startswith("select_user_"):
         telegram_id = data.split("_")[-1]
-        if safe_db_operation(is_user_registered, telegram_id):
+        if await safe_db_operation(is_user_registered, telegram_id):
             await state.update_data(telegram_id=telegram_id)
             await callback_query.message.answer("Qaysi ma'lumotni tahrir qilmoqchisiz?", reply_markup=get_edit_user_keyboard())
             await state.set_state(AdminStates.edit_user_field)
@@ -437,16 +551,10 @@ async def admin_callback_query(callback_query: types.CallbackQuery, state: FSMCo
         await state.set_state(AdminStates.send_ad)
     elif data == "confirm_ad":
         ad_message = (await state.get_data()).get("ad_message")
-        if safe_db_operation(save_ad, ad_message):
-            sent_count, failed_count, failed_user_ids = await send_ad_to_users(bot, ad_message)
-            response = f"📢 Reklama {sent_count} foydalanuvchiga yuborildi.\n"
-            if failed_count:
-                response += f"❌ {failed_count} foydalanuvchiga yuborilmadi.\n"
-                if failed_user_ids:
-                    response += f"Xatolik yuz bergan foydalanuvchilar: {', '.join(map(str, failed_user_ids[:10]))}"
-                    if len(failed_user_ids) > 10:
-                        response += "..."
-            await callback_query.message.answer(response[:4000])
+        if await safe_db_operation(save_ad, ad_message):
+            # Tarqatish fon vazifasida davom etadi, holat xabari avtomatik yangilanadi
+            if not await start_ad_broadcast(bot, ad_message, callback_query.message.chat.id):
+                await callback_query.message.answer("❌ Reklama tarqatishni boshlashda xatolik yuz berdi.")
         else:
             await callback_query.message.answer("❌ Ma'lumotlarni saqlashda xatolik yuz berdi.")
         await state.clear()
@@ -454,7 +562,7 @@ async def admin_callback_query(callback_query: types.CallbackQuery, state: FSMCo
         await callback_query.message.answer("❌ Reklama yuborish bekor qilindi.")
         await state.clear()
     elif data == "view_ad_history":
-        ads = safe_db_operation(get_ad_history) or []
+        ads = await safe_db_operation(get_ad_history) or []
         if not ads:
             await callback_query.message.answer("Reklama tarixi topilmadi.")
             return
@@ -466,7 +574,7 @@ async def admin_callback_query(callback_query: types.CallbackQuery, state: FSMCo
         await callback_query.message.answer("Kanal ID sini kiriting (masalan, @ChannelName yoki -100123456789):")
         await state.set_state(AdminStates.add_channel)
     elif data == "remove_channel":
-        channels = safe_db_operation(get_channels) or []
+        channels = await safe_db_operation(get_channels) or []
         if not channels:
             await callback_query.message.answer("Majburiy kanallar topilmadi.")
             return
@@ -487,7 +595,7 @@ async def admin_callback_query(callback_query: types.CallbackQuery, state: FSMCo
         await callback_query.message.answer("Yangi admin Telegram ID sini kiriting:")
         await state.set_state(AdminStates.add_admin)
     elif data == "remove_admin":
-        admins = safe_db_operation(get_admins) or []
+        admins = await safe_db_operation(get_admins) or []
         if not admins:
             await callback_query.message.answer("Adminlar topilmadi.")
             return
@@ -496,36 +604,39 @@ async def admin_callback_query(callback_query: types.CallbackQuery, state: FSMCo
         ])
         await callback_query.message.answer("O'chiriladigan adminni tanlang:", reply_markup=keyboard)
     elif data == "stats":
-        total_users = safe_db_operation(get_user_count) or 0
-        users_today = safe_db_operation(get_users_today) or 0
-        banned_users = len([u for u in safe_db_operation(get_all_users) or [] if u[4]])
+        stats = await safe_db_operation(get_user_stats)
+        if not stats:
+            await callback_query.message.answer("❌ Statistikani olishda xatolik yuz berdi.")
+            return
         await callback_query.message.answer(
             f"📈 Statistika:\n"
-            f"Jami foydalanuvchilar: {total_users}\n"
-            f"Bugun qo'shilganlar: {users_today}\n"
-            f"Banlanganlar: {banned_users}"
+            f"Jami foydalanuvchilar: {stats['total']}\n"
+            f"Bugun qo'shilganlar: {stats['today']}\n"
+            f"Banlanganlar: {stats['banned']}\n"
+            f"Oxirgi 7 kunda: {stats['last_7_days']} (+{stats['growth_7_days']}%)"
         )
     elif data.startswith("remove_"):
         channel_id = data[len("remove_"):]
-        if safe_db_operation(remove_channel, channel_id):
+        if await safe_db_operation(remove_channel, channel_id):
             await callback_query.message.answer(f"Kanal {channel_id} o'chirildi.")
         else:
             await callback_query.message.answer("Xatolik yuz berdi.")
     elif data.startswith("remove_admin_"):
         admin_id = data[len("remove_admin_"):]
-        if safe_db_operation(remove_admin, admin_id):
+        if await safe_db_operation(remove_admin, admin_id):
             await callback_query.message.answer(f"Admin {admin_id} o'chirildi.")
         else:
             await callback_query.message.answer("Xatolik yuz berdi.")
     elif data == "check_subscription":
-        is_subscribed, unsubscribed_channels = await check_subscription(bot, callback_query.from_user.id)
+        # Foydalanuvchi endigina obuna bo'lgan bo'lishi mumkin, shuning uchun keshni chetlab o'tamiz
+        is_subscribed, unsubscribed_channels = await check_subscription(bot, callback_query.from_user.id, fresh=True)
         if is_subscribed:
             await callback_query.message.answer("✅ Obuna tasdiqlandi! /register buyrug'ini yuboring.")
         else:
             response = "🚫 Iltimos, quyidagi kanallarga obuna bo'ling:\n"
             for channel_id in unsubscribed_channels:
                 try:
-                    chat = await bot.get_chat(channel_id)
+                    chat = await get_channel_info(bot, channel_id)
                     response += f"- {chat.title} (@{channel_id.lstrip('@')})\n"
                 except TelegramAPIError:
                     response += f"- @{channel_id.lstrip('@')}\n"
@@ -554,7 +665,7 @@ async def handle_admin_input(message: types.Message, state: FSMContext, bot: Bot
         if not await validate_channel(bot, channel_id):
             await message.answer("❌ Kanal ID si noto'g'ri yoki botda kanalga kirish huquqi yo'q.")
             return
-        if safe_db_operation(add_channel, channel_id):
+        if await safe_db_operation(add_channel, channel_id):
             chat = await bot.get_chat(channel_id)
             await message.answer(f"✅ Kanal {channel_id} ({chat.title}) qo'shildi.")
             await notify_users_new_channel(bot, channel_id)
@@ -566,7 +677,7 @@ async def handle_admin_input(message: types.Message, state: FSMContext, bot: Bot
         if not is_valid_telegram_id(telegram_id):
             await message.answer("❌ Noto'g'ri Telegram ID. Faqat raqamlardan iborat bo'lishi kerak.")
             return
-        if safe_db_operation(ban_user, telegram_id):
+        if await safe_db_operation(ban_user, telegram_id):
             await message.answer(f"🚫 Foydalanuvchi {telegram_id} ban qilindi.")
         else:
             await message.answer("❌ Foydalanuvchi topilmadi.")
@@ -576,7 +687,7 @@ async def handle_admin_input(message: types.Message, state: FSMContext, bot: Bot
         if not is_valid_telegram_id(telegram_id):
             await message.answer("❌ Noto'g'ri Telegram ID. Faqat raqamlardan iborat bo'lishi kerak.")
             return
-        if safe_db_operation(unban_user, telegram_id):
+        if await safe_db_operation(unban_user, telegram_id):
             await message.answer(f"✅ Foydalanuvchi {telegram_id} bandan chiqarildi.")
         else:
             await message.answer("❌ Foydalanuvchi topilmadi.")
@@ -592,7 +703,7 @@ async def handle_admin_input(message: types.Message, state: FSMContext, bot: Bot
         if field in ["first_name", "last_name"] and not re.match(r'^[A-Za-z\s-]+$', value):
             await message.answer("❌ Faqat harflar, bo'shliq yoki defis kiriting.")
             return
-        if safe_db_operation(update_user, telegram_id, field, escape(value)):
+        if await safe_db_operation(update_user, telegram_id, field, escape(value)):
             await message.answer(f"✅ {field} muvaffaqiyatli yangilandi.")
         else:
             await message.answer("❌ Xatolik yuz berdi.")
@@ -602,7 +713,7 @@ async def handle_admin_input(message: types.Message, state: FSMContext, bot: Bot
         if not is_valid_telegram_id(admin_id):
             await message.answer("❌ Noto'g'ri Telegram ID. Faqat raqamlardan iborat bo'lishi kerak.")
             return
-        if safe_db_operation(add_admin, admin_id):
+        if await safe_db_operation(add_admin, admin_id):
             await message.answer(f"✅ Admin {admin_id} qo'shildi.")
         else:
             await message.answer("❌ Xatolik yuz berdi yoki admin allaqachon mavjud.")
@@ -612,7 +723,7 @@ async def handle_admin_input(message: types.Message, state: FSMContext, bot: Bot
         if not is_valid_telegram_id(admin_id):
             await message.answer("❌ Noto'g'ri Telegram ID. Faqat raqamlardan iborat bo'lishi kerak.")
             return
-        if safe_db_operation(remove_admin, admin_id):
+        if await safe_db_operation(remove_admin, admin_id):
             await message.answer(f"✅ Admin {admin_id} o'chirildi.")
         else:
             await message.answer("❌ Xatolik yuz berdi yoki admin topilmadi.")
@@ -625,10 +736,12 @@ def register_handlers(dp: Dispatcher):
     dp.message.register(register_command, Command("register"))
     dp.message.register(cancel_command, Command("cancel"))
     dp.message.register(test_command, Command("test"))
+    dp.message.register(top_command, Command("top"))
     dp.message.register(admin_command, Command("admin"))
     dp.message.register(get_first_name, Registration.first_name)
     dp.message.register(get_last_name, Registration.last_name)
     dp.message.register(get_phone_number, Registration.phone_number)
+    dp.callback_query.register(top_callback, lambda callback_query: callback_query.data.startswith("top:"))
     dp.callback_query.register(admin_callback_query)
     dp.message.register(handle_admin_input, lambda message: str(message.from_user.id) in ADMIN_IDS)
 
@@ -0,0 +1,44 @@
+import base64
+import hashlib
+import hmac
+import time
+from config import LOGIN_TOKEN_TTL
+
+# Bot va sayt bir xil kalitdan foydalanadi (ikkalasi ham BOT_TOKEN ni biladi),
+# lekin token imzosi bot tokenining o'zidan alohida kalit bilan qo'yiladi.
+_KEY_SALT = b"dtm-login-token"
+# Soatlar farqi uchun ruxsat etilgan "kelajakdagi" vaqt
+CLOCK_SKEW = 60
+
+
+def _key(secret: str) -> bytes:
+    return hmac.new(_KEY_SALT, secret.encode(), hashlib.sha256).digest()
+
+
+def _signature(secret: str, telegram_id: str, issued_at: str) -> str:
+    digest = hmac.new(_key(secret), f"{telegram_id}:{issued_at}".encode(), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest[:18]).decode()
+
+
+def make_login_token(telegram_id, secret: str, issued_at: int = None) -> str:
+    """Saytga kirish uchun imzolangan token: `<telegram_id>.<vaqt>.<imzo>`."""
+    telegram_id = str(telegram_id)
+    issued = format(int(time.time() if issued_at is None else issued_at), "x")
+    return f"{telegram_id}.{issued}.{_signature(secret, telegram_id, issued)}"
+
+
+def verify_login_token(token: str, secret: str, max_age: int = LOGIN_TOKEN_TTL, now: float = None):
+    """Token to'g'ri va muddati o'tmagan bo'lsa telegram_id ni, aks holda None ni qaytarish."""
+    try:
+        telegram_id, issued, signature = token.split(".")
+        issued_at = int(issued, 16)
+    except (AttributeError, ValueError):
+        return None
+    if not telegram_id.isdigit() or not secret:
+        return None
+    if not hmac.compare_digest(signature, _signature(secret, telegram_id, issued)):
+        return None
+    age = (time.time() if now is None else now) - issued_at
+    if age > max_age or age < -CLOCK_SKEW:
+        return None
+    return telegram_id
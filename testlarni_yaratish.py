@@ -1,7 +1,5 @@
-import json
 import os
-from django.utils.text import slugify
-from app.models import Subject, Topic, Question, AnswerOption
+from app.import_questions_from_json import import_subject
 
 def yukla_testlar():
     # Fanlar va ularga mos JSON fayllar ro‘yxati
@@ -22,44 +20,16 @@ def yukla_testlar():
 
     for fan_nomi, fayl_yoli in fanlar.items():
         try:
-            # Faylni ochish
             if not os.path.exists(fayl_yoli):
                 print(f"⚠️ {fayl_yoli} fayli topilmadi.")
                 continue
-
-            with open(fayl_yoli, encoding="utf-8") as f:
-                questions = json.load(f)
-
-            # 1. Fan va Mavzuni olish yoki yaratish
-            subject, created = Subject.objects.get_or_create(
-                name=fan_nomi,
-                defaults={"slug": slugify(fan_nomi)}
-            )
-            topic, created = Topic.objects.get_or_create(
-                subject=subject,
-                name=f"{fan_nomi} umumiy",
-                defaults={"slug": slugify(f"{fan_nomi}-umumiy"), "description": f"{fan_nomi} asoslari"}
-            )
-
-            # 2. Savollarni bazaga qo‘shish
-            for q in questions:
-                question = Question.objects.create(
-                    topic=topic,
-                    text=q["text"],
-                    difficulty=q["difficulty"],
-                    explanation=q["explanation"]
-                )
-                for opt in q["options"]:
-                    AnswerOption.objects.create(
-                        question=question,
-                        label=opt["label"],
-                        text=opt["text"],
-                        is_correct=opt["is_correct"]
-                    )
-            print(f"✅ {fan_nomi} bo‘yicha test savollar bazaga qo‘shildi.")
+            # Savollar va variantlar bitta tranzaksiyada bulk_create bilan qo‘shiladi
+            stats = import_subject(fan_nomi, fayl_yoli)
+            print(f"✅ {fan_nomi} bo‘yicha {stats['created']} ta test savol bazaga qo‘shildi "
+                  f"({stats['skipped']} ta takroriy o‘tkazib yuborildi).")
 
         except Exception as e:
             print(f"❌ {fan_nomi} testlarini yuklashda xatolik: {str(e)}")
             continue
 
-    print("✅ Barcha test savollar va variantlar bazaga qo‘shildi.")
\ No newline at end of file
+    print("✅ Barcha test savollar va variantlar bazaga qo‘shildi.")
@@ -0,0 +1,105 @@
+import asyncio
+import hmac
+import logging
+import time
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import setup_application
+from config import (
+    WEBHOOK_URL, WEBHOOK_PATH, WEBHOOK_SECRET, WEBAPP_HOST, WEBAPP_PORT, WEBHOOK_MAX_CONCURRENCY
+)
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+class WebhookUpdateHandler:
+    """Webhook orqali kelgan update'larni qabul qilib, fon vazifalarida parallel qayta ishlaydi.
+
+    Bir vaqtda ishlayotgan update'lar soni max_concurrency bilan cheklangan: limitga
+    yetilganda javob qaytarish kechiktiriladi va Telegram yuborishni sekinlashtiradi.
+    Sirli token majburiy: busiz har kim admin update'larini soxtalashtirishi mumkin.
+    """
+
+    def __init__(self, dispatcher: Dispatcher, bot: Bot, secret_token: str,
+                 max_concurrency: int = WEBHOOK_MAX_CONCURRENCY):
+        if not secret_token:
+            raise RuntimeError("Webhook rejimi uchun WEBHOOK_SECRET o'rnatilishi shart")
+        self.dispatcher = dispatcher
+        self.bot = bot
+        self.secret_token = secret_token
+        self.max_concurrency = max_concurrency
+        self.processed = 0
+        self.failed = 0
+        self.started_at = time.monotonic()
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._tasks = set()
+
+    async def handle(self, request: web.Request) -> web.Response:
+        if not hmac.compare_digest(request.headers.get(SECRET_HEADER, ""), self.secret_token):
+            return web.Response(status=401)
+        try:
+            update = await request.json()
+        except ValueError:
+            return web.Response(status=400)
+        await self._semaphore.acquire()
+        task = asyncio.create_task(self._process(update))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return web.Response()
+
+    async def _process(self, update: dict):
+        try:
+            await self.dispatcher.feed_raw_update(self.bot, update)
+            self.processed += 1
+        except Exception as e:
+            self.failed += 1
+            logger.error(f"Error processing update {update.get('update_id')}: {e}")
+        finally:
+            self._semaphore.release()
+
+    async def health(self, request: web.Request) -> web.Response:
+        return web.json_response({
+            "status": "ok",
+            "in_flight": len(self._tasks),
+            "processed": self.processed,
+            "failed": self.failed,
+            "uptime": round(time.monotonic() - self.started_at, 1),
+        })
+
+    async def close(self, *args):
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+def create_webhook_app(bot: Bot, dp: Dispatcher, secret_token: str = WEBHOOK_SECRET,
+                       max_concurrency: int = WEBHOOK_MAX_CONCURRENCY) -> web.Application:
+    app = web.Application()
+    handler = WebhookUpdateHandler(dp, bot, secret_token=secret_token, max_concurrency=max_concurrency)
+    app["webhook_handler"] = handler
+    app.router.add_post(WEBHOOK_PATH, handler.handle)
+    app.router.add_get("/health", handler.health)
+    app.on_shutdown.append(handler.close)
+    setup_application(app, dp, bot=bot)
+    return app
+
+
+async def run_webhook(bot: Bot, dp: Dispatcher):
+    app = create_webhook_app(bot, dp)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, WEBAPP_HOST, WEBAPP_PORT)
+    await site.start()
+    logger.info(f"Webhook server listening on {WEBAPP_HOST}:{WEBAPP_PORT}{WEBHOOK_PATH}")
+    if WEBHOOK_URL:
+        await bot.set_webhook(
+            f"{WEBHOOK_URL.rstrip('/')}{WEBHOOK_PATH}",
+            secret_token=WEBHOOK_SECRET,
+            max_connections=min(WEBHOOK_MAX_CONCURRENCY, 100),
+        )
+        logger.info(f"Webhook set to {WEBHOOK_URL}{WEBHOOK_PATH}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()